@@ -1,5 +1,9 @@
-from backend.src.app import app  # 从 src.app 导入已配置好的 Flask 应用实例
+import os
+
+from backend.src.app import app, start_score_worker  # 从 src.app 导入已配置好的 Flask 应用实例
 
 
 if __name__ == "__main__":  # 仅在直接运行此文件时执行
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":  # 只在重载器拉起的服务子进程中启动后台重算
+        start_score_worker(app)
     app.run(debug=True, use_reloader=True)  # 启动开发服务器以便本地调试
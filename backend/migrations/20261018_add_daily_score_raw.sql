@@ -0,0 +1,2 @@
+-- 每日积分增量维护：raw_score 为未封顶的原始和，NULL 的行在下次写入时全量重算初始化
+ALTER TABLE daily_scores ADD COLUMN raw_score INT NULL;
@@ -0,0 +1,4 @@
+-- 每日积分记录产生它的计分规则版本；版本落后或为 NULL 的行在读取时或由后台清扫线程重算
+ALTER TABLE daily_scores
+    ADD COLUMN rules_version INT NULL,
+    ADD INDEX ix_daily_scores_rules_version (rules_version);
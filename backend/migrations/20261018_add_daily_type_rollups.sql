@@ -0,0 +1,15 @@
+-- 按 (用户, 日期, 事件类型, 效率) 汇总的事件统计，供积分明细与 /stats 读取
+-- 应用启动时 init_db 发现该表为空会自动回填一次；也可执行 `flask --app backend.src.app rebuild-rollups` 手动重建
+CREATE TABLE IF NOT EXISTS daily_type_rollups (
+    user_id INT NOT NULL,
+    date DATE NOT NULL,
+    type_id VARCHAR(32) NOT NULL DEFAULT '',
+    efficiency VARCHAR(16) NOT NULL DEFAULT '',
+    event_count INT NOT NULL DEFAULT 0,
+    completed_count INT NOT NULL DEFAULT 0,
+    half_hour_units DOUBLE NOT NULL DEFAULT 0,
+    score INT NOT NULL DEFAULT 0,
+    recorded_seconds DOUBLE NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, date, type_id, efficiency),
+    CONSTRAINT fk_daily_type_rollups_user FOREIGN KEY (user_id) REFERENCES users(id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,19 @@
+-- 增量同步：事件/系列的变更序号与删除墓碑
+ALTER TABLE events
+    ADD COLUMN change_seq BIGINT NOT NULL DEFAULT 0,
+    ADD INDEX idx_user_change_seq (user_id, change_seq);
+
+ALTER TABLE event_series
+    ADD COLUMN change_seq BIGINT NOT NULL DEFAULT 0,
+    ADD INDEX idx_series_user_change_seq (user_id, change_seq);
+
+CREATE TABLE IF NOT EXISTS event_tombstones (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    event_id VARCHAR(32) NOT NULL,
+    kind VARCHAR(16) NOT NULL DEFAULT 'event',
+    change_seq BIGINT NOT NULL,
+    deleted_at DATETIME NOT NULL,
+    INDEX idx_tombstone_user_change_seq (user_id, change_seq),
+    CONSTRAINT fk_event_tombstones_user FOREIGN KEY (user_id) REFERENCES users(id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,30 @@
+-- 重复事件系列定义表：规则只存一份，读取时按窗口展开
+CREATE TABLE IF NOT EXISTS event_series (
+    id VARCHAR(32) NOT NULL PRIMARY KEY,
+    user_id INT NOT NULL,
+    title VARCHAR(128) NOT NULL,
+    allDay TINYINT(1) DEFAULT 0,
+    category VARCHAR(32) DEFAULT '默认',
+    time VARCHAR(32) DEFAULT '',
+    urgency VARCHAR(16) DEFAULT '普通',
+    remark VARCHAR(512) NULL,
+    custom_type_id VARCHAR(32) NULL,
+    plan_id VARCHAR(32) NULL,
+    goal_id VARCHAR(32) NULL,
+    task_id VARCHAR(64) NULL,
+    repeat_type VARCHAR(32) NOT NULL,
+    anchor_start DATETIME NOT NULL,
+    duration_seconds INT NOT NULL DEFAULT 0,
+    repeat_end_date DATE NULL,
+    overrides TEXT NULL,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_series_user_anchor (user_id, anchor_start),
+    INDEX ix_event_series_user_id (user_id),
+    INDEX ix_event_series_custom_type_id (custom_type_id),
+    CONSTRAINT fk_event_series_user FOREIGN KEY (user_id) REFERENCES users(id),
+    CONSTRAINT fk_event_series_custom_type FOREIGN KEY (custom_type_id) REFERENCES event_types(id)
+        ON DELETE SET NULL ON UPDATE CASCADE,
+    CONSTRAINT fk_event_series_plan FOREIGN KEY (plan_id) REFERENCES annual_plans(id),
+    CONSTRAINT fk_event_series_goal FOREIGN KEY (goal_id) REFERENCES plan_goals(id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
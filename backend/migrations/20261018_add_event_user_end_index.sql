@@ -0,0 +1,3 @@
+-- GET /events 的时间窗口按 end > 窗口开始 判断相交，开始于窗口之前的长事件也能命中
+ALTER TABLE events
+    ADD INDEX idx_user_end (user_id, `end`);
@@ -0,0 +1,9 @@
+-- 待后台重算积分的日期集合
+CREATE TABLE IF NOT EXISTS score_dirty_days (
+    user_id INT NOT NULL,
+    date DATE NOT NULL,
+    mark_seq INT NOT NULL DEFAULT 1,
+    marked_at DATETIME NOT NULL,
+    PRIMARY KEY (user_id, date),
+    CONSTRAINT fk_score_dirty_days_user FOREIGN KEY (user_id) REFERENCES users(id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,2 @@
+-- 用户数据版本：每次写操作递增，用于派生 ETag 与增量同步令牌
+ALTER TABLE users ADD COLUMN data_version BIGINT NOT NULL DEFAULT 0;
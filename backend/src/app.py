@@ -1,15 +1,20 @@
 from datetime import datetime, timedelta  # 引入 datetime 用于生成时间戳
 from typing import Dict, List  # 引入类型注解确保数据结构清晰
+import heapq
+from operator import itemgetter
 from uuid import uuid4  # 引入 uuid4 用于生成唯一标识符
 import os
+import signal
+import threading
+import click
 
-from flask import Flask, jsonify, request  # 引入 Flask 核心类以及 JSON 工具
+from flask import Flask, jsonify, request, stream_with_context  # 引入 Flask 核心类以及 JSON 工具
 
 from flask_cors import CORS  # 引入 CORS 以支持跨域请求
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt
 from werkzeug.security import generate_password_hash, check_password_hash
 import logging
-from sqlalchemy import case, func, or_
+from sqlalchemy import case, func, or_, select
 from sqlalchemy.exc import IntegrityError
 
 from .models.db import init_db, SessionLocal
@@ -22,22 +27,50 @@ from .models.plan_goal import PlanGoal
 from .models.goal_execution_queue import GoalExecutionQueue
 from .models.goal_task_status import GoalTaskStatus
 from .models.user import User
-from .utils import event_to_dict, idea_to_dict, event_type_to_dict, daily_score_to_dict
+from .models.event_series import EventSeries
+from .models.event_tombstone import EventTombstone
+from .models.daily_type_rollup import DailyTypeRollup
+from .models.score_dirty_day import ScoreDirtyDay
+from .utils import (
+    event_to_dict,
+    event_row_to_dict,
+    idea_to_dict,
+    event_type_to_dict,
+    daily_score_to_dict,
+    to_columnar,
+    EVENT_COLUMNAR_FIELDS,
+    EVENT_COLUMNAR_ENCODED_FIELDS,
+    DAILY_SCORE_COLUMNAR_FIELDS
+)
 from .services.event_service import (
-    generate_repeat_events,
-    calculate_and_update_daily_score,
-    recalculate_daily_score_for_date,
-    calculate_event_score,
-    calculate_event_units
+    apply_score_changes,
+    rescore_user,
+    query_events_page,
+    iter_events_in_window,
+    STREAM_BATCH_SIZE,
+    event_projection,
+    normalize_page_limit,
+    encode_event_cursor,
+    decode_event_cursor,
+    EventQueryError
 )
 from .services import plan_service
-
-# 统计数据缓存
-stats_cache = {
-    'data': None,
-    'timestamp': None,
-    'ttl': 60  # 缓存有效期60秒
-}
+from .services import recurrence
+from .services import event_operations
+from .services import holiday_calendar
+from .services import rollups
+from .services import coverage
+from .services import score_queue
+from .services.periods import period_bounds, within
+from .services.scoring import RULES
+from .services import cache_backend
+from .services.stats_cache import StatsCache
+from .services.data_version import bump_data_version, cached_data_version, get_data_version, build_etag
+from .services.change_log import record_changes, delete_events_where
+
+# 统计数据缓存（按用户与年/月区间，存放在共享缓存后端，有效期在 create_app 中按配置设置）
+stats_cache = StatsCache()
+EVENT_TYPES_CACHE_TTL_SECONDS = 300  # 事件类型列表按 ETag 缓存，数据版本变化即换键，无需主动失效
 
 # 全局内存数据存储（后续阶段将替换为 MySQL 持久化）
 EVENTS_STORE: List[Dict[str, str]] = []  # 存放日程事件的临时列表
@@ -70,6 +103,17 @@ def ensure_global_event_types(session) -> bool:
     return True
 
 
+def _parse_query_datetime(value):
+    """解析查询参数中的 ISO 时间，去掉时区偏移以匹配库中存储的本地时间。"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError as exc:
+        raise EventQueryError(f"时间参数无效: {value}") from exc
+    return parsed.replace(tzinfo=None)
+
+
 def create_app() -> Flask:  # 创建并配置 Flask 应用的工厂函数
     app = Flask(__name__)
     from .config import Config
@@ -101,11 +145,15 @@ def create_app() -> Flask:  # 创建并配置 Flask 应用的工厂函数
     CORS(app, 
          resources={r"/*": {"origins": "*"}},
          methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
-         allow_headers=["Content-Type", "Authorization"])
+         allow_headers=["Content-Type", "Authorization", "If-None-Match"],
+         expose_headers=["X-Next-Cursor", "X-Change-Token", "X-Scores-Fresh", "ETag"])
     
     register_routes(app)
+    register_commands(app)
     init_db()
     seed_demo_data()
+    cache_backend.configure(app.config["CACHE_URL"], app.config["CACHE_MAX_ENTRIES"])
+    stats_cache.configure(app.config["STATS_CACHE_TTL_SECONDS"])
 
     # 全局错误处理
     @app.errorhandler(Exception)
@@ -124,6 +172,75 @@ def create_app() -> Flask:  # 创建并配置 Flask 应用的工厂函数
     return app
 
 
+def start_score_worker(app: Flask):
+    """
+    在当前进程启动积分重算后台线程并返回它，线程数不大于 0 时返回 None。
+
+    创建应用时不会启动：gunicorn 的每个 worker、脚本与 flask 命令都会导入应用，
+    后台重算只应由 `flask score-worker` 进程或开发服务器这样的单个进程承担。
+    """
+    return score_queue.start_worker(
+        SessionLocal, app.config["SCORE_WORKER_THREADS"], app.config["SCORE_WORKER_POLL_SECONDS"]
+    )
+
+
+def register_commands(app: Flask) -> None:  # 注册运维用的 flask 命令
+    @app.cli.command("rebuild-rollups")
+    @click.option("--user-id", type=int, default=None, help="只重建指定用户，默认重建全部用户")
+    def rebuild_rollups_command(user_id):
+        """按 events 全量重建 daily_type_rollups（建表后回填或数据修复时使用）。"""
+        session = SessionLocal()
+        try:
+            if user_id is None:
+                user_ids = [row[0] for row in session.query(User.id).order_by(User.id)]
+            else:
+                user_ids = [user_id]
+            for uid in user_ids:
+                written = rollups.rebuild_rollups(session, uid)
+                session.commit()  # 逐用户提交，避免单个大事务
+                click.echo(f"user {uid}: {written} rollup rows")
+        finally:
+            session.close()
+
+
+    @app.cli.command("rebuild-scores")
+    @click.option("--user-id", type=int, default=None, help="只重算指定用户，默认重算全部用户")
+    def rebuild_scores_command(user_id):
+        """按当前计分规则立即重算全部历史积分与汇总；不执行时旧版本积分会在读取和后台清扫时逐步重算。"""
+        session = SessionLocal()
+        try:
+            if user_id is None:
+                user_ids = [row[0] for row in session.query(User.id).order_by(User.id)]
+            else:
+                user_ids = [user_id]
+            click.echo(f"scoring rules v{RULES.version}")
+            for uid in user_ids:
+                days = rescore_user(session, uid)
+                written = rollups.rebuild_rollups(session, uid)
+                session.commit()  # 逐用户提交，避免单个大事务
+                click.echo(f"user {uid}: {days} daily scores, {written} rollup rows")
+        finally:
+            session.close()
+
+
+    @app.cli.command("score-worker")
+    def score_worker_command():
+        """在前台运行积分重算后台线程，直到收到 SIGINT/SIGTERM；部署时与 gunicorn 并列只运行一个。"""
+        worker = start_score_worker(app)
+        if worker is None:
+            raise click.ClickException("SCORE_WORKER_THREADS 为 0，未启动后台重算")
+        stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+        click.echo(f"score worker: {app.config['SCORE_WORKER_THREADS']} threads, "
+                   f"polling every {app.config['SCORE_WORKER_POLL_SECONDS']}s")
+        try:
+            stopping.wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            worker.stop()
+
+
 def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结构清晰
     @app.route("/", methods=["GET"])  # 注册根路由用于快速检查服务可用性
     def index() -> tuple:  # 定义根路由处理函数
@@ -214,6 +331,12 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
         if not claims.get("is_admin"):
             return jsonify({"error": "Admin access required"}), 403
             
+        if _wants_stream():
+            return _stream_json_array(
+                lambda session: session.query(User).order_by(User.id).yield_per(STREAM_BATCH_SIZE),
+                lambda u: u.to_dict()
+            ), 200
+
         session = SessionLocal()
         try:
             users = session.query(User).all()
@@ -305,12 +428,24 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
                 "events": session.query(Event)
                 .filter(Event.user_id == user_id)
                 .delete(synchronize_session=False),
+                "event_series": session.query(EventSeries)
+                .filter(EventSeries.user_id == user_id)
+                .delete(synchronize_session=False),
+                "event_tombstones": session.query(EventTombstone)
+                .filter(EventTombstone.user_id == user_id)
+                .delete(synchronize_session=False),
                 "ideas": session.query(Idea)
                 .filter(Idea.user_id == user_id)
                 .delete(synchronize_session=False),
                 "daily_scores": session.query(DailyScore)
                 .filter(DailyScore.user_id == user_id)
                 .delete(synchronize_session=False),
+                "daily_type_rollups": session.query(DailyTypeRollup)
+                .filter(DailyTypeRollup.user_id == user_id)
+                .delete(synchronize_session=False),
+                "score_dirty_days": session.query(ScoreDirtyDay)
+                .filter(ScoreDirtyDay.user_id == user_id)
+                .delete(synchronize_session=False),
                 "annual_plans": session.query(AnnualPlan)
                 .filter(AnnualPlan.user_id == user_id)
                 .delete(synchronize_session=False),
@@ -321,7 +456,7 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
                 
             session.delete(user)
             session.commit()
-            clear_stats_cache()
+            stats_cache.invalidate_user(user_id)
             return jsonify({"message": "User deleted", "deleted_counts": deleted_counts}), 200
         except IntegrityError as exc:
             session.rollback()
@@ -333,15 +468,120 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
         finally:
             session.close()
 
+    @app.route("/api/admin/stats-cache", methods=["GET"])
+    @jwt_required()
+    def stats_cache_metrics():
+        """/stats 缓存的命中、未命中、失效与出错计数（按处理本请求的 worker 进程统计）及共享后端的容量信息。"""
+        claims = get_jwt()
+        if not claims.get("is_admin"):
+            return jsonify({"error": "Admin access required"}), 403
+        return jsonify(stats_cache.snapshot()), 200
+
 
     @app.route("/events", methods=["GET"])
     @jwt_required()
     def list_events():
         current_user_id = int(get_jwt_identity())
+        change_token = get_data_version(current_user_id)
+        etag, not_modified = _check_etag("events", current_user_id, change_token)
+        if not_modified:
+            return not_modified
+        columnar = _wants_columnar()
+        if columnar is None:
+            return jsonify({"error": "format 参数无效"}), 400
+        if _wants_stream():
+            if columnar:
+                return jsonify({"error": "流式模式不支持 columnar 格式"}), 400
+            # 流式模式不分页：按 (start, id) 顺序写出窗口内全部事件与虚拟实例
+            try:
+                window_start = _parse_query_datetime(request.args.get("start"))
+                window_end = _parse_query_datetime(request.args.get("end"))
+                if window_start and window_end and window_end <= window_start:
+                    raise EventQueryError("时间窗口结束必须晚于开始")
+            except EventQueryError as exc:
+                return jsonify({"error": str(exc)}), 400
+
+            def window_items(session):
+                # 虚拟实例先展开为列表：服务端游标打开后同一连接不能再执行查询
+                occurrences = recurrence.expand_user_series(session, current_user_id, window_start, window_end)
+                stored = (
+                    (row.start, row.id, event_row_to_dict(row))
+                    for row in iter_events_in_window(session, current_user_id, window_start, window_end)
+                )
+                return heapq.merge(stored, occurrences, key=itemgetter(0, 1))
+
+            response = _with_etag(_stream_json_array(window_items, itemgetter(2)), etag)
+            response.headers["X-Change-Token"] = str(change_token)
+            return response, 200
+
         session = SessionLocal()
         try:
-            events = session.query(Event).filter_by(user_id=current_user_id).all()
-            return jsonify([event_to_dict(e) for e in events]), 200
+            window_start = _parse_query_datetime(request.args.get("start"))
+            window_end = _parse_query_datetime(request.args.get("end"))
+            limit = normalize_page_limit(request.args.get("limit", type=int))
+            cursor = request.args.get("cursor")
+            after = decode_event_cursor(cursor) if cursor else None
+            events, next_cursor = query_events_page(
+                session,
+                current_user_id,
+                window_start=window_start,
+                window_end=window_end,
+                cursor=cursor,
+                limit=limit
+            )
+            # 合并重复系列在窗口内展开的虚拟实例，二者共用同一 (start, id) 游标
+            items, next_key = recurrence.merge_with_stored_page(
+                [(row.start, row.id, event_row_to_dict(row)) for row in events],
+                next_cursor is not None,
+                recurrence.expand_user_series(session, current_user_id, window_start, window_end),
+                after,
+                limit
+            )
+            if columnar:
+                items = to_columnar(items, EVENT_COLUMNAR_FIELDS, EVENT_COLUMNAR_ENCODED_FIELDS)
+            response = _with_etag(jsonify(items), etag)
+            # 客户端以此为 since 调用 /events/changes 增量同步
+            response.headers["X-Change-Token"] = str(change_token)
+            if next_key:
+                response.headers["X-Next-Cursor"] = encode_event_cursor(*next_key)
+            return response, 200
+        except EventQueryError as exc:
+            return jsonify({"error": str(exc)}), 400
+        finally:
+            session.close()
+
+    @app.route("/events/changes", methods=["GET"])
+    @jwt_required()
+    def list_event_changes():
+        current_user_id = int(get_jwt_identity())
+        since = request.args.get("since", type=int)
+        if since is None or since < 0:
+            return jsonify({"error": "since 参数无效"}), 400
+        # 先读版本再查变更：之后提交的变更 change_seq 必然大于该令牌，下次同步不会遗漏
+        change_token = get_data_version(current_user_id)
+        if since > change_token:
+            return jsonify({"error": "同步令牌已失效，请重新全量加载"}), 410
+        session = SessionLocal()
+        try:
+            events = session.query(*event_projection()).filter(
+                Event.user_id == current_user_id,
+                Event.change_seq > since
+            ).order_by(Event.change_seq, Event.id).all()
+            series = session.query(EventSeries).filter(
+                EventSeries.user_id == current_user_id,
+                EventSeries.change_seq > since
+            ).order_by(EventSeries.change_seq, EventSeries.id).all()
+            tombstones = session.query(EventTombstone.kind, EventTombstone.event_id).filter(
+                EventTombstone.user_id == current_user_id,
+                EventTombstone.change_seq > since
+            ).order_by(EventTombstone.change_seq, EventTombstone.id).all()
+            return jsonify({
+                "token": change_token,
+                "events": [event_row_to_dict(row) for row in events],
+                "series": [recurrence.series_to_dict(item) for item in series],
+                "deleted": [item_id for kind, item_id in tombstones if kind == "event"],
+                "deletedSeries": [item_id for kind, item_id in tombstones if kind == "series"]
+            }), 200
         finally:
             session.close()
 
@@ -352,76 +592,42 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
         payload = request.get_json(force=True)
         session = SessionLocal()
         try:
-            remark_value = payload.get("remark")
-            if isinstance(remark_value, str):
-                remark_value = remark_value.strip()
-                if not remark_value:
-                    remark_value = None
-            # 检查是否为重复事件
-            is_repeat = payload.get("isRepeat", False)
-            logging.info(f"[创建事件] isRepeat={is_repeat}, repeatType={payload.get('repeatType')}, repeatEndDate={payload.get('repeatEndDate')}")
-            
-            if is_repeat:
-                # 构建基础事件数据
-                base_event_data = {
-                    "title": payload.get("title", "未命名事件"),
-                    "start": datetime.fromisoformat(payload.get("start")) if payload.get("start") else datetime.utcnow(),
-                    "end": datetime.fromisoformat(payload.get("end")) if payload.get("end") else datetime.utcnow(),
-                    "allDay": payload.get("allDay", False),
-                    "category": payload.get("category", "默认"),
-                    "time": payload.get("time", ""),
-                    "urgency": payload.get("urgency", "普通"),
-                    "remark": remark_value,
-                    "custom_type_id": payload.get("customTypeId"),
-                    "plan_id": payload.get("planId"),
-                    "goal_id": payload.get("goalId"),
-                    "task_id": payload.get("taskId")
-                }
-                
-                repeat_type = payload.get("repeatType") or "daily"
-                allowed_repeat_types = {"daily", "weekday", "weekend", "workday", "holiday"}
-                if repeat_type not in allowed_repeat_types:
-                    return jsonify({"error": "重复类型无效"}), 400
-                repeat_end_date = None
-                if payload.get("repeatEndDate"):
-                    repeat_end_date = datetime.fromisoformat(payload.get("repeatEndDate")).date()
-                
-                # 生成重复事件
-                events = generate_repeat_events(base_event_data, repeat_type, repeat_end_date)
-                logging.info(f"[生成重复事件] 生成了 {len(events)} 个事件")
-                for event in events:
-                    event.user_id = current_user_id
-                    session.add(event)
-                session.commit()
-                clear_stats_cache()  # 清除统计缓存
-                
-                return jsonify({
-                    "message": f"成功创建 {len(events)} 个重复事件",
-                    "count": len(events),
-                    "events": [event_to_dict(e) for e in events[:10]]  # 只返回前10个
-                }), 201
-            else:
-                # 创建单个事件
-                event = Event(
-                    id=uuid4().hex,
-                    title=payload.get("title", "未命名事件"),
-                    start=datetime.fromisoformat(payload.get("start")) if payload.get("start") else datetime.utcnow(),
-                    end=datetime.fromisoformat(payload.get("end")) if payload.get("end") else datetime.utcnow(),
-                    allDay=payload.get("allDay", False),
-                    category=payload.get("category", "默认"),
-                    time=payload.get("time", ""),
-                    urgency=payload.get("urgency", "普通"),
-                    remark=remark_value,
-                    custom_type_id=payload.get("customTypeId"),
-                    plan_id=payload.get("planId"),
-                    goal_id=payload.get("goalId"),
-                    task_id=payload.get("taskId"),
-                    user_id=current_user_id
-                )
-                session.add(event)
-                session.commit()
-                clear_stats_cache()  # 清除统计缓存
-                return jsonify(event_to_dict(event)), 201
+            result = event_operations.create_event(
+                session, current_user_id, payload, app.config.get("REPEAT_STORAGE")
+            )
+            _commit_event_writes(session, current_user_id, result.affected_dates, result.score_deltas)
+            return jsonify(result.body), 201
+        except event_operations.EventOperationError as exc:
+            return jsonify({"error": str(exc)}), exc.status
+        finally:
+            session.close()
+
+    @app.route("/events/batch", methods=["POST"])
+    @jwt_required()
+    def batch_events():
+        current_user_id = int(get_jwt_identity())
+        payload = request.get_json(force=True) or {}
+        session = SessionLocal()
+        try:
+            results = event_operations.apply_batch(
+                session, current_user_id, payload.get("operations"), app.config.get("REPEAT_STORAGE")
+            )
+            affected_dates = set()
+            deltas = {}
+            for result in results:
+                affected_dates |= result.affected_dates
+                for target_date, delta in (result.score_deltas or {}).items():
+                    deltas[target_date] = deltas.get(target_date, 0) + delta
+            # 所有操作共用一个事务：每个受影响日期只落库一次积分，数据版本只递增一次
+            if any(result.changed for result in results):
+                _commit_event_writes(session, current_user_id, affected_dates, deltas)
+            return jsonify({
+                "count": len(results),
+                "results": [result.body for result in results]
+            }), 200
+        except event_operations.EventOperationError as exc:
+            session.rollback()
+            return jsonify({"error": str(exc)}), exc.status
         finally:
             session.close()
 
@@ -432,143 +638,13 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
         payload = request.get_json(force=True)
         session = SessionLocal()
         try:
-            event = session.query(Event).filter(Event.id == event_id, Event.user_id == current_user_id).first()
-            if not event:
-                return jsonify({"error": "事件不存在"}), 404
-
-            allowed_repeat_types = {"daily", "weekday", "weekend", "workday", "holiday"}
-
-            def normalize_remark(value):
-                if isinstance(value, str):
-                    trimmed = value.strip()
-                    return trimmed or None
-                return value
-
-            def parse_datetime(value, fallback):
-                if value in (None, ""):
-                    return fallback
-                return datetime.fromisoformat(value)
-
-            def parse_repeat_end(value):
-                if value in (None, ""):
-                    return None
-                return datetime.fromisoformat(value).date()
-
-            updated_title = payload.get("title", event.title)
-            updated_start = parse_datetime(payload.get("start"), event.start)
-            updated_end = parse_datetime(payload.get("end"), event.end)
-            updated_all_day = payload.get("allDay", event.allDay)
-            updated_category = payload.get("category", event.category)
-            updated_time = payload.get("time", event.time or "")
-            updated_urgency = payload.get("urgency", event.urgency)
-            remark_supplied = "remark" in payload
-            updated_remark = normalize_remark(payload.get("remark")) if remark_supplied else event.remark
-            updated_custom_type_id = payload.get("customTypeId", event.custom_type_id)
-            updated_plan_id = payload.get("planId", event.plan_id)
-            updated_goal_id = payload.get("goalId", event.goal_id)
-            updated_task_id = payload.get("taskId", event.task_id)
-            completion_supplied = "isCompleted" in payload
-            efficiency_supplied = "efficiency" in payload
-
-            has_repeat_flag = "isRepeat" in payload
-            requested_repeat_flag = bool(payload["isRepeat"]) if has_repeat_flag else event.is_repeat
-            repeat_type_raw = payload.get("repeatType")
-            requested_repeat_type = (repeat_type_raw or event.repeat_type or "daily")
-            if requested_repeat_flag and requested_repeat_type not in allowed_repeat_types:
-                return jsonify({"error": "重复类型无效"}), 400
-            repeat_end_supplied = "repeatEndDate" in payload
-            requested_repeat_end = parse_repeat_end(payload.get("repeatEndDate")) if repeat_end_supplied else event.repeat_end_date
-
-            if requested_repeat_flag and not event.is_repeat:
-                base_event_data = {
-                    "title": updated_title,
-                    "start": updated_start,
-                    "end": updated_end,
-                    "allDay": updated_all_day,
-                    "category": updated_category,
-                    "time": '' if updated_all_day else (updated_time or ''),
-                    "urgency": updated_urgency,
-                    "remark": updated_remark,
-                    "custom_type_id": updated_custom_type_id,
-                    "plan_id": updated_plan_id,
-                    "goal_id": updated_goal_id,
-                    "task_id": updated_task_id
-                }
-                repeat_group_id = uuid4().hex
-                events = generate_repeat_events(
-                    base_event_data,
-                    requested_repeat_type,
-                    requested_repeat_end,
-                    repeat_group_id=repeat_group_id
-                )
-                session.delete(event)
-                session.flush()
-                for generated in events:
-                    generated.user_id = current_user_id
-                    session.add(generated)
-                session.commit()
-                clear_stats_cache()
-                return jsonify({
-                    "message": f"成功转换为重复事件，共 {len(events)} 次",
-                    "count": len(events),
-                    "events": [event_to_dict(e) for e in events[:10]],
-                    "repeatGroupId": repeat_group_id
-                }), 200
-
-            original_date = event.start.date() if event.start else None
-
-            event.title = updated_title
-            event.start = updated_start
-            event.end = updated_end
-            event.allDay = updated_all_day
-            event.category = updated_category
-            event.time = None if updated_all_day else (updated_time or '')
-            event.urgency = updated_urgency
-            if remark_supplied:
-                event.remark = updated_remark
-            event.custom_type_id = updated_custom_type_id
-            event.plan_id = updated_plan_id
-            event.goal_id = updated_goal_id
-            event.task_id = updated_task_id
-            if completion_supplied:
-                event.is_completed = payload["isCompleted"]
-            if efficiency_supplied:
-                event.efficiency = payload["efficiency"]
-
-            if has_repeat_flag:
-                if payload["isRepeat"]:
-                    event.is_repeat = True
-                    event.repeat_type = requested_repeat_type
-                    if repeat_end_supplied:
-                        event.repeat_end_date = requested_repeat_end
-                    if not event.repeat_group_id:
-                        event.repeat_group_id = uuid4().hex
-                else:
-                    if event.is_repeat and event.repeat_group_id:
-                        session.query(Event).filter(
-                            Event.repeat_group_id == event.repeat_group_id,
-                            Event.user_id == current_user_id,
-                            Event.id != event.id
-                        ).delete(synchronize_session=False)
-                    event.is_repeat = False
-                    event.repeat_type = None
-                    event.repeat_end_date = None
-                    event.repeat_group_id = None
-            else:
-                if event.is_repeat:
-                    event.repeat_type = requested_repeat_type
-                    if repeat_end_supplied:
-                        event.repeat_end_date = requested_repeat_end
-
-            if event.start and original_date and event.start.date() != original_date:
-                calculate_and_update_daily_score(session, event, current_user_id)
-                recalculate_daily_score_for_date(session, original_date, current_user_id)
-            else:
-                calculate_and_update_daily_score(session, event, current_user_id)
-
-            session.commit()
-            clear_stats_cache()
-            return jsonify(event_to_dict(event)), 200
+            result = event_operations.update_event(
+                session, current_user_id, event_id, payload, app.config.get("REPEAT_STORAGE")
+            )
+            _commit_event_writes(session, current_user_id, result.affected_dates, result.score_deltas)
+            return jsonify(result.body), 200
+        except event_operations.EventOperationError as exc:
+            return jsonify({"error": str(exc)}), exc.status
         finally:
             session.close()
 
@@ -579,36 +655,11 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
         delete_all = request.args.get('deleteAll', 'false').lower() == 'true'
         session = SessionLocal()
         try:
-            event = session.query(Event).filter(Event.id == event_id, Event.user_id == current_user_id).first()
-            if not event:
-                return jsonify({"error": "事件不存在"}), 404
-
-            affected_dates = set()
-            
-            if delete_all and event.is_repeat and event.repeat_group_id:
-                # 删除所有重复事件
-                repeat_events = session.query(Event).filter(
-                    Event.repeat_group_id == event.repeat_group_id,
-                    Event.user_id == current_user_id
-                ).all()
-                
-                for repeat_event in repeat_events:
-                    if repeat_event.is_completed and repeat_event.start:
-                        affected_dates.add(repeat_event.start.date())
-                    session.delete(repeat_event)
-            else:
-                # 只删除当前事件
-                if event.is_completed and event.start:
-                    affected_dates.add(event.start.date())
-                session.delete(event)
-            
-            session.flush()
-            # 重新计算受影响日期的积分
-            for date in affected_dates:
-                recalculate_daily_score_for_date(session, date, current_user_id)
-            session.commit()
-            clear_stats_cache()  # 清除统计缓存
-            return jsonify({"status": "deleted"}), 200
+            result = event_operations.delete_event(session, current_user_id, event_id, delete_all)
+            _commit_event_writes(session, current_user_id, result.affected_dates, result.score_deltas)
+            return jsonify(result.body), 200
+        except event_operations.EventOperationError as exc:
+            return jsonify({"error": str(exc)}), exc.status
         finally:
             session.close()
 
@@ -619,21 +670,13 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
         payload = request.get_json(force=True)
         session = SessionLocal()
         try:
-            event = session.query(Event).filter(Event.id == event_id, Event.user_id == current_user_id).first()
-            if not event:
-                return jsonify({"error": "事件不存在"}), 404
-            
-            efficiency = payload.get("efficiency")
-            if efficiency not in ["high", "medium", "low"]:
-                return jsonify({"error": "效率评分必须为 high/medium/low"}), 400
-            
-            event.is_completed = True
-            event.efficiency = efficiency
-            session.flush()
-            calculate_and_update_daily_score(session, event, current_user_id)
-            session.commit()
-            clear_stats_cache()  # 清除统计缓存
-            return jsonify(event_to_dict(event)), 200
+            result = event_operations.complete_event(
+                session, current_user_id, event_id, payload.get("efficiency")
+            )
+            _commit_event_writes(session, current_user_id, result.affected_dates, result.score_deltas)
+            return jsonify(result.body), 200
+        except event_operations.EventOperationError as exc:
+            return jsonify({"error": str(exc)}), exc.status
         finally:
             session.close()
 
@@ -643,23 +686,60 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
         current_user_id = int(get_jwt_identity())
         session = SessionLocal()
         try:
-            event = session.query(Event).filter(Event.id == event_id, Event.user_id == current_user_id).first()
-            if not event:
-                return jsonify({"error": "事件不存在"}), 404
-
-            if not event.is_completed:
-                return jsonify(event_to_dict(event)), 200
-
-            event.is_completed = False
-            event.efficiency = None
-            session.flush()
-            calculate_and_update_daily_score(session, event, current_user_id)
-            session.commit()
-            clear_stats_cache()  # 清除统计缓存
-            return jsonify(event_to_dict(event)), 200
+            result = event_operations.undo_complete_event(session, current_user_id, event_id)
+            if result.changed:
+                _commit_event_writes(session, current_user_id, result.affected_dates, result.score_deltas)
+            return jsonify(result.body), 200
+        except event_operations.EventOperationError as exc:
+            return jsonify({"error": str(exc)}), exc.status
         finally:
             session.close()
 
+    # 流式响应辅助函数：?stream=1 时以生成器逐块写出 JSON 数组，内存占用与行数无关
+    def _wants_stream() -> bool:
+        return request.args.get("stream", "").lower() in ("1", "true")
+
+    # ?format=columnar 选择按列的紧凑格式；参数无效时返回 None
+    def _wants_columnar():
+        value = request.args.get("format", "json").lower()
+        if value not in ("json", "columnar"):
+            return None
+        return value == "columnar"
+
+    def _stream_json_array(produce_rows, to_dict):
+        """produce_rows(session) 返回可迭代的行；会话由生成器持有，写完或客户端断开后关闭。"""
+        def generate():
+            session = SessionLocal()
+            try:
+                yield "["
+                chunk = []
+                first = True
+                for row in produce_rows(session):
+                    chunk.append(app.json.dumps(to_dict(row)))
+                    if len(chunk) >= STREAM_BATCH_SIZE:
+                        yield ("" if first else ",") + ",".join(chunk)
+                        first = False
+                        chunk = []
+                if chunk:
+                    yield ("" if first else ",") + ",".join(chunk)
+                yield "]"
+            finally:
+                session.close()
+
+        return app.response_class(stream_with_context(generate()), mimetype="application/json")
+
+    # 事件写操作的统一收尾：按增量或全量落库积分、记录变更并提交
+    def _commit_event_writes(session, user_id: int, affected_dates, score_deltas=None) -> None:
+        session.flush()
+        apply_score_changes(session, user_id, affected_dates, score_deltas or {})
+        record_changes(session, user_id)
+        touched = _pending_stats_days(session)
+        touched.setdefault(user_id, set()).update(affected_dates or (), score_deltas or ())
+        session.commit()
+        _invalidate_stats(touched)  # 只清除受影响用户、受影响年/月的统计缓存
+        if affected_dates:
+            score_queue.notify_worker()  # 需全量重算的日期已入队，唤醒后台线程
+
     @app.route("/api/plans", methods=["GET", "OPTIONS"])
     def list_plans_api():
         if request.method == "OPTIONS":
@@ -668,9 +748,12 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
         from flask_jwt_extended import verify_jwt_in_request
         verify_jwt_in_request()
         current_user_id = int(get_jwt_identity())
+        etag, not_modified = _check_etag("plans", current_user_id)
+        if not_modified:
+            return not_modified
         try:
             payload = plan_service.list_plans(current_user_id)
-            return jsonify(payload), 200
+            return _with_etag(jsonify(payload), etag), 200
         except plan_service.PlanServiceError as exc:
             logging.error("List plans failed: %s", exc)
             return jsonify({"error": str(exc)}), 400
@@ -931,15 +1014,30 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
                 .all()
             )
 
+            progress = {
+                (row.plan_id, row.goal_id, row.task_id): [int(row.total or 0), int(row.completed or 0)]
+                for row in rows
+            }
+            # 关联任务的重复系列中尚未实例化的虚拟实例同样计入总数
+            virtual_counts = recurrence.series_occurrence_counts(
+                session,
+                current_user_id,
+                key=lambda series: (series.plan_id, series.goal_id, series.task_id)
+            )
+            for task_key, count in virtual_counts.items():
+                if task_key[2] is None:
+                    continue
+                progress.setdefault(task_key, [0, 0])[0] += count
+
             items = [
                 {
-                    "plan_id": row.plan_id,
-                    "goal_id": row.goal_id,
-                    "task_id": row.task_id,
-                    "total": int(row.total or 0),
-                    "completed": int(row.completed or 0)
+                    "plan_id": plan_id,
+                    "goal_id": goal_id,
+                    "task_id": task_id,
+                    "total": total,
+                    "completed": completed
                 }
-                for row in rows
+                for (plan_id, goal_id, task_id), (total, completed) in progress.items()
             ]
             return jsonify({"items": items}), 200
         finally:
@@ -966,19 +1064,23 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
             if (plan_id, goal_id) not in valid_pairs:
                 return jsonify({"error": "目标不存在或无权访问"}), 404
 
-            deleted = (
-                session.query(Event)
-                .filter(
-                    Event.user_id == current_user_id,
-                    Event.plan_id == plan_id,
-                    Event.goal_id == goal_id,
-                    Event.task_id == task_id,
-                    Event.is_completed == True
-                )
-                .delete(synchronize_session=False)
+            task_filter = (
+                Event.user_id == current_user_id,
+                Event.plan_id == plan_id,
+                Event.goal_id == goal_id,
+                Event.task_id == task_id,
+                Event.is_completed == True
             )
+            # 删除的都是已完成事件，其所在日期的积分需要重算
+            completed_days = {start.date() for (start,) in session.query(Event.start).filter(*task_filter)}
+            deleted = delete_events_where(session, *task_filter)
+            score_queue.mark_dirty(session, current_user_id, completed_days)
+            record_changes(session, current_user_id)
+            touched = _pending_stats_days(session)
             session.commit()
-            clear_stats_cache()
+            _invalidate_stats(touched)
+            if completed_days:
+                score_queue.notify_worker()
             return jsonify({"deleted": int(deleted or 0)}), 200
         finally:
             session.close()
@@ -987,10 +1089,20 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
     @jwt_required()
     def list_ideas():
         current_user_id = int(get_jwt_identity())
+        etag, not_modified = _check_etag("ideas", current_user_id)
+        if not_modified:
+            return not_modified
+        if _wants_stream():
+            return _with_etag(_stream_json_array(
+                lambda session: session.query(Idea).filter_by(user_id=current_user_id)
+                .order_by(Idea.sort_order.asc(), Idea.createdAt.desc()).yield_per(STREAM_BATCH_SIZE),
+                idea_to_dict
+            ), etag), 200
+
         session = SessionLocal()
         try:
             ideas = session.query(Idea).filter_by(user_id=current_user_id).order_by(Idea.sort_order.asc(), Idea.createdAt.desc()).all()
-            return jsonify([idea_to_dict(i) for i in ideas]), 200
+            return _with_etag(jsonify([idea_to_dict(i) for i in ideas]), etag), 200
         finally:
             session.close()
 
@@ -1013,6 +1125,7 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
                 user_id=current_user_id
             )
             session.add(idea)
+            bump_data_version(session, current_user_id)
             session.commit()
             return jsonify(idea_to_dict(idea)), 201
         finally:
@@ -1039,6 +1152,8 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
                 raw_sort_order = payload.get("sortOrder", payload.get("sort_order", idea.sort_order))
                 idea.sort_order = int(raw_sort_order)
             
+            bump_data_version(session, current_user_id)
+            
             session.commit()
             return jsonify(idea_to_dict(idea)), 200
         finally:
@@ -1064,6 +1179,8 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
             for index, idea_id in enumerate(normalized_ids):
                 idea_map[idea_id].sort_order = index
 
+            bump_data_version(session, current_user_id)
+
             session.commit()
 
             ordered_ideas = session.query(Idea).filter_by(user_id=current_user_id).order_by(Idea.sort_order.asc(), Idea.createdAt.desc()).all()
@@ -1081,6 +1198,7 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
             if not idea:
                 return jsonify({"status": "not_found"}), 404
             session.delete(idea)
+            bump_data_version(session, current_user_id)
             session.commit()
             return jsonify({"status": "deleted"}), 200
         finally:
@@ -1093,6 +1211,17 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
         current_user_id = int(get_jwt_identity())
         claims = get_jwt()
         is_admin = bool(claims.get("is_admin"))
+        etag, not_modified = _check_etag("event-types:admin" if is_admin else "event-types", current_user_id)
+        if not_modified:
+            return not_modified
+        cache_key = f"event-types:{etag}"
+        try:
+            cached = cache_backend.get_backend().get(cache_key)
+        except Exception:
+            logging.exception("读取事件类型缓存失败")
+            cached = None
+        if cached is not None:
+            return _with_etag(app.response_class(cached, mimetype=app.json.mimetype), etag), 200
         session = SessionLocal()
         try:
             global_types = (
@@ -1143,7 +1272,12 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
                 ordered_unique_types.append(item)
 
             ordered_unique_types.sort(key=lambda t: (t.name or "").lower())
-            return jsonify([event_type_to_dict(t) for t in ordered_unique_types]), 200
+            body = app.json.dumps([event_type_to_dict(t) for t in ordered_unique_types])
+            try:
+                cache_backend.get_backend().set(cache_key, body, EVENT_TYPES_CACHE_TTL_SECONDS)
+            except Exception:
+                logging.exception("写入事件类型缓存失败")
+            return _with_etag(app.response_class(body, mimetype=app.json.mimetype), etag), 200
         finally:
             session.close()
 
@@ -1188,6 +1322,8 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
                 user_id=target_user_id
             )
             session.add(event_type)
+            # 全局类型影响所有用户的类型列表
+            bump_data_version(session, target_user_id)
             session.commit()
             return jsonify(event_type_to_dict(event_type)), 201
         except IntegrityError:
@@ -1241,6 +1377,7 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
                 if new_color:
                     event_type.color = new_color
 
+            bump_data_version(session, event_type.user_id)
             session.commit()
 
             if event_type.user_id is None and original_name:
@@ -1255,6 +1392,7 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
                     if "color" in payload and event_type.color:
                         duplicate.color = event_type.color
                 if duplicates:
+                    bump_data_version(session, None)
                     session.commit()
 
             return jsonify(event_type_to_dict(event_type)), 200
@@ -1288,15 +1426,33 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
                     ).all()
                     affected_type_ids.extend([dup.id for dup in duplicates])
 
+            bump_data_version(session, event_type.user_id)
             if affected_type_ids:
+                # 受影响的事件分属多个用户，change_seq 取各自所属用户递增后的数据版本
+                def owner_version(model):
+                    return func.coalesce(
+                        select(User.data_version).where(User.id == model.user_id).scalar_subquery(), 0
+                    )
+
+                rollups.note_event_days(session, session.query(Event.user_id, Event.start).filter(
+                    Event.custom_type_id.in_(affected_type_ids)
+                ))
                 session.query(Event).filter(Event.custom_type_id.in_(affected_type_ids)).update(
-                    {Event.custom_type_id: None}, synchronize_session=False
+                    {Event.custom_type_id: None, Event.change_seq: owner_version(Event)}, synchronize_session=False
+                )
+                for series in session.query(EventSeries).filter(EventSeries.custom_type_id.in_(affected_type_ids)):
+                    recurrence.note_series_span(session, series)
+                session.query(EventSeries).filter(EventSeries.custom_type_id.in_(affected_type_ids)).update(
+                    {EventSeries.custom_type_id: None, EventSeries.change_seq: owner_version(EventSeries)},
+                    synchronize_session=False
                 )
 
             for duplicate in duplicates:
                 session.delete(duplicate)
             session.delete(event_type)
+            touched = _pending_stats_days(session)
             session.commit()
+            _invalidate_stats(touched)
             return jsonify({"status": "deleted"}), 200
         finally:
             session.close()
@@ -1308,6 +1464,9 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
         start_date_str = request.args.get("start_date")
         end_date_str = request.args.get("end_date")
         current_user_id = int(get_jwt_identity())
+        columnar = _wants_columnar()
+        if columnar is None:
+            return jsonify({"error": "format 参数无效"}), 400
 
         session = SessionLocal()
         try:
@@ -1323,21 +1482,18 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
                 end_date = datetime.fromisoformat(end_date_str).date()
                 query = query.filter(DailyScore.date <= end_date)
 
-            # 若指定了范围，先按事件重新计算该范围内每日积分，修复历史残留/不一致数据
-            if start_date or end_date:
-                if not start_date:
-                    start_date = end_date
-                if not end_date:
-                    end_date = start_date
-
-                cursor = start_date
-                while cursor <= end_date:
-                    recalculate_daily_score_for_date(session, cursor, current_user_id)
-                    cursor += timedelta(days=1)
-                session.flush()
+            # 只重算所读范围内仍在待重算队列中的日期；过多时交给后台线程，并在响应头中标记不新鲜
+            fresh = score_queue.refresh_window(session, current_user_id, start_date, end_date)
+            session.commit()
 
             scores = query.order_by(DailyScore.date).all()
-            return jsonify([daily_score_to_dict(s) for s in scores]), 200
+            items = [daily_score_to_dict(s) for s in scores]
+            if columnar:
+                response = jsonify(to_columnar(items, DAILY_SCORE_COLUMNAR_FIELDS))
+            else:
+                response = jsonify(items)
+            response.headers["X-Scores-Fresh"] = "1" if fresh else "0"
+            return response, 200
         finally:
             session.close()
 
@@ -1359,16 +1515,8 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
             ).all()
             type_map = {t.id: t.name for t in event_types}
             
-            # 2. 获取当日所有已完成事件
-            from sqlalchemy import and_
-            events = session.query(Event).filter(
-                and_(
-                    Event.user_id == current_user_id,
-                    Event.is_completed == True,
-                    Event.start >= datetime.combine(target_date, datetime.min.time()),
-                    Event.start < datetime.combine(target_date + timedelta(days=1), datetime.min.time())
-                )
-            ).all()
+            # 2. 读取当日按类型与效率汇总的已完成事件
+            totals = rollups.rollup_totals(session, current_user_id, target_date, target_date)
             
             # 3. 聚合数据
             # 结构: { type_id: { 'high': {count, score}, 'medium': ..., 'low': ... } }
@@ -1387,24 +1535,18 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
                 }
             
             # 填充数据
-            for event in events:
-                type_id = event.custom_type_id
-                efficiency = event.efficiency
-                
-                # 如果事件类型已被删除或未设置，归类为"默认"或忽略
-                # 这里简单处理：如果 type_id 不在 stats 中（可能是默认类型或已删除），
-                # 我们可以创建一个临时的 entry 或者归类到 "默认"
-                # 假设 "默认" 类型没有 ID 或者 ID 不在 event_types 表中
-                
-                target_entry = None
-                if type_id and type_id in stats:
-                    target_entry = stats[type_id]
+            for total in totals:
+                if not total.completed_count or total.efficiency not in ['high', 'medium', 'low']:
+                    continue
+
+                # 未设置类型或类型已被删除的事件归入"默认"
+                if total.type_id and total.type_id in stats:
+                    target_entry = stats[total.type_id]
                 else:
-                    # 处理默认类型或未知类型
                     default_key = 'default'
                     if default_key not in stats:
                         stats[default_key] = {
-                            'name': event.category or '默认',
+                            'name': '默认',
                             'color': '#667eea', # 默认颜色
                             'details': {
                                 'high': {'count': 0, 'score': 0},
@@ -1413,13 +1555,9 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
                             }
                         }
                     target_entry = stats[default_key]
-                
-                if efficiency in ['high', 'medium', 'low']:
-                    score = calculate_event_score(event)
-                    units = calculate_event_units(event)
-                    
-                    target_entry['details'][efficiency]['count'] += units
-                    target_entry['details'][efficiency]['score'] += score
+
+                target_entry['details'][total.efficiency]['count'] += total.half_hour_units
+                target_entry['details'][total.efficiency]['score'] += total.score
             
             # 4. 转换为列表格式返回
             result = []
@@ -1453,94 +1591,88 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
         year = request.args.get('year', type=int)
         month = request.args.get('month', type=int)
         
-        # 构建缓存键
-        cache_key = f"{current_user_id}_{year or 'all'}_{month or 'all'}"
-        
         # 检查缓存是否有效
-        now = datetime.utcnow()
-        cache_ttl = stats_cache.get('ttl', 60)
-        if (cache_key in stats_cache and 
-            stats_cache[cache_key].get('data') is not None and 
-            stats_cache[cache_key].get('timestamp') is not None and 
-            (now - stats_cache[cache_key]['timestamp']).total_seconds() < cache_ttl):
-            logging.info(f"返回缓存的统计数据: {cache_key}")
-            return jsonify(stats_cache[cache_key]['data']), 200
+        cached, cache_generation = stats_cache.lookup(current_user_id, year, month)
+        if cached is not None:
+            logging.info(f"返回缓存的统计数据: {current_user_id}_{year or 'all'}_{month or 'all'}")
+            return jsonify(cached), 200
         
         session = SessionLocal()
         try:
-            from sqlalchemy import func, extract
-            from calendar import monthrange
-            
-            # 构建时间过滤条件
-            event_query = session.query(Event).filter(Event.user_id == current_user_id)
-            score_query = session.query(DailyScore).filter(DailyScore.user_id == current_user_id)
+            from sqlalchemy import func
             
-            start_date = None
-            end_date = None
-            days_in_period = 0
+            # 构建时间过滤条件：年度或月度的半开区间 [start, end)，可走 idx_user_date 范围扫描
+            period = period_bounds(year, month)
+            score_query = session.query(DailyScore).filter(
+                DailyScore.user_id == current_user_id, *within(DailyScore.date, period)
+            )
             
-            if year and month:
-                # 月度筛选
-                start_date = datetime(year, month, 1).date()
-                days_in_month = monthrange(year, month)[1]
-                end_date = datetime(year, month, days_in_month).date()
-                days_in_period = days_in_month
-                
-                event_query = event_query.filter(
-                    extract('year', Event.start) == year,
-                    extract('month', Event.start) == month
-                )
-                score_query = score_query.filter(
-                    extract('year', DailyScore.date) == year,
-                    extract('month', DailyScore.date) == month
-                )
-            elif year:
-                # 年度筛选
-                start_date = datetime(year, 1, 1).date()
-                end_date = datetime(year, 12, 31).date()
-                days_in_period = 366 if year % 4 == 0 and (year % 100 != 0 or year % 400 == 0) else 365
-                
-                event_query = event_query.filter(extract('year', Event.start) == year)
-                score_query = score_query.filter(extract('year', DailyScore.date) == year)
+            start_date = period.start if period else None
+            end_date = period.last_day if period else None
+            days_in_period = period.days if period else 0
             
+            # 重复系列的虚拟实例不落库，按统计区间展开一次，按类型计数并供记录时长使用
+            period_window_start = datetime.combine(start_date, datetime.min.time()) if start_date else None
+            period_window_end = datetime.combine(period.end, datetime.min.time()) if period else None
+            virtual_series = recurrence.series_in_window(
+                session, current_user_id, period_window_start, period_window_end
+            )
+            virtual_counts = recurrence.count_window_occurrences(virtual_series, key=lambda series: series.custom_type_id)
+
+            # 已落库事件按类型的汇总（效率分布为条件聚合），一条 GROUP BY 覆盖数量、效率与时长统计
+            totals = rollups.rollup_type_totals(session, current_user_id, start_date, end_date)
+
             # 统计事件数量
-            total_events = event_query.count()
-            completed_events = event_query.filter(Event.is_completed == True).count()
+            total_events = sum(total.event_count for total in totals) + sum(virtual_counts.values())
+            completed_events = sum(total.completed_count for total in totals)
             
             # 统计各效率等级的事件数量
-            high_efficiency = event_query.filter(Event.efficiency == 'high').count()
-            medium_efficiency = event_query.filter(Event.efficiency == 'medium').count()
-            low_efficiency = event_query.filter(Event.efficiency == 'low').count()
+            efficiency_counts = {level: 0 for level in rollups.EFFICIENCY_LEVELS}
+            for total in totals:
+                for level, count in total.efficiency_counts.items():
+                    efficiency_counts[level] += count
             
-            # 统计总积分
-            total_score = score_query.with_entities(func.sum(DailyScore.total_score)).scalar() or 0
-            
-            # 统计平均每日积分
-            score_count = score_query.count()
+            # 先重算统计区间内仍在待重算队列中的日期，过多时交给后台线程并标记不新鲜
+            scores_fresh = score_queue.refresh_window(session, current_user_id, start_date, end_date)
+            session.commit()
+
+            # 积分只查一次：月度读取当月每日积分（同时用于得分明细），其余区间一条 SUM/COUNT 聚合
+            stored_scores = {}
+            if year and month:
+                stored_scores = dict(score_query.with_entities(DailyScore.date, DailyScore.total_score).all())
+                total_score = sum(score or 0 for score in stored_scores.values())
+                # 月度按当月天数平均，没有积分行的日期记为 0 分
+                score_count = days_in_period
+            else:
+                total_score, score_count = score_query.with_entities(
+                    func.sum(DailyScore.total_score), func.count(DailyScore.id)
+                ).one()
+                total_score = int(total_score or 0)
             avg_daily_score = round(total_score / score_count, 2) if score_count > 0 else 0
             
             # 计算记录率（仅月度有效）
             record_rate = 0
             total_recorded_hours = 0
             if year and month and days_in_period > 0:
-                # 计算当月所有事件的总时长（小时），排除全天事件
-                duration_events = event_query.filter(Event.allDay == False).with_entities(Event.start, Event.end).all()
-                for event_start, event_end in duration_events:
-                    if event_start and event_end:
-                        duration = (event_end - event_start).total_seconds() / 3600  # 转换为小时
-                        total_recorded_hours += duration
+                # 当月非全天事件（含虚拟实例）区间并集落在每日计分时间窗内的小时数，重叠时段只计一次
+                intervals = coverage.event_intervals(session, current_user_id, period)
+                intervals.extend(recurrence.occurrence_intervals(virtual_series))
+                total_recorded_hours = coverage.compute_coverage(intervals, start_date, end_date).total_hours
                 
-                # 记录率 = 当月记录的时间总数 / (当月天数 * 17)
-                total_available_hours = days_in_period * 17
+                # 记录率 = 当月记录的时间总数 / (当月天数 * 每天计分时间窗小时数)
+                total_available_hours = days_in_period * RULES.window_hours
                 record_rate = round((total_recorded_hours / total_available_hours * 100), 2) if total_available_hours > 0 else 0
             
             # 统计事件类型分布
             type_distribution = []
+            type_counts = {}
+            for total in totals:
+                type_counts[total.type_id] = type_counts.get(total.type_id, 0) + total.event_count
+            for type_id, count in virtual_counts.items():
+                type_counts[type_id] = type_counts.get(type_id, 0) + count
             event_types = session.query(EventType).filter_by(user_id=current_user_id).all()
             for event_type in event_types:
-                # Re-use event_query but with custom_type_id filter
-                # Note: event_query already has user_id filter
-                type_count = event_query.filter(Event.custom_type_id == event_type.id).count()
+                type_count = type_counts.get(event_type.id, 0)
                 if type_count > 0:
                     type_distribution.append({
                         'typeName': event_type.name,
@@ -1551,20 +1683,14 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
             # 获取月度得分明细（仅月度有效）
             daily_scores = []
             if year and month and start_date and end_date:
-                # 先按事件重算当月积分，避免残留/不一致
-                cursor = start_date
-                while cursor <= end_date:
-                    recalculate_daily_score_for_date(session, cursor, current_user_id)
-                    cursor += timedelta(days=1)
-                session.flush()
-
-                scores = score_query.order_by(DailyScore.date).all()
-                for score in scores:
+                day = start_date
+                while day <= end_date:
                     daily_scores.append({
-                        'date': score.date.strftime('%Y-%m-%d'),
-                        'day': score.date.day,
-                        'score': score.total_score
+                        'date': day.strftime('%Y-%m-%d'),
+                        'day': day.day,
+                        'score': stored_scores.get(day) or 0
                     })
+                    day += timedelta(days=1)
             
             # 构建统计数据
             stats = {
@@ -1576,27 +1702,22 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
                 'completionRate': round((completed_events / total_events * 100), 2) if total_events > 0 else 0,
                 'recordRate': record_rate,
                 'recordedHours': round(total_recorded_hours, 2),
-                'availableHours': days_in_period * 17 if days_in_period > 0 else 0,
-                'efficiency': {
-                    'high': high_efficiency,
-                    'medium': medium_efficiency,
-                    'low': low_efficiency
-                },
+                'availableHours': days_in_period * RULES.window_hours if days_in_period > 0 else 0,
+                'workdays': holiday_calendar.count_workdays(start_date, end_date) if start_date and end_date else 0,
+                'efficiency': efficiency_counts,
                 'score': {
                     'total': total_score,
                     'average': avg_daily_score
                 },
                 'typeDistribution': type_distribution,
-                'dailyScores': daily_scores
+                'dailyScores': daily_scores,
+                'scoresFresh': scores_fresh
             }
             
-            # 更新缓存
-            if cache_key not in stats_cache:
-                stats_cache[cache_key] = {}
-            stats_cache[cache_key]['data'] = stats
-            stats_cache[cache_key]['timestamp'] = now
-            stats_cache[cache_key]['ttl'] = stats_cache.get('ttl', 60)
-            logging.info(f"统计数据已缓存: {cache_key}")
+            # 更新缓存（积分尚未重算完时不缓存，下次请求重新读取）
+            if scores_fresh:
+                stats_cache.put(current_user_id, year, month, stats, cache_generation)
+                logging.info(f"统计数据已缓存: {current_user_id}_{year or 'all'}_{month or 'all'}")
             
             return jsonify(stats), 200
         except Exception as e:
@@ -1605,12 +1726,103 @@ def register_routes(app: Flask) -> None:  # 定义路由注册函数以保持结
         finally:
             session.close()
 
-    # 清除统计缓存的辅助函数
-    def clear_stats_cache():
-        """事件发生变化时清除统计缓存"""
-        stats_cache.clear()
-        stats_cache['ttl'] = 60
-        logging.info("统计缓存已清除")
+    # 记录时长覆盖 API：区间并集在每日计分时间窗内的覆盖小时数
+    @app.route("/stats/coverage", methods=["GET"])
+    @jwt_required()
+    def get_stats_coverage():
+        """
+        按天、按月、按类型返回非全天事件（含虚拟实例）在每日计分时间窗内覆盖的小时数，重叠时段只计一次
+        查询参数:
+        - year: 年份(必填)，如 2025
+        - month: 月份(可选，1-12)
+        """
+        current_user_id = int(get_jwt_identity())
+        year = request.args.get('year', type=int)
+        month = request.args.get('month', type=int)
+        if not year or (month is not None and not 1 <= month <= 12):
+            return jsonify({"error": "year 参数必填，month 须为 1-12"}), 400
+        etag, not_modified = _check_etag("stats-coverage", current_user_id)
+        if not_modified:
+            return not_modified
+        period = period_bounds(year, month)
+
+        session = SessionLocal()
+        try:
+            event_types = session.query(EventType).filter(
+                or_(EventType.user_id == current_user_id, EventType.user_id.is_(None))
+            ).all()
+            type_map = {t.id: t for t in event_types}
+
+            window_start = datetime.combine(period.start, datetime.min.time())
+            window_end = datetime.combine(period.end, datetime.min.time())
+            intervals = coverage.event_intervals(session, current_user_id, period)
+            intervals.extend(recurrence.occurrence_intervals(
+                recurrence.series_in_window(session, current_user_id, window_start, window_end)
+            ))
+            # 未设置类型或类型已被删除的事件合并为"默认"，并集一起计算
+            intervals = [
+                (start, end, type_id if type_id in type_map else None) for start, end, type_id in intervals
+            ]
+            result = coverage.compute_coverage(intervals, period.start, period.last_day)
+
+            types = []
+            for type_id, hours in result.by_type.items():
+                event_type = type_map.get(type_id)
+                types.append({
+                    'typeId': type_id or None,
+                    'typeName': event_type.name if event_type else '默认',
+                    'typeColor': event_type.color if event_type else '#667eea',
+                    'hours': round(hours, 2)
+                })
+            types.sort(key=lambda item: -item['hours'])
+
+            available_hours = period.days * RULES.window_hours
+            payload = {
+                'year': year,
+                'month': month,
+                'windowHours': RULES.window_hours,
+                'availableHours': available_hours,
+                'coveredHours': round(result.total_hours, 2),
+                'recordRate': round(result.total_hours / available_hours * 100, 2) if available_hours else 0,
+                'days': [
+                    {'date': day.isoformat(), 'hours': round(hours, 2)} for day, hours in result.by_day.items()
+                ],
+                'months': [
+                    {'month': f"{y:04d}-{m:02d}", 'hours': round(hours, 2)} for (y, m), hours in result.by_month.items()
+                ],
+                'types': types
+            }
+            return _with_etag(jsonify(payload), etag), 200
+        finally:
+            session.close()
+
+    # 条件请求辅助函数：按用户数据版本计算 ETag，命中 If-None-Match 时直接返回 304
+    def _check_etag(scope: str, user_id: int, version: int = None):
+        if version is None:
+            version = cached_data_version(user_id)
+        etag = build_etag(scope, user_id, version, request.args)
+        if request.if_none_match.contains(etag):
+            return etag, _with_etag(app.response_class(status=304), etag)
+        return etag, None
+
+    def _with_etag(response, etag: str):
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    # 提交前收集本事务影响统计的 {用户: 日期}：事件行的日期与虚拟系列覆盖的日期
+    def _pending_stats_days(session):
+        touched = rollups.pending_event_days(session)
+        for user_id, days in recurrence.pending_series_days(session).items():
+            touched.setdefault(user_id, set()).update(days)
+        return touched
+
+    # 按提交前收集的 {用户: 日期} 清除统计缓存
+    def _invalidate_stats(touched) -> None:
+        for user_id, days in touched.items():
+            removed = stats_cache.invalidate(user_id, days)
+            if removed:
+                logging.info(f"统计缓存已清除: 用户 {user_id} 的 {removed} 个区间")
 
 
 def seed_demo_data() -> None:  # 定义示例数据填充函数
@@ -1780,4 +1992,6 @@ app = create_app()  # 创建全局应用实例供 WSGI 使用
 
 
 if __name__ == "__main__":  # 仅在直接运行文件时执行
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":  # 只在重载器拉起的服务子进程中启动后台重算
+        start_score_worker(app)
     app.run(debug=True, use_reloader=True)  # 启动开发服务器
@@ -17,4 +17,16 @@ class Config:
     SQLALCHEMY_DATABASE_URI = (
         f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}?charset=utf8mb4"
     )
+    # 重复事件存储方式：virtual 仅存系列定义并在读取时展开；materialized 按天写入事件行
+    REPEAT_STORAGE = os.getenv('REPEAT_STORAGE', 'virtual')
+    # 后台积分重算线程数（0 表示不启动，仅在读取时内联重算）与轮询间隔（秒）；
+    # 由 `flask score-worker` 进程或开发服务器使用，gunicorn 的 worker 不会启动
+    SCORE_WORKER_THREADS = int(os.getenv('SCORE_WORKER_THREADS', '2'))
+    SCORE_WORKER_POLL_SECONDS = float(os.getenv('SCORE_WORKER_POLL_SECONDS', '30'))
+    # 各缓存共用的后端：memory://（进程内）、sqlite:///文件路径（同主机多 worker 共享）、redis://主机:端口/库号
+    CACHE_URL = os.getenv('CACHE_URL', 'memory://')
+    # memory/sqlite 后端最多保存的缓存条目数（redis 由服务端 maxmemory 控制）
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '1024'))
+    # /stats 响应缓存有效期（秒）
+    STATS_CACHE_TTL_SECONDS = float(os.getenv('STATS_CACHE_TTL_SECONDS', '60'))
     # 其他可扩展配置项
@@ -5,7 +5,11 @@ class DailyScore(Base):
     __tablename__ = 'daily_scores'
     id = Column(String(32), primary_key=True)
     date = Column(Date, nullable=False, index=True)  # 日期不再唯一，因为不同用户同一天都有分数
-    total_score = Column(Integer, default=0)
+    total_score = Column(Integer, default=0)  # 封顶后的当日积分
+    # 未封顶的当日原始积分和，增量维护；NULL 表示尚未由全量重算初始化
+    raw_score = Column(Integer, nullable=True, default=None)
+    # 产生该行积分的计分规则版本（scoring.RULES.version）；与当前版本不同或为 NULL 的行在读取时重算
+    rules_version = Column(Integer, nullable=True, default=None, index=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=True, index=True) # 关联用户ID
     
     # 复合索引：用户+日期 应该是唯一的
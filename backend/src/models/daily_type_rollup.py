@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, Date, Integer, Float, ForeignKey
+from .base import Base
+
+
+class DailyTypeRollup(Base):
+    """按 (用户, 日期, 事件类型, 效率) 汇总的事件统计，随事件写入在同一事务内维护。"""
+
+    __tablename__ = 'daily_type_rollups'
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    date = Column(Date, primary_key=True)  # 事件开始时间所在日期
+    type_id = Column(String(32), primary_key=True, default='')  # '' 表示未设置类型
+    efficiency = Column(String(16), primary_key=True, default='')  # '' 表示未评效率
+    event_count = Column(Integer, nullable=False, default=0)
+    completed_count = Column(Integer, nullable=False, default=0)
+    half_hour_units = Column(Float, nullable=False, default=0)  # 已完成事件在计分时间窗内的半小时单位数
+    score = Column(Integer, nullable=False, default=0)  # 已完成事件的未封顶积分和
+    recorded_seconds = Column(Float, nullable=False, default=0)  # 非全天事件的时长合计
@@ -1,5 +1,6 @@
 
 from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv, find_dotenv
@@ -14,6 +15,10 @@ from . import annual_plan  # noqa: F401, 导入以注册模型到元数据
 from . import plan_goal  # noqa: F401, 导入以注册模型到元数据
 from . import goal_execution_queue  # noqa: F401, 导入以注册模型到元数据
 from . import goal_task_status  # noqa: F401, 导入以注册模型到元数据
+from . import event_series  # noqa: F401, 导入以注册模型到元数据
+from . import event_tombstone  # noqa: F401, 导入以注册模型到元数据
+from . import daily_type_rollup  # noqa: F401, 导入以注册模型到元数据
+from . import score_dirty_day  # noqa: F401, 导入以注册模型到元数据
 
 # 自动加载仓库根目录下的 .env 配置
 load_dotenv(find_dotenv(filename=".env", raise_error_if_not_found=False))
@@ -44,7 +49,11 @@ def init_db() -> None:
     _ensure_event_table_columns()
     _ensure_idea_table_columns()
     _ensure_user_id_columns()
+    _ensure_user_table_columns()
+    _ensure_event_series_columns()
+    _ensure_daily_score_columns()
     _cleanup_legacy_idea_columns()
+    _backfill_daily_type_rollups()
 
 
 def _ensure_idea_table_columns() -> None:
@@ -85,6 +94,72 @@ def _ensure_user_id_columns() -> None:
                 connection.execute(text(f"ALTER TABLE {table} ADD CONSTRAINT fk_{table}_user FOREIGN KEY (user_id) REFERENCES users(id)"))
                 # Data migration will be handled in seed_demo_data after admin user is ensured
 
+def _ensure_user_table_columns() -> None:
+    """Add newly introduced columns on existing users tables."""
+    inspector = inspect(engine)
+    if 'users' not in inspector.get_table_names():
+        return
+
+    existing_columns = {column['name'] for column in inspector.get_columns('users')}
+    if 'data_version' not in existing_columns:
+        with engine.begin() as connection:
+            connection.execute(text('ALTER TABLE users ADD COLUMN data_version BIGINT NOT NULL DEFAULT 0'))
+
+
+def _ensure_daily_score_columns() -> None:
+    """Add newly introduced columns on existing daily_scores tables."""
+    inspector = inspect(engine)
+    if 'daily_scores' not in inspector.get_table_names():
+        return
+
+    existing_columns = {column['name'] for column in inspector.get_columns('daily_scores')}
+    if 'raw_score' not in existing_columns:
+        with engine.begin() as connection:
+            connection.execute(text('ALTER TABLE daily_scores ADD COLUMN raw_score INT NULL'))
+    if 'rules_version' not in existing_columns:
+        with engine.begin() as connection:
+            connection.execute(text('ALTER TABLE daily_scores ADD COLUMN rules_version INT NULL'))
+            connection.execute(text('CREATE INDEX ix_daily_scores_rules_version ON daily_scores (rules_version)'))
+
+
+def _ensure_event_series_columns() -> None:
+    """Add newly introduced columns on existing event_series tables."""
+    inspector = inspect(engine)
+    if 'event_series' not in inspector.get_table_names():
+        return
+
+    existing_columns = {column['name'] for column in inspector.get_columns('event_series')}
+    if 'change_seq' not in existing_columns:
+        with engine.begin() as connection:
+            connection.execute(text(
+                'ALTER TABLE event_series '
+                'ADD COLUMN change_seq BIGINT NOT NULL DEFAULT 0, '
+                'ADD INDEX idx_series_user_change_seq (user_id, change_seq)'
+            ))
+
+
+def _backfill_daily_type_rollups() -> None:
+    """Fill daily_type_rollups once for databases whose events predate the table."""
+    from ..services import rollups  # 延迟导入：services 依赖 models
+
+    with engine.connect() as connection:
+        if connection.execute(text('SELECT 1 FROM daily_type_rollups LIMIT 1')).first() is not None:
+            return
+        user_ids = [row[0] for row in connection.execute(
+            text('SELECT DISTINCT user_id FROM events WHERE user_id IS NOT NULL ORDER BY user_id')
+        )]
+
+    for user_id in user_ids:
+        session = SessionLocal()
+        try:
+            rollups.rebuild_rollups(session, user_id)
+            session.commit()  # 逐用户提交，避免单个大事务
+        except SQLAlchemyError:
+            session.rollback()  # 其他 worker 并发回填了同一用户，以其结果为准
+        finally:
+            session.close()
+
+
 def _cleanup_legacy_idea_columns() -> None:
     """Remove deprecated columns from ideas table after schema simplification."""
     inspector = inspect(engine)
@@ -129,6 +204,12 @@ def _ensure_event_table_columns() -> None:
         alter_clauses.append('ADD COLUMN goal_id VARCHAR(32) NULL')
     if 'task_id' not in existing_columns:
         alter_clauses.append('ADD COLUMN task_id VARCHAR(64) NULL')
+    if 'change_seq' not in existing_columns:
+        alter_clauses.append('ADD COLUMN change_seq BIGINT NOT NULL DEFAULT 0')
+        alter_clauses.append('ADD INDEX idx_user_change_seq (user_id, change_seq)')
+    existing_indexes = {index['name'] for index in inspector.get_indexes('events')}
+    if 'idx_user_end' not in existing_indexes:
+        alter_clauses.append('ADD INDEX idx_user_end (user_id, `end`)')
 
     if alter_clauses:
         alter_sql = f"ALTER TABLE events {', '.join(alter_clauses)}"
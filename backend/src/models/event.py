@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Integer, Date, ForeignKey, Index
+from sqlalchemy import Column, String, DateTime, Boolean, Integer, BigInteger, Date, ForeignKey, Index
 import datetime
 from .base import Base
 
@@ -28,13 +28,17 @@ class Event(Base):
     goal_id = Column(String(32), ForeignKey('plan_goals.id'), default=None, index=True)
     task_id = Column(String(64), default=None, index=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=True, index=True) # 关联用户ID
+    # 最近一次变更时用户的数据版本，供增量同步按 change_seq > since 读取
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default='0')
 
     # 复合索引优化常见查询
     __table_args__ = (
         Index('idx_start_completed', 'start', 'is_completed'),  # 优化按时间和完成状态组合查询
         Index('idx_type_completed', 'custom_type_id', 'is_completed'),  # 优化按类型和完成状态组合查询
         Index('idx_user_start', 'user_id', 'start'), # 优化用户时间范围查询
+        Index('idx_user_end', 'user_id', 'end'),  # 优化与时间窗口相交的查询（end > 窗口开始）
         Index('idx_task_link', 'user_id', 'plan_id', 'goal_id', 'task_id'),
+        Index('idx_user_change_seq', 'user_id', 'change_seq'),  # 优化增量同步查询
     )
 
 # models/idea.py
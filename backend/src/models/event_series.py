@@ -0,0 +1,41 @@
+from sqlalchemy import Column, String, DateTime, Boolean, Integer, BigInteger, Date, Text, ForeignKey, Index
+from sqlalchemy.sql import func
+
+from .base import Base
+
+
+class EventSeries(Base):
+    """重复事件的系列定义：规则只存一份，读取时按窗口展开为虚拟实例。"""
+
+    __tablename__ = 'event_series'
+
+    id = Column(String(32), primary_key=True)  # 与实例化事件的 events.repeat_group_id 一致
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    title = Column(String(128), nullable=False)
+    allDay = Column(Boolean, default=False)
+    category = Column(String(32), default='默认')
+    time = Column(String(32), default='')
+    urgency = Column(String(16), default='普通')
+    remark = Column(String(512), default=None)
+    custom_type_id = Column(String(32), ForeignKey('event_types.id'), default=None, index=True)
+    plan_id = Column(String(32), ForeignKey('annual_plans.id'), default=None)
+    goal_id = Column(String(32), ForeignKey('plan_goals.id'), default=None)
+    task_id = Column(String(64), default=None)
+    # 重复规则：'daily', 'workday', 'holiday', 'weekday', 'weekend'
+    repeat_type = Column(String(32), nullable=False)
+    anchor_start = Column(DateTime, nullable=False)  # 首次发生的开始时间，决定每日的开始时刻
+    duration_seconds = Column(Integer, nullable=False, default=0)
+    repeat_end_date = Column(Date, default=None)  # None 表示永久重复
+    # JSON 覆盖信息：{"exdates": [...]}，记录已删除或已实例化为 events 行的日期
+    overrides = Column(Text, default=None)
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default='0')  # 增量同步用的变更序号
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index('idx_series_user_anchor', 'user_id', 'anchor_start'),  # 优化按窗口查找候选系列
+        Index('idx_series_user_change_seq', 'user_id', 'change_seq'),  # 优化增量同步查询
+    )
+
+    def __repr__(self) -> str:
+        return f"<EventSeries id={self.id} repeat_type={self.repeat_type} anchor={self.anchor_start}>"
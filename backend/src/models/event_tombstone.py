@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, ForeignKey, Index
+import datetime
+from .base import Base
+
+
+class EventTombstone(Base):
+    """已删除事件/系列的墓碑记录，供增量同步告知客户端删除。"""
+
+    __tablename__ = 'event_tombstones'
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    event_id = Column(String(32), nullable=False)  # 被删除的 events.id 或 event_series.id
+    kind = Column(String(16), nullable=False, default='event')  # 'event' 或 'series'
+    change_seq = Column(BigInteger, nullable=False)
+    deleted_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_tombstone_user_change_seq', 'user_id', 'change_seq'),
+    )
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Date, DateTime, Integer, ForeignKey
+import datetime
+from .base import Base
+
+
+class ScoreDirtyDay(Base):
+    """待重算积分的 (用户, 日期)，主键合并同一天的重复标记。"""
+
+    __tablename__ = 'score_dirty_days'
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    date = Column(Date, primary_key=True)
+    # 每次重复标记递增；重算后只删除与读取时序号相同的行，避免吞掉重算期间的新标记
+    mark_seq = Column(Integer, nullable=False, default=1, server_default='1')
+    marked_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
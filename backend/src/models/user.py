@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, BigInteger
 from sqlalchemy.sql import func
 from .base import Base
 
@@ -10,6 +10,7 @@ class User(Base):
     password_hash = Column(String(255), nullable=False)
     is_admin = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    data_version = Column(BigInteger, nullable=False, default=0, server_default='0')  # 每次数据变更递增，用于 ETag
     
     def to_dict(self):
         return {
@@ -0,0 +1,428 @@
+"""Pluggable key/value backends shared by the response caches.
+
+gunicorn runs several worker processes, so a per-process dict can neither
+share hits nor see another worker's invalidations. The caches (``/stats``,
+data versions behind the ETags, ``/event-types`` bodies) therefore talk to a
+small ``CacheBackend`` interface selected by ``CACHE_URL``:
+
+* ``memory://`` – per-process LRU, the default for a single process;
+* ``sqlite:///path/to/cache.db`` – a local file shared by every worker on the
+  host (WAL mode, one connection per thread);
+* ``redis://host:port/db`` – any server speaking the Redis protocol, talked
+  to with a minimal RESP client so no extra dependency is needed.
+
+Values are strings. Keys written with ``set`` expire after their TTL;
+counters written with ``incr`` are used as generation numbers: a cache stores
+the generations it was computed under next to the value, and invalidation is
+a single ``incr`` that every worker observes on its next read. Counters expire
+``COUNTER_TTL_SECONDS`` after their last increment and may be evicted like
+any entry, so idle users do not accumulate keys. A missing counter reads as
+``None`` (generation 0), and a counter created again starts from a
+nanosecond timestamp instead of 1, so it never repeats a generation that an
+earlier incarnation handed out and stale entries stay unreachable.
+"""
+from __future__ import annotations
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import unquote, urlparse
+
+
+# 计数器自最后一次递增起的存活时间，须长于各缓存条目的 TTL
+COUNTER_TTL_SECONDS = 24 * 3600
+
+
+_last_base = 0
+_base_lock = threading.Lock()
+
+
+def _counter_base() -> int:
+    """
+    新建计数器的初值：纳秒时间戳（进程内严格递增）。
+
+    一次递增远长于 1 纳秒，此前同名计数器自创建起的递增次数不可能追上经过的纳秒数，
+    因此重建的计数器不会回到旧值；数值在 2^63 以内，Redis 的 INCR 与 SQLite 的 INTEGER 都能容纳。
+    """
+    global _last_base
+    with _base_lock:
+        _last_base = max(time.time_ns(), _last_base + 1)
+        return _last_base
+
+
+class CacheBackendError(Exception):
+    """缓存后端配置或通信错误。"""
+
+
+class CacheBackend:
+    """缓存后端接口：字符串值、按键 TTL 过期、按最后递增时间过期的整数计数器。"""
+
+    name = "abstract"
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        raise NotImplementedError
+
+    def get(self, key: str) -> Optional[str]:
+        return self.get_many([key])[0]
+
+    def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, keys: Sequence[str]) -> None:
+        raise NotImplementedError
+
+    def incr_many(self, keys: Sequence[str]) -> List[int]:
+        """原子地把每个计数器加 1 并续期，返回新值；不存在或已过期的计数器从 _counter_base() 重新开始。"""
+        raise NotImplementedError
+
+    def info(self) -> Dict[str, object]:
+        return {"backend": self.name}
+
+
+class MemoryBackend(CacheBackend):
+    """进程内 LRU：条目与计数器超过 max_entries 时一并淘汰最久未用的。"""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._evictions = 0
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None or entry[0] <= now:
+                    if entry is not None:
+                        del self._entries[key]
+                    values.append(None)
+                    continue
+                self._entries.move_to_end(key)
+                values.append(entry[1])
+        return values
+
+    def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        with self._lock:
+            self._store(key, value, time.monotonic() + ttl_seconds)
+
+    def _store(self, key: str, value: str, expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def delete(self, keys: Sequence[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def incr_many(self, keys: Sequence[str]) -> List[int]:
+        now = time.monotonic()
+        with self._lock:
+            values = []
+            for key in keys:
+                entry = self._entries.get(key)
+                value = int(entry[1]) + 1 if entry is not None and entry[0] > now else _counter_base()
+                self._store(key, str(value), now + COUNTER_TTL_SECONDS)
+                values.append(value)
+            return values
+
+    def info(self) -> Dict[str, object]:
+        with self._lock:
+            return {"backend": self.name, "size": len(self._entries), "maxEntries": self.max_entries,
+                    "evictions": self._evictions}
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    同一主机上多个进程共享的本地文件缓存。
+
+    条目超过 max_entries 时按过期时间从早到晚淘汰（TTL 相同即最早写入的先淘汰），计数器同样计入，
+    但其过期时间远晚于普通条目，会最后被淘汰；读命中不回写访问时间，避免读请求也争抢文件写锁。
+    """
+
+    name = "sqlite"
+    _PURGE_EVERY = 100
+
+    def __init__(self, path: str, max_entries: int = 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        self._evictions = 0
+        self._execute_write(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)",
+        )
+        self._execute_write("CREATE INDEX IF NOT EXISTS ix_cache_entries_expires_at ON cache_entries (expires_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # 每个线程、每个进程各自一条连接；gunicorn fork 之后的进程不能沿用父进程的连接
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _execute_write(self, sql: str, *batches) -> sqlite3.Connection:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if batches:
+                for params in batches:
+                    connection.execute(sql, params)
+            else:
+                connection.execute(sql)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return connection
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        if not keys:
+            return []
+        placeholders = ",".join("?" * len(keys))
+        rows = self._connection().execute(
+            f"SELECT key, value FROM cache_entries WHERE key IN ({placeholders}) "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (*keys, time.time())
+        ).fetchall()
+        found = dict(rows)
+        return [found.get(key) for key in keys]
+
+    def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        self._execute_write(
+            "INSERT INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (key, value, time.time() + ttl_seconds)
+        )
+        self._writes += 1
+        if self._writes % self._PURGE_EVERY == 0:
+            self._purge()
+
+    def _purge(self) -> None:
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # 旧版本写入的计数器 expires_at 为 NULL，一并清理
+            connection.execute("DELETE FROM cache_entries WHERE expires_at IS NULL OR expires_at <= ?",
+                               (time.time(),))
+            (count,) = connection.execute("SELECT COUNT(*) FROM cache_entries").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                connection.execute(
+                    "DELETE FROM cache_entries WHERE key IN (SELECT key FROM cache_entries "
+                    "ORDER BY expires_at LIMIT ?)",
+                    (overflow,)
+                )
+                self._evictions += overflow
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def delete(self, keys: Sequence[str]) -> None:
+        if keys:
+            self._execute_write("DELETE FROM cache_entries WHERE key = ?", *[(key,) for key in keys])
+
+    def incr_many(self, keys: Sequence[str]) -> List[int]:
+        if not keys:
+            return []
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            values = []
+            for key in keys:
+                connection.execute(
+                    "INSERT INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = CASE WHEN expires_at > ? "
+                    "THEN CAST(value AS INTEGER) + 1 ELSE excluded.value END, expires_at = excluded.expires_at",
+                    (key, str(_counter_base()), now + COUNTER_TTL_SECONDS, now)
+                )
+                (value,) = connection.execute("SELECT value FROM cache_entries WHERE key = ?", (key,)).fetchone()
+                values.append(int(value))
+            connection.execute("COMMIT")
+            return values
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def info(self) -> Dict[str, object]:
+        (size,) = self._connection().execute("SELECT COUNT(*) FROM cache_entries").fetchone()
+        return {"backend": self.name, "path": self.path, "size": size, "maxEntries": self.max_entries,
+                "evictions": self._evictions}
+
+
+class RedisReplyError(CacheBackendError):
+    """Redis 返回的错误应答；抛出前已读完同批的全部应答，连接仍可继续使用。"""
+
+
+class RedisBackend(CacheBackend):
+    """
+    Redis 协议（RESP2）的最小客户端，只用到 GET/MGET/SET PX/DEL/INCR/PEXPIRE。
+
+    条目与计数器都带过期时间，容量与淘汰交给服务端（maxmemory 与 volatile-*/allkeys-* 策略）；
+    计数器被淘汰后由 SET NX 从新的基数重建，不会回到旧值。
+    """
+
+    name = "redis"
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379, db: int = 0,
+                 password: Optional[str] = None, timeout: float = 2.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        stream = sock.makefile("rb")
+        self._local.sock, self._local.stream, self._local.pid = sock, stream, os.getpid()
+        try:
+            if self.password:
+                self._roundtrip([("AUTH", self.password)])
+            if self.db:
+                self._roundtrip([("SELECT", str(self.db))])
+        except Exception:
+            self._close()
+            raise
+
+    def _close(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                self._local.stream.close()  # makefile 持有套接字引用，须一并关闭才会真正断开
+                sock.close()
+            finally:
+                self._local.sock = None
+
+    @staticmethod
+    def _encode(command: Sequence[str]) -> bytes:
+        parts = [b"*%d\r\n" % len(command)]
+        for arg in command:
+            data = arg.encode("utf-8") if isinstance(arg, str) else arg
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    def _read_reply(self):
+        line = self._local.stream.readline()
+        if not line:
+            raise ConnectionError("Redis 连接已关闭")
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b"+":
+            return payload.decode("utf-8")
+        if prefix == b"-":
+            # 错误应答作为值返回，由 _roundtrip 读完整批应答后再抛出，避免后续应答残留在连接上
+            return RedisReplyError(payload.decode("utf-8"))
+        if prefix == b":":
+            return int(payload)
+        if prefix == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._local.stream.read(length + 2)
+            return data[:-2].decode("utf-8")
+        if prefix == b"*":
+            length = int(payload)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise CacheBackendError(f"无法解析的 RESP 应答: {line!r}")
+
+    def _roundtrip(self, commands: Sequence[Sequence[str]]) -> list:
+        # 多条命令一次写出（流水线），再按顺序读取应答
+        self._local.sock.sendall(b"".join(self._encode(command) for command in commands))
+        replies = [self._read_reply() for _ in commands]
+        for reply in replies:
+            if isinstance(reply, RedisReplyError):
+                raise reply
+        return replies
+
+    def _execute(self, commands: Sequence[Sequence[str]]) -> list:
+        for attempt in (0, 1):
+            if getattr(self._local, "sock", None) is None or self._local.pid != os.getpid():
+                self._connect()
+            try:
+                return self._roundtrip(commands)
+            except RedisReplyError:
+                raise
+            except (OSError, ConnectionError):
+                self._close()
+                if attempt:
+                    raise
+            except Exception:
+                # 应答无法解析时连接上可能残留未读数据，丢弃连接而不是让下一条命令读到错位的应答
+                self._close()
+                raise
+        return []
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[str]]:
+        if not keys:
+            return []
+        return self._execute([("MGET", *keys)])[0]
+
+    def set(self, key: str, value: str, ttl_seconds: float) -> None:
+        self._execute([("SET", key, value, "PX", str(max(1, int(ttl_seconds * 1000))))])
+
+    def delete(self, keys: Sequence[str]) -> None:
+        if keys:
+            self._execute([("DEL", *keys)])
+
+    def incr_many(self, keys: Sequence[str]) -> List[int]:
+        if not keys:
+            return []
+        ttl = str(COUNTER_TTL_SECONDS * 1000)
+        base = str(_counter_base())
+        commands = []
+        for key in keys:
+            commands += [("SET", key, base, "PX", ttl, "NX"), ("INCR", key), ("PEXPIRE", key, ttl)]
+        return self._execute(commands)[1::3]
+
+    def info(self) -> Dict[str, object]:
+        return {"backend": self.name, "address": f"{self.host}:{self.port}/{self.db}"}
+
+
+def create_backend(url: Optional[str], max_entries: int = 1024) -> CacheBackend:
+    """按 URL 创建缓存后端：memory://、sqlite:///绝对或相对路径、redis://[:密码@]主机:端口/库号。"""
+    parsed = urlparse(url or "memory://")
+    if parsed.scheme == "memory":
+        return MemoryBackend(max_entries)
+    if parsed.scheme == "sqlite":
+        path = unquote(parsed.path[1:] if parsed.path.startswith("/") else parsed.path)
+        if not path:
+            raise CacheBackendError("sqlite 缓存后端需要文件路径，如 sqlite:////tmp/cache.db")
+        return SQLiteBackend(path, max_entries)
+    if parsed.scheme == "redis":
+        db = int(parsed.path.lstrip("/") or 0)
+        return RedisBackend(parsed.hostname or "127.0.0.1", parsed.port or 6379, db,
+                            unquote(parsed.password) if parsed.password else None)
+    raise CacheBackendError(f"不支持的缓存后端: {url}")
+
+
+_backend: CacheBackend = MemoryBackend()
+
+
+def configure(url: Optional[str], max_entries: int = 1024) -> CacheBackend:
+    """设置进程内各缓存共用的后端（在 create_app 中按 CACHE_URL 调用）。"""
+    global _backend
+    _backend = create_backend(url, max_entries)
+    return _backend
+
+
+def get_backend() -> CacheBackend:
+    return _backend
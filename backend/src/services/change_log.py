@@ -0,0 +1,129 @@
+"""Change tracking for delta sync of events and repeat series.
+
+A ``before_flush`` hook collects the ids of events/series that a session
+inserts, updates or deletes. ``record_changes`` is called once per write
+transaction in place of a bare ``bump_data_version``: it bumps the user's
+data version, stamps every touched row with the new version as its
+``change_seq`` and writes tombstones for deleted rows, so that
+``GET /events/changes?since=<token>`` is a pair of indexed range scans.
+
+Bulk statements bypass the unit of work; callers register them explicitly
+with ``note_changed`` / ``note_deleted`` or use ``delete_events_where``.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterable, Set
+
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm import Session
+
+from ..models.event import Event
+from ..models.event_series import EventSeries
+from ..models.event_tombstone import EventTombstone
+from .data_version import bump_data_version
+from .rollups import note_event_days
+
+KIND_EVENT = "event"
+KIND_SERIES = "series"
+
+_TRACKER_KEY = "change_log"
+_STAMP_CHUNK_SIZE = 500
+
+
+@dataclass
+class _Tracker:
+    changed: dict = field(default_factory=lambda: {KIND_EVENT: set(), KIND_SERIES: set()})
+    deleted: dict = field(default_factory=lambda: {KIND_EVENT: set(), KIND_SERIES: set()})
+
+
+def _tracker(session) -> _Tracker:
+    tracker = session.info.get(_TRACKER_KEY)
+    if tracker is None:
+        tracker = session.info[_TRACKER_KEY] = _Tracker()
+    return tracker
+
+
+def _kind_of(instance):
+    if isinstance(instance, Event):
+        return KIND_EVENT
+    if isinstance(instance, EventSeries):
+        return KIND_SERIES
+    return None
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_pending_changes(session, flush_context, instances):
+    for instance in list(session.new) + list(session.dirty):
+        kind = _kind_of(instance)
+        if kind and instance.id:
+            _tracker(session).changed[kind].add(instance.id)
+    for instance in session.deleted:
+        kind = _kind_of(instance)
+        if kind:
+            note_deleted(session, kind, [instance.id])
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_soft_rollback")
+def _reset_tracker(session, *args):
+    session.info.pop(_TRACKER_KEY, None)
+
+
+def note_changed(session, kind: str, ids: Iterable[str]) -> None:
+    """登记绕过 ORM 写入/更新的行（如 executemany 批量插入）。"""
+    _tracker(session).changed[kind].update(ids)
+
+
+def note_deleted(session, kind: str, ids: Iterable[str]) -> None:
+    """登记绕过 ORM 删除的行，提交前由 record_changes 写入墓碑。"""
+    tracker = _tracker(session)
+    ids = set(ids)
+    tracker.deleted[kind].update(ids)
+    tracker.changed[kind].difference_update(ids)
+
+
+def delete_events_where(session, *criteria) -> int:
+    """按条件批量删除事件并登记墓碑与待重算汇总的日期，返回删除行数。"""
+    rows = session.query(Event.id, Event.user_id, Event.start).filter(*criteria).all()
+    if not rows:
+        return 0
+    note_deleted(session, KIND_EVENT, [row.id for row in rows])
+    note_event_days(session, ((row.user_id, row.start) for row in rows))
+    return session.query(Event).filter(*criteria).delete(synchronize_session=False)
+
+
+def _stamp(session, model, user_id: int, ids: Set[str], seq: int) -> None:
+    ordered = sorted(ids)
+    for offset in range(0, len(ordered), _STAMP_CHUNK_SIZE):
+        chunk = ordered[offset:offset + _STAMP_CHUNK_SIZE]
+        session.execute(
+            update(model.__table__)
+            .where(model.__table__.c.user_id == user_id, model.__table__.c.id.in_(chunk))
+            .values(change_seq=seq)
+        )
+
+
+def record_changes(session, user_id: int) -> int:
+    """
+    在调用方事务内递增数据版本，并把本事务登记的变更写成 change_seq 与墓碑。
+
+    须在 commit 之前调用，返回新的数据版本（即本次变更的 change_seq）。
+    """
+    session.flush()  # SessionLocal 关闭了 autoflush，先 flush 以收集尚未写出的变更
+    seq = bump_data_version(session, user_id)
+    tracker = session.info.pop(_TRACKER_KEY, None)
+    if tracker is None:
+        return seq
+    _stamp(session, Event, user_id, tracker.changed[KIND_EVENT], seq)
+    _stamp(session, EventSeries, user_id, tracker.changed[KIND_SERIES], seq)
+    now = datetime.utcnow()
+    tombstones = [
+        {"user_id": user_id, "event_id": item_id, "kind": kind, "change_seq": seq, "deleted_at": now}
+        for kind, ids in tracker.deleted.items()
+        for item_id in sorted(ids)
+    ]
+    if tombstones:
+        session.execute(insert(EventTombstone.__table__), tombstones)
+    return seq
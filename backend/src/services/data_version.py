@@ -0,0 +1,103 @@
+"""Per-user data versions and the strong ETags derived from them.
+
+Every mutating route bumps ``users.data_version`` inside its own transaction.
+Read endpoints fetch the version with a single primary-key lookup on a Core
+connection and answer ``If-None-Match`` with 304 before any ORM query runs.
+
+``cached_data_version`` serves the ETag checks from the shared cache backend
+instead. Bumped versions are dropped from it after the transaction commits
+(a global bump advances an epoch shared by all users), so every worker sees
+the change; a read racing the commit can cache the old version for at most
+``CACHE_TTL_SECONDS``. Sync tokens keep using ``get_data_version``.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+from typing import Mapping, Optional
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from ..models.db import engine
+from ..models.user import User
+from . import cache_backend
+
+# 响应结构变化时递增，使旧 ETag 全部失效
+API_REVISION = "1"
+CACHE_TTL_SECONDS = 5
+
+_BUMPED_KEY = "bumped_data_versions"
+_EPOCH_KEY = "dv:epoch"
+
+
+def bump_data_version(session, user_id: Optional[int]) -> Optional[int]:
+    """
+    在调用方事务内递增数据版本并返回新版本。
+
+    user_id 为 None 表示全局数据（如全局事件类型）发生变化，递增全部用户的版本，此时返回 None。
+    """
+    statement = update(User).values(data_version=User.data_version + 1)
+    session.info.setdefault(_BUMPED_KEY, set()).add(user_id)
+    if user_id is None:
+        session.execute(statement)
+        return None
+    session.execute(statement.where(User.id == user_id))
+    return session.execute(select(User.data_version).where(User.id == user_id)).scalar_one()
+
+
+def get_data_version(user_id: int) -> int:
+    """读取用户当前数据版本，不经过 ORM 会话。"""
+    users = User.__table__
+    with engine.connect() as connection:
+        version = connection.execute(
+            select(users.c.data_version).where(users.c.id == user_id)
+        ).scalar()
+    return int(version or 0)
+
+
+def cached_data_version(user_id: int) -> int:
+    """经共享缓存读取用户数据版本，用于 ETag 校验；缓存不可用时直接读库。"""
+    backend = cache_backend.get_backend()
+    try:
+        epoch, cached = backend.get_many([_EPOCH_KEY, f"dv:{user_id}"])
+    except Exception:
+        logging.exception("读取数据版本缓存失败")
+        return get_data_version(user_id)
+    epoch = epoch or "0"
+    if cached is not None:
+        cached_epoch, _, version = cached.partition(":")
+        if cached_epoch == epoch:
+            return int(version)
+    version = get_data_version(user_id)
+    try:
+        backend.set(f"dv:{user_id}", f"{epoch}:{version}", CACHE_TTL_SECONDS)
+    except Exception:
+        logging.exception("写入数据版本缓存失败")
+    return version
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_cached_versions(session):
+    bumped = session.info.pop(_BUMPED_KEY, None)
+    if not bumped:
+        return
+    backend = cache_backend.get_backend()
+    try:
+        if None in bumped:
+            backend.incr_many([_EPOCH_KEY])
+        backend.delete([f"dv:{user_id}" for user_id in bumped if user_id is not None])
+    except Exception:
+        logging.exception("清除数据版本缓存失败")
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_bumped_versions(session, previous_transaction):
+    session.info.pop(_BUMPED_KEY, None)
+
+
+def build_etag(scope: str, user_id: int, version: int, args: Optional[Mapping[str, str]] = None) -> str:
+    """由接口范围、用户、数据版本与查询参数派生强 ETag（不含引号）。"""
+    arg_items = sorted((args or {}).items())
+    raw = f"{API_REVISION}|{scope}|{user_id}|{version}|{arg_items!r}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
@@ -0,0 +1,606 @@
+"""Event write operations shared by the single-event routes and the batch route.
+
+Each operation mutates the session only; it never flushes scores, bumps the
+data version or commits. It returns an ``OperationResult`` carrying the
+response body, per-day score deltas taken from before/after snapshots of the
+touched event, and the dates that need a full recompute because a set-based
+statement changed them. A caller applying many operations sums the deltas and
+writes each affected day once at the end.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Set
+from uuid import uuid4
+
+from sqlalchemy import func, or_, text
+
+from ..models.event import Event
+from ..utils import event_to_dict
+from . import recurrence, rollups
+from .change_log import KIND_EVENT, delete_events_where, note_changed
+from .event_service import (
+    NO_SCORE,
+    REPEAT_EVENT_COLUMNS,
+    bulk_insert_events,
+    event_from_row,
+    generate_repeat_event_rows,
+    score_deltas,
+    score_snapshot,
+)
+
+EFFICIENCY_LEVELS = ("high", "medium", "low")
+BATCH_OPERATIONS = ("create", "update", "complete", "undo", "delete")
+EVENTS_BATCH_MAX_OPERATIONS = 200
+EDIT_SCOPES = ("this", "following", "all")
+# 系列范围修改时可批量写入的字段：请求键 -> 列属性名
+_SERIES_FIELD_MAP = {
+    "title": "title",
+    "allDay": "allDay",
+    "category": "category",
+    "time": "time",
+    "urgency": "urgency",
+    "remark": "remark",
+    "customTypeId": "custom_type_id",
+    "planId": "plan_id",
+    "goalId": "goal_id",
+    "taskId": "task_id",
+    "repeatType": "repeat_type",
+}
+# 重新生成按行存储的重复组时从原行沿用的列
+_TEMPLATE_COLUMNS = tuple(column for column in _SERIES_FIELD_MAP.values() if column != "repeat_type")
+_ROW_START = REPEAT_EVENT_COLUMNS.index("start")
+
+
+class EventOperationError(ValueError):
+    """事件写操作失败，status 为建议返回的 HTTP 状态码。"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class OperationResult(NamedTuple):
+    body: Dict[str, object]
+    affected_dates: Set[date]  # 需要全量重算积分的日期
+    changed: bool = True
+    score_deltas: Optional[Dict[date, int]] = None  # 可增量落库的按日积分变化
+
+
+def _normalize_remark(value):
+    if isinstance(value, str):
+        trimmed = value.strip()
+        return trimmed or None
+    return value
+
+
+def _parse_datetime(value, fallback):
+    if value in (None, ""):
+        return fallback
+    return datetime.fromisoformat(value)
+
+
+def _parse_repeat_end(value):
+    if value in (None, ""):
+        return None
+    return datetime.fromisoformat(value).date()
+
+
+def _completed_days(session, *criteria) -> Set[date]:
+    """满足条件的已完成事件所在的去重日期。"""
+    days = session.query(func.date(Event.start)).filter(
+        *criteria,
+        Event.is_completed == True,
+        Event.start.isnot(None)
+    ).distinct().all()
+    # SQLite 的 DATE() 返回字符串，MySQL 返回 date
+    return {day if isinstance(day, date) else date.fromisoformat(day) for (day,) in days}
+
+
+def _create_repeat(session, user_id: int, base_event_data: dict, repeat_type: str,
+                   repeat_end_date: Optional[date], repeat_storage: str,
+                   repeat_group_id: Optional[str] = None) -> Dict[str, object]:
+    """按存储模式写入重复事件，返回 count/events/repeatGroupId 回执。"""
+    if repeat_storage == "virtual":
+        # 只写入一条系列定义，读取时再按窗口展开
+        series = recurrence.create_series(
+            session, user_id, base_event_data, repeat_type, repeat_end_date, repeat_group_id=repeat_group_id
+        )
+        return {
+            "count": recurrence.count_occurrences(series),
+            "events": recurrence.preview_occurrences(series),
+            "repeatGroupId": series.id
+        }
+
+    # 生成重复事件行并分块批量写入
+    rows = generate_repeat_event_rows(
+        base_event_data, repeat_type, repeat_end_date, repeat_group_id=repeat_group_id, user_id=user_id
+    )
+    logging.info(f"[生成重复事件] 生成了 {len(rows)} 个事件")
+    bulk_insert_events(session, rows)
+    return {
+        "count": len(rows),
+        "events": [event_to_dict(event_from_row(row)) for row in rows[:10]],  # 只返回前10个
+        "repeatGroupId": repeat_group_id
+    }
+
+
+def create_event(session, user_id: int, payload: dict, repeat_storage: str) -> OperationResult:
+    remark_value = _normalize_remark(payload.get("remark"))
+    is_repeat = payload.get("isRepeat", False)
+    logging.info(f"[创建事件] isRepeat={is_repeat}, repeatType={payload.get('repeatType')}, repeatEndDate={payload.get('repeatEndDate')}")
+    start = datetime.fromisoformat(payload.get("start")) if payload.get("start") else datetime.utcnow()
+    end = datetime.fromisoformat(payload.get("end")) if payload.get("end") else datetime.utcnow()
+
+    if is_repeat:
+        repeat_type = payload.get("repeatType") or "daily"
+        if repeat_type not in recurrence.REPEAT_TYPES:
+            raise EventOperationError("重复类型无效")
+        base_event_data = {
+            "title": payload.get("title", "未命名事件"),
+            "start": start,
+            "end": end,
+            "allDay": payload.get("allDay", False),
+            "category": payload.get("category", "默认"),
+            "time": payload.get("time", ""),
+            "urgency": payload.get("urgency", "普通"),
+            "remark": remark_value,
+            "custom_type_id": payload.get("customTypeId"),
+            "plan_id": payload.get("planId"),
+            "goal_id": payload.get("goalId"),
+            "task_id": payload.get("taskId")
+        }
+        receipt = _create_repeat(
+            session, user_id, base_event_data, repeat_type,
+            _parse_repeat_end(payload.get("repeatEndDate")), repeat_storage
+        )
+        receipt["message"] = f"成功创建 {receipt['count']} 个重复事件"
+        return OperationResult(receipt, set())
+
+    event = Event(
+        id=uuid4().hex,
+        title=payload.get("title", "未命名事件"),
+        start=start,
+        end=end,
+        allDay=payload.get("allDay", False),
+        category=payload.get("category", "默认"),
+        time=payload.get("time", ""),
+        urgency=payload.get("urgency", "普通"),
+        remark=remark_value,
+        custom_type_id=payload.get("customTypeId"),
+        plan_id=payload.get("planId"),
+        goal_id=payload.get("goalId"),
+        task_id=payload.get("taskId"),
+        user_id=user_id,
+        # 响应在 flush 之前序列化，列默认值尚未生效，显式给出以保证返回 false 而非 null
+        is_repeat=False,
+        is_completed=False
+    )
+    session.add(event)
+    return OperationResult(event_to_dict(event), set())
+
+
+def _shift_expression(session, column, seconds: int):
+    """把时间列平移 seconds 秒的 SQL 表达式，由数据库计算而非逐行读写。"""
+    if not seconds:
+        return column
+    if session.get_bind().dialect.name == "sqlite":
+        # datetime() 会丢掉小数秒，拼回原值第 20 位起的部分以保持 SQLAlchemy 的存储格式
+        return func.datetime(column, f"{seconds:+d} seconds").op("||")(func.substr(column, 20))
+    return func.timestampadd(text("SECOND"), seconds, column)
+
+
+def _series_field_values(payload: dict) -> Dict[str, object]:
+    values = {column: payload[key] for key, column in _SERIES_FIELD_MAP.items() if key in payload}
+    if "remark" in values:
+        values["remark"] = _normalize_remark(values["remark"])
+    if values.get("allDay"):
+        values["time"] = None
+    if "repeat_type" in values and values["repeat_type"] not in recurrence.REPEAT_TYPES:
+        raise EventOperationError("重复类型无效")
+    if "repeatEndDate" in payload:
+        values["repeat_end_date"] = _parse_repeat_end(payload.get("repeatEndDate"))
+    return values
+
+
+def _update_group_rows(session, criteria, values: dict, start_delta: timedelta,
+                       duration_delta: timedelta) -> Set[date]:
+    """
+    对重复组内满足条件的 events 行执行一条 UPDATE，返回需要重算积分的日期。
+
+    只预读 id/user_id/start/is_completed 四列，用于登记增量同步变更并推算实例平移前后的日期。
+    """
+    rows = session.query(Event.id, Event.user_id, Event.start, Event.is_completed).filter(*criteria).all()
+    if not rows:
+        return set()
+    affected_dates = set()
+    for _, _, start, is_completed in rows:
+        if is_completed and start:
+            affected_dates.add(start.date())
+            affected_dates.add((start + start_delta).date())
+    rollups.note_event_days(session, (
+        (user_id, shifted) for _, user_id, start, _ in rows if start for shifted in (start, start + start_delta)
+    ))
+
+    start_seconds = int(start_delta.total_seconds())
+    end_seconds = start_seconds + int(duration_delta.total_seconds())
+    assignments = dict(values)
+    if start_seconds:
+        assignments["start"] = _shift_expression(session, Event.start, start_seconds)
+    if end_seconds:
+        # 各列只引用自身旧值，避免依赖 MySQL 从左到右求值 SET 的行为
+        assignments["end"] = _shift_expression(session, Event.end, end_seconds)
+    if assignments:
+        session.query(Event).filter(*criteria).update(assignments, synchronize_session=False)
+
+    ids = {row_id for row_id, _, _, _ in rows}
+    note_changed(session, KIND_EVENT, ids)
+    for instance in list(session.identity_map.values()):
+        if isinstance(instance, Event) and instance.id in ids:
+            session.expire(instance)
+    return affected_dates
+
+
+def _rewrite_stored_group(session, user_id: int, stored: Event, criteria, values: dict, new_start: datetime,
+                          new_end: datetime, start_delta: timedelta, duration_delta: timedelta) -> Set[date]:
+    """
+    修改按行存储（没有系列定义）的重复组，返回需要重算积分的日期。
+
+    规则不变且实例不跨日（或每日重复）时沿用集合 UPDATE 平移，再删除新结束日期之后的行、补齐缺少的行；
+    修改重复类型、按规则重复的组跨日平移或改为永久重复时，实例日期取决于日历，先删除未完成的行再按新规则
+    重新生成，已完成的行保留原时间只改写字段。未给出结束日期时随跨日平移同步平移，与 recurrence.shift_series 一致。
+    """
+    repeat_type = values.get("repeat_type", stored.repeat_type)
+    day_shift = new_start.date() - stored.start.date()
+    if "repeat_end_date" not in values:
+        values["repeat_end_date"] = stored.repeat_end_date + day_shift if stored.repeat_end_date else None
+    end_date = values["repeat_end_date"]
+    template = {column: values.get(column, getattr(stored, column)) for column in _TEMPLATE_COLUMNS}
+    group_id = values.get("repeat_group_id", stored.repeat_group_id)
+    group = [Event.repeat_group_id == group_id, Event.user_id == user_id]
+    rows = session.query(Event.start, Event.end, Event.is_completed).filter(*criteria).order_by(Event.start).all()
+    crossing = any((start + start_delta).date() != start.date() for start, _, _ in rows)
+    regenerate = (
+        repeat_type != stored.repeat_type
+        or (crossing and repeat_type != "daily")
+        or (end_date is None and stored.repeat_end_date is not None)
+    )
+
+    kept_dates = set()
+    if regenerate:
+        delete_events_where(session, *criteria, or_(Event.is_completed.is_(None), Event.is_completed == False))
+        affected_dates = _update_group_rows(
+            session, (*criteria, Event.is_completed == True), values, timedelta(0), timedelta(0)
+        )
+        kept_dates = {start.date() for start, _, is_completed in rows if is_completed}
+        generate_from = rows[0].start.date() + day_shift
+        first_start, duration = new_start, new_end - new_start
+    else:
+        affected_dates = _update_group_rows(session, criteria, values, start_delta, duration_delta)
+        # 补齐的行沿用最后一行平移后的时刻与时长
+        last = rows[-1]
+        first_start = last.start + start_delta
+        duration = (last.end - last.start if last.end else timedelta(0)) + duration_delta
+        generate_from = first_start.date() + timedelta(days=1)
+
+    if end_date is not None:
+        beyond = (*group, Event.start >= datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+        affected_dates |= _completed_days(session, *beyond)
+        delete_events_where(session, *beyond)
+        if generate_from > end_date:
+            return affected_dates
+    elif not regenerate:
+        return affected_dates
+
+    base_start = datetime.combine(generate_from, first_start.time())
+    base_event_data = dict(template, start=base_start, end=base_start + duration)
+    new_rows = generate_repeat_event_rows(
+        base_event_data, repeat_type, end_date, repeat_group_id=group_id, user_id=user_id
+    )
+    bulk_insert_events(session, [row for row in new_rows if row[_ROW_START].date() not in kept_dates])
+    return affected_dates
+
+
+def _update_series_scope(session, user_id: int, event_id: str, payload: dict, scope: str) -> Optional[OperationResult]:
+    """
+    按"此后所有"/"整个系列"修改重复组，非重复事件返回 None 交由单条修改处理。
+
+    虚拟系列只改写定义（"此后所有"在实例日期处拆分为新系列），已实例化的行以集合 UPDATE
+    修改并在 SQL 中平移时间，不重新生成任何行；没有系列定义的组交由 _rewrite_stored_group 按规则增删行。
+    """
+    stored = session.query(Event).filter(Event.id == event_id, Event.user_id == user_id).first()
+    if stored is not None:
+        if not (stored.is_repeat and stored.repeat_group_id and stored.start):
+            return None
+        group_id = stored.repeat_group_id
+        pivot_start = stored.start
+        pivot_duration = (stored.end - stored.start) if stored.end else timedelta(0)
+        series = recurrence.get_user_series(session, user_id, group_id)
+    else:
+        parsed = recurrence.parse_virtual_event_id(event_id)
+        series = recurrence.get_user_series(session, user_id, parsed[0]) if parsed else None
+        if series is None or not recurrence.is_valid_occurrence(series, parsed[1]):
+            raise EventOperationError("事件不存在", 404)
+        group_id = series.id
+        pivot_start = recurrence.occurrence_start(series, parsed[1])
+        pivot_duration = timedelta(seconds=series.duration_seconds or 0)
+
+    new_start = _parse_datetime(payload.get("start"), pivot_start)
+    new_end = _parse_datetime(payload.get("end"), new_start + pivot_duration)
+    start_delta = new_start - pivot_start
+    duration_delta = (new_end - new_start) - pivot_duration
+    values = _series_field_values(payload)
+
+    if scope == "following" and series is not None and pivot_start.date() <= series.anchor_start.date():
+        scope = "all"
+
+    criteria = [Event.repeat_group_id == group_id, Event.user_id == user_id]
+    pivot_date = pivot_start.date()
+    pivot_midnight = datetime.combine(pivot_date, datetime.min.time())
+    target_group_id = group_id
+    definition = series
+    if scope == "following":
+        target_group_id = uuid4().hex
+        if series is not None:
+            definition = recurrence.split_series(session, series, pivot_date, target_group_id)
+        head_criteria = (*criteria, Event.start < pivot_midnight)
+        note_changed(session, KIND_EVENT, [row[0] for row in session.query(Event.id).filter(*head_criteria)])
+        session.query(Event).filter(*head_criteria).update(
+            {"repeat_end_date": pivot_date - timedelta(days=1)}, synchronize_session=False
+        )
+        criteria.append(Event.start >= pivot_midnight)
+        values["repeat_group_id"] = target_group_id
+
+    if definition is not None:
+        if start_delta or duration_delta:
+            recurrence.shift_series(definition, start_delta, duration_delta)
+        for column, value in values.items():
+            if column != "repeat_group_id":
+                setattr(definition, column, value)
+        # 已实例化的行与所属系列的结束日期保持一致
+        values["repeat_end_date"] = definition.repeat_end_date
+
+    session.flush()
+    if series is None:
+        affected_dates = _rewrite_stored_group(
+            session, user_id, stored, criteria, values, new_start, new_end, start_delta, duration_delta
+        )
+    else:
+        affected_dates = _update_group_rows(session, criteria, values, start_delta, duration_delta)
+    return OperationResult(
+        {"status": "updated", "scope": scope, "repeatGroupId": target_group_id},
+        affected_dates
+    )
+
+
+def update_event(session, user_id: int, event_id: str, payload: dict, repeat_storage: str) -> OperationResult:
+    """
+    修改事件；虚拟实例先实例化。
+
+    scope 为 following/all 时按重复组整体修改；非重复事件改为重复时按存储模式生成系列，
+    返回体为重复事件回执（含 count）。
+    """
+    scope = payload.get("scope") or "this"
+    if scope not in EDIT_SCOPES:
+        raise EventOperationError("修改范围无效")
+    if scope != "this":
+        result = _update_series_scope(session, user_id, event_id, payload, scope)
+        if result is not None:
+            return result
+
+    event = recurrence.resolve_event_for_write(session, user_id, event_id)
+    if not event:
+        raise EventOperationError("事件不存在", 404)
+    before = score_snapshot(event)
+
+    updated_title = payload.get("title", event.title)
+    updated_start = _parse_datetime(payload.get("start"), event.start)
+    updated_end = _parse_datetime(payload.get("end"), event.end)
+    updated_all_day = payload.get("allDay", event.allDay)
+    updated_category = payload.get("category", event.category)
+    updated_time = payload.get("time", event.time or "")
+    updated_urgency = payload.get("urgency", event.urgency)
+    remark_supplied = "remark" in payload
+    updated_remark = _normalize_remark(payload.get("remark")) if remark_supplied else event.remark
+    updated_custom_type_id = payload.get("customTypeId", event.custom_type_id)
+    updated_plan_id = payload.get("planId", event.plan_id)
+    updated_goal_id = payload.get("goalId", event.goal_id)
+    updated_task_id = payload.get("taskId", event.task_id)
+
+    has_repeat_flag = "isRepeat" in payload
+    requested_repeat_flag = bool(payload["isRepeat"]) if has_repeat_flag else event.is_repeat
+    requested_repeat_type = (payload.get("repeatType") or event.repeat_type or "daily")
+    if requested_repeat_flag and requested_repeat_type not in recurrence.REPEAT_TYPES:
+        raise EventOperationError("重复类型无效")
+    repeat_end_supplied = "repeatEndDate" in payload
+    requested_repeat_end = _parse_repeat_end(payload.get("repeatEndDate")) if repeat_end_supplied else event.repeat_end_date
+
+    if requested_repeat_flag and not event.is_repeat:
+        base_event_data = {
+            "title": updated_title,
+            "start": updated_start,
+            "end": updated_end,
+            "allDay": updated_all_day,
+            "category": updated_category,
+            "time": '' if updated_all_day else (updated_time or ''),
+            "urgency": updated_urgency,
+            "remark": updated_remark,
+            "custom_type_id": updated_custom_type_id,
+            "plan_id": updated_plan_id,
+            "goal_id": updated_goal_id,
+            "task_id": updated_task_id
+        }
+        session.delete(event)
+        session.flush()
+        receipt = _create_repeat(
+            session, user_id, base_event_data, requested_repeat_type, requested_repeat_end,
+            repeat_storage, repeat_group_id=uuid4().hex
+        )
+        receipt["message"] = f"成功转换为重复事件，共 {receipt['count']} 次"
+        return OperationResult(receipt, set(), score_deltas=score_deltas(before, NO_SCORE))
+
+    affected_dates = set()
+    event.title = updated_title
+    event.start = updated_start
+    event.end = updated_end
+    event.allDay = updated_all_day
+    event.category = updated_category
+    event.time = None if updated_all_day else (updated_time or '')
+    event.urgency = updated_urgency
+    if remark_supplied:
+        event.remark = updated_remark
+    event.custom_type_id = updated_custom_type_id
+    event.plan_id = updated_plan_id
+    event.goal_id = updated_goal_id
+    event.task_id = updated_task_id
+    if "isCompleted" in payload:
+        event.is_completed = payload["isCompleted"]
+    if "efficiency" in payload:
+        event.efficiency = payload["efficiency"]
+
+    if has_repeat_flag:
+        if payload["isRepeat"]:
+            event.is_repeat = True
+            event.repeat_type = requested_repeat_type
+            if repeat_end_supplied:
+                event.repeat_end_date = requested_repeat_end
+            if not event.repeat_group_id:
+                event.repeat_group_id = uuid4().hex
+        else:
+            if event.is_repeat and event.repeat_group_id:
+                sibling_filter = (
+                    Event.repeat_group_id == event.repeat_group_id,
+                    Event.user_id == user_id,
+                    Event.id != event.id
+                )
+                affected_dates |= _completed_days(session, *sibling_filter)
+                delete_events_where(session, *sibling_filter)
+                recurrence.delete_series(session, user_id, event.repeat_group_id)
+            event.is_repeat = False
+            event.repeat_type = None
+            event.repeat_end_date = None
+            event.repeat_group_id = None
+    else:
+        if event.is_repeat:
+            event.repeat_type = requested_repeat_type
+            if repeat_end_supplied:
+                event.repeat_end_date = requested_repeat_end
+
+    return OperationResult(
+        event_to_dict(event), affected_dates, score_deltas=score_deltas(before, score_snapshot(event))
+    )
+
+
+def delete_event(session, user_id: int, event_id: str, delete_all: bool = False) -> OperationResult:
+    """删除事件；delete_all 时连同整个重复系列一起删除。"""
+    event = session.query(Event).filter(Event.id == event_id, Event.user_id == user_id).first()
+    if not event:
+        virtual = recurrence.parse_virtual_event_id(event_id)
+        series = recurrence.get_user_series(session, user_id, virtual[0]) if virtual else None
+        if series is None or not recurrence.is_valid_occurrence(series, virtual[1]):
+            raise EventOperationError("事件不存在", 404)
+        if not delete_all:
+            # 删除单个虚拟实例只需记录排除日期
+            recurrence.add_exdate(series, virtual[1])
+            return OperationResult({"status": "deleted"}, set())
+        event = session.query(Event).filter(
+            Event.repeat_group_id == series.id,
+            Event.user_id == user_id
+        ).first()
+        if event is None:
+            recurrence.delete_series(session, user_id, series.id)
+            return OperationResult({"status": "deleted"}, set())
+
+    if delete_all and event.is_repeat and event.repeat_group_id:
+        return OperationResult({"status": "deleted"}, delete_repeat_group(session, user_id, event.repeat_group_id))
+    # 只删除当前事件
+    deltas = score_deltas(score_snapshot(event), NO_SCORE)
+    session.delete(event)
+    return OperationResult({"status": "deleted"}, set(), score_deltas=deltas)
+
+
+def delete_repeat_group(session, user_id: int, repeat_group_id: str) -> Set[date]:
+    """
+    以集合操作删除整个重复组，返回需要重算积分的日期。
+
+    只查询已完成实例的去重日期，再按 repeat_group_id 一条 DELETE 删除，不把行加载进会话。
+    """
+    group_filter = (Event.repeat_group_id == repeat_group_id, Event.user_id == user_id)
+    completed_days = _completed_days(session, *group_filter)
+    recurrence.delete_series(session, user_id, repeat_group_id)
+    delete_events_where(session, *group_filter)
+    return completed_days
+
+
+def complete_event(session, user_id: int, event_id: str, efficiency) -> OperationResult:
+    if efficiency not in EFFICIENCY_LEVELS:
+        raise EventOperationError("效率评分必须为 high/medium/low")
+    event = recurrence.resolve_event_for_write(session, user_id, event_id)
+    if not event:
+        raise EventOperationError("事件不存在", 404)
+    before = score_snapshot(event)
+    event.is_completed = True
+    event.efficiency = efficiency
+    return OperationResult(event_to_dict(event), set(), score_deltas=score_deltas(before, score_snapshot(event)))
+
+
+def undo_complete_event(session, user_id: int, event_id: str) -> OperationResult:
+    event = session.query(Event).filter(Event.id == event_id, Event.user_id == user_id).first()
+    if not event:
+        virtual = recurrence.parse_virtual_event_id(event_id)
+        series = recurrence.get_user_series(session, user_id, virtual[0]) if virtual else None
+        if series is None or not recurrence.is_valid_occurrence(series, virtual[1]):
+            raise EventOperationError("事件不存在", 404)
+        # 虚拟实例本身就是未完成状态
+        return OperationResult(recurrence.occurrence_to_dict(series, virtual[1]), set(), changed=False)
+
+    if not event.is_completed:
+        return OperationResult(event_to_dict(event), set(), changed=False)
+
+    before = score_snapshot(event)
+    event.is_completed = False
+    event.efficiency = None
+    return OperationResult(event_to_dict(event), set(), score_deltas=score_deltas(before, NO_SCORE))
+
+
+def apply_batch(session, user_id: int, operations, repeat_storage: str) -> List[OperationResult]:
+    """
+    依次执行批量操作，任一操作失败抛出 EventOperationError（消息带操作序号）。
+
+    每项形如 {"op": "create|update|complete|undo|delete", "id": ..., "data": {...}, "deleteAll": bool}。
+    调用方负责回滚或统一重算积分并提交。
+    """
+    if not isinstance(operations, list) or not operations:
+        raise EventOperationError("operations 必须为非空数组")
+    if len(operations) > EVENTS_BATCH_MAX_OPERATIONS:
+        raise EventOperationError(f"单次最多 {EVENTS_BATCH_MAX_OPERATIONS} 个操作")
+
+    results = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get("op") not in BATCH_OPERATIONS:
+            raise EventOperationError(f"第 {index + 1} 个操作无效")
+        kind = operation["op"]
+        event_id = operation.get("id")
+        data = operation.get("data") or {}
+        if kind != "create" and not event_id:
+            raise EventOperationError(f"第 {index + 1} 个操作缺少 id")
+        try:
+            if kind == "create":
+                result = create_event(session, user_id, data, repeat_storage)
+            elif kind == "update":
+                result = update_event(session, user_id, event_id, data, repeat_storage)
+            elif kind == "complete":
+                result = complete_event(session, user_id, event_id, data.get("efficiency"))
+            elif kind == "undo":
+                result = undo_complete_event(session, user_id, event_id)
+            else:
+                result = delete_event(session, user_id, event_id, bool(operation.get("deleteAll")))
+            # 后续操作可能按 id 查询本批次刚写入的行
+            session.flush()
+        except EventOperationError as exc:
+            raise EventOperationError(f"第 {index + 1} 个操作失败：{exc}", exc.status) from exc
+        except ValueError as exc:
+            raise EventOperationError(f"第 {index + 1} 个操作参数无效：{exc}") from exc
+        results.append(result)
+    return results
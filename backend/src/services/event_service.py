@@ -1,172 +1,417 @@
+import base64
+import json
 from datetime import datetime, timedelta, date
-from typing import List, Optional
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
 from uuid import uuid4
+
+from sqlalchemy import and_, case, func, insert, or_, update
+from sqlalchemy.dialects import mysql, sqlite
+
 from ..models.event import Event
 from ..models.daily_score import DailyScore
+from ..utils import EVENT_ROW_COLUMNS
+from . import change_log, rollups, score_queue
+from .recurrence import occurrence_ordinals
+from .scoring import RULES, score_batch, score_rows
+
+# 单页返回的事件数量：默认值与上限，避免一次请求拉取用户全部历史
+EVENTS_PAGE_DEFAULT_LIMIT = 500
+EVENTS_PAGE_MAX_LIMIT = 1000
+# 流式响应每批从游标拉取并写出的行数，事件、灵感与用户列表共用
+STREAM_BATCH_SIZE = 500
+DAILY_SCORE_CAP = RULES.daily_cap  # 每日积分上限
+DAILY_SCORE_UPSERT_CHUNK_SIZE = 1000
+
+
+class EventQueryError(ValueError):
+    """事件查询参数（窗口、游标、分页大小）不合法时抛出。"""
+
+
+def encode_event_cursor(start: datetime, event_id: str) -> str:
+    """将 (start, id) 编码为不透明的分页游标。"""
+    raw = json.dumps([start.isoformat(), event_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_event_cursor(cursor: str) -> Tuple[datetime, str]:
+    """解析分页游标，格式错误时抛出 EventQueryError。"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        start_raw, event_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(start_raw), str(event_id)
+    except (ValueError, TypeError, UnicodeError) as exc:
+        raise EventQueryError("分页游标无效") from exc
+
+
+def normalize_page_limit(limit: Optional[int]) -> int:
+    """应用默认分页大小并截断到上限。"""
+    if limit is None:
+        return EVENTS_PAGE_DEFAULT_LIMIT
+    if limit <= 0:
+        raise EventQueryError("分页大小必须为正整数")
+    return min(limit, EVENTS_PAGE_MAX_LIMIT)
+
+
+def event_projection() -> list:
+    """事件 API 结构所需的列，顺序与 utils.EVENT_ROW_COLUMNS 一致。"""
+    return [getattr(Event, column) for column in EVENT_ROW_COLUMNS]
+
+
+def _events_window_query(session, user_id: int, window_start: Optional[datetime], window_end: Optional[datetime]):
+    if window_start and window_end and window_end <= window_start:
+        raise EventQueryError("时间窗口结束必须晚于开始")
+    query = session.query(*event_projection()).filter(Event.user_id == user_id)
+    if window_start is not None:
+        # 按 end 判断与窗口相交，开始于窗口之前的长事件无论跨度多长都不会遗漏；
+        # 近期窗口走 idx_user_end 范围扫描，历史窗口走 idx_user_start，由优化器按代价选择
+        query = query.filter(Event.end > window_start)
+    if window_end is not None:
+        query = query.filter(Event.start < window_end)
+    return query
+
+
+def iter_events_in_window(
+    session,
+    user_id: int,
+    window_start: Optional[datetime] = None,
+    window_end: Optional[datetime] = None,
+    batch_size: int = STREAM_BATCH_SIZE
+):
+    """
+    按 (start, id) 顺序流式读取窗口内的全部事件投影行，不分页。
+
+    使用服务端游标（yield_per 隐含 stream_results）每次只拉取 batch_size 行；
+    迭代结束前同一连接不能再执行其他查询。
+    """
+    query = _events_window_query(session, user_id, window_start, window_end)
+    return query.order_by(Event.start.asc(), Event.id.asc()).yield_per(batch_size)
 
-def generate_repeat_events(
+
+def query_events_page(
+    session,
+    user_id: int,
+    window_start: Optional[datetime] = None,
+    window_end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+) -> Tuple[list, Optional[str]]:
+    """
+    按 (user_id, start, id) 键集分页读取事件，走 idx_user_start 索引。
+
+    只投影 EVENT_ROW_COLUMNS 列，返回的行元组交给 event_row_to_dict 序列化，不构造 ORM 实例。
+
+    window_start/window_end: 半开时间窗口 [start, end)，返回与窗口有交集的事件
+    cursor: 上一页返回的游标，None 表示第一页
+    limit: 单页数量，默认 EVENTS_PAGE_DEFAULT_LIMIT，最大 EVENTS_PAGE_MAX_LIMIT
+
+    返回 (事件列表, 下一页游标)，没有更多数据时游标为 None。
+    """
+    limit = normalize_page_limit(limit)
+    query = _events_window_query(session, user_id, window_start, window_end)
+    if cursor:
+        cursor_start, cursor_id = decode_event_cursor(cursor)
+        query = query.filter(or_(
+            Event.start > cursor_start,
+            and_(Event.start == cursor_start, Event.id > cursor_id)
+        ))
+
+    rows = query.order_by(Event.start.asc(), Event.id.asc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    return page, encode_event_cursor(last.start, last.id)
+
+
+# 批量写入重复事件时使用的列顺序，行数据为与之对应的普通元组
+REPEAT_EVENT_COLUMNS = (
+    'id', 'title', 'start', 'end', 'allDay', 'category', 'time', 'urgency', 'remark',
+    'is_repeat', 'repeat_type', 'repeat_end_date', 'repeat_group_id',
+    'custom_type_id', 'plan_id', 'goal_id', 'task_id', 'user_id'
+)
+# 单条 INSERT 语句携带的最大行数，控制语句体积与单次往返时长
+REPEAT_INSERT_CHUNK_SIZE = 500
+
+
+def generate_repeat_event_rows(
     base_event_data: dict,
     repeat_type: str,
     repeat_end_date: Optional[date],
-    repeat_group_id: Optional[str] = None
-) -> List[Event]:
+    repeat_group_id: Optional[str] = None,
+    user_id: Optional[int] = None
+) -> List[tuple]:
     """
-    根据重复规则生成事件实例
-    
+    根据重复规则生成事件行元组（列顺序见 REPEAT_EVENT_COLUMNS），供批量写入使用。
+
     repeat_type 可选值:
     - 'daily': 每天
     - 'workday': 中国大陆法定非节假日
-    - 'holiday': 中国大陆法定节假日  
+    - 'holiday': 中国大陆法定节假日
     - 'weekday': 周一至周五
     - 'weekend': 周末
-    
+
     repeat_end_date: None 表示永久重复（默认生成一年）
     repeat_group_id: 重复事件组ID，如果不提供则自动生成
     """
-    events = []
     start_date = base_event_data['start'].date()
-    
+
     # 如果没有提供 repeat_group_id，生成一个新的
     if not repeat_group_id:
         repeat_group_id = uuid4().hex
-    
+
     # 永久重复默认生成一年内的事件
     if repeat_end_date is None:
         end_date = start_date + timedelta(days=365)
     else:
         end_date = repeat_end_date
-    
-    current_date = start_date
-    
-    while current_date <= end_date:
-        should_create = False
-        
-        if repeat_type == 'daily':
-            should_create = True
-        elif repeat_type == 'weekday':
-            should_create = current_date.weekday() < 5  # 0-4 为周一到周五
-        elif repeat_type == 'weekend':
-            should_create = current_date.weekday() >= 5  # 5-6 为周六周日
-        elif repeat_type == 'workday':
-            # 简化实现：周一至周五（实际应对接节假日 API）
-            should_create = current_date.weekday() < 5
-        elif repeat_type == 'holiday':
-            # 简化实现：周末（实际应对接节假日 API）
-            should_create = current_date.weekday() >= 5
-        
-        if should_create:
-            # 计算当日事件的开始和结束时间
-            time_delta = base_event_data['start'] - datetime.combine(start_date, datetime.min.time())
-            event_start = datetime.combine(current_date, datetime.min.time()) + time_delta
-            event_duration = base_event_data['end'] - base_event_data['start']
-            event_end = event_start + event_duration
-            
-            event = Event(
-                id=uuid4().hex,
-                title=base_event_data['title'],
-                start=event_start,
-                end=event_end,
-                allDay=base_event_data.get('allDay', False),
-                category=base_event_data.get('category', '默认'),
-                time=base_event_data.get('time', ''),
-                urgency=base_event_data.get('urgency', '普通'),
-                remark=base_event_data.get('remark'),
-                is_repeat=True,
-                repeat_type=repeat_type,
-                repeat_end_date=repeat_end_date,
-                repeat_group_id=repeat_group_id,
-                custom_type_id=base_event_data.get('custom_type_id'),
-                plan_id=base_event_data.get('plan_id'),
-                goal_id=base_event_data.get('goal_id'),
-                task_id=base_event_data.get('task_id')
-            )
-            events.append(event)
-        
-        current_date += timedelta(days=1)
-    
-    return events
 
+    # 一次算出全部匹配日期的序号，再用整体的天数偏移推出开始/结束时间
+    ordinals = occurrence_ordinals(repeat_type, start_date, end_date)
+    base_start = base_event_data['start']
+    event_duration = base_event_data['end'] - base_start
+    first_ordinal = start_date.toordinal()
+    starts = [base_start + timedelta(days=ordinal - first_ordinal) for ordinal in ordinals]
 
-def calculate_event_units(event: Event) -> float:
-    """计算事件在规则时间窗内的半小时单位数。"""
-    if not event.start or not event.end:
-        return 0
+    title = base_event_data['title']
+    shared_tail = (
+        base_event_data.get('allDay', False),
+        base_event_data.get('category', '默认'),
+        base_event_data.get('time', ''),
+        base_event_data.get('urgency', '普通'),
+        base_event_data.get('remark'),
+        True,
+        repeat_type,
+        repeat_end_date,
+        repeat_group_id,
+        base_event_data.get('custom_type_id'),
+        base_event_data.get('plan_id'),
+        base_event_data.get('goal_id'),
+        base_event_data.get('task_id'),
+        user_id
+    )
+    return [(uuid4().hex, title, start, start + event_duration) + shared_tail for start in starts]
 
-    if event.allDay:
-        return 0
 
-    start = event.start
-    end = event.end
+def event_from_row(row: tuple) -> Event:
+    """将 REPEAT_EVENT_COLUMNS 顺序的元组还原为未持久化的 Event 实例（用于响应预览），新实例均未完成。"""
+    return Event(is_completed=False, **dict(zip(REPEAT_EVENT_COLUMNS, row)))
 
-    if end <= start:
-        return 0
 
-    window_start = datetime.combine(start.date(), datetime.min.time()) + timedelta(hours=7)
-    window_end = datetime.combine(start.date() + timedelta(days=1), datetime.min.time())
-    effective_start = max(start, window_start)
-    effective_end = min(end, window_end)
+def bulk_insert_events(session, rows: List[tuple], chunk_size: int = REPEAT_INSERT_CHUNK_SIZE) -> int:
+    """
+    以 executemany 方式批量插入事件行，绕过 ORM 工作单元。
 
-    if effective_end <= effective_start:
-        return 0
+    rows 为 REPEAT_EVENT_COLUMNS 顺序的元组，按 chunk_size 分块执行，返回写入行数。
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size 必须为正整数")
+    statement = insert(Event.__table__)
+    change_log.note_changed(session, change_log.KIND_EVENT, [row[0] for row in rows])
+    for offset in range(0, len(rows), chunk_size):
+        chunk = [dict(zip(REPEAT_EVENT_COLUMNS, row)) for row in rows[offset:offset + chunk_size]]
+        rollups.note_event_days(session, ((values["user_id"], values["start"]) for values in chunk))
+        session.execute(statement, chunk)
+    return len(rows)
 
-    duration_minutes = (effective_end - effective_start).total_seconds() / 60
-    return duration_minutes / 30
+
+def calculate_event_units(event: Event) -> float:
+    """计算事件在规则时间窗内的计分单位数，规则见 scoring.RULES。"""
+    return score_batch([event.start], [event.end], [event.allDay], [None], [False])[1][0]
 
 
 def calculate_event_score(event: Event) -> int:
+    """计算单个事件的积分，规则见 scoring.RULES；批量场景请直接使用 scoring.score_rows。"""
+    return score_batch(
+        [event.start], [event.end], [event.allDay], [event.efficiency], [event.is_completed]
+    )[0][0]
+
+
+class ScoreSnapshot(NamedTuple):
+    """事件对其所在日期积分的贡献。"""
+    day: Optional[date]
+    score: int
+
+
+NO_SCORE = ScoreSnapshot(None, 0)
+
+
+def score_snapshot(event) -> ScoreSnapshot:
+    """在修改事件前后各取一次快照，两者之差即为对每日积分的增量。"""
+    if event is None or not event.start:
+        return NO_SCORE
+    return ScoreSnapshot(event.start.date(), calculate_event_score(event))
+
+
+def score_deltas(before: ScoreSnapshot, after: ScoreSnapshot) -> Dict[date, int]:
+    """由修改前后的快照得到按日期的积分增量，跨日移动时两天各有一项。"""
+    deltas: Dict[date, int] = {}
+    for snapshot, sign in ((before, -1), (after, 1)):
+        if snapshot.day is not None and snapshot.score:
+            deltas[snapshot.day] = deltas.get(snapshot.day, 0) + sign * snapshot.score
+    return {day: delta for day, delta in deltas.items() if delta}
+
+
+def apply_daily_score_delta(session, target_date: date, user_id: int, delta: int) -> bool:
     """
-    计算单个事件的积分
-    
-    规则：
-    - 7:00-23:59，每半小时为一个单位时间
-    - 高效率：2分/半小时
-    - 中效率：1分/半小时
-    - 低效率：-1分/半小时
+    在当日原始积分上原子地加 delta，并在同一条 UPDATE 中重算封顶后的 total_score。
+
+    返回 False 表示没有可增量更新的行（当日无记录、raw_score 尚为 NULL 或由旧版规则算出），
+    调用方应全量重算。
+    """
+    if not delta:
+        return True
+    table = DailyScore.__table__
+    new_raw = table.c.raw_score + delta
+    statement = (
+        update(table)
+        .where(
+            table.c.user_id == user_id,
+            table.c.date == target_date,
+            table.c.raw_score.isnot(None),
+            table.c.rules_version == RULES.version
+        )
+        # MySQL 按从左到右求值 SET，total_score 必须先于 raw_score 赋值才能读到旧值
+        .ordered_values(
+            (table.c.total_score, case((new_raw > DAILY_SCORE_CAP, DAILY_SCORE_CAP), else_=new_raw)),
+            (table.c.raw_score, new_raw),
+        )
+    )
+    return session.execute(statement).rowcount > 0
+
+
+def apply_score_changes(session, user_id: int, recompute_dates: Iterable[date], deltas: Dict[date, int]) -> None:
+    """
+    把一次写事务的积分变化落库：增量日期各一条 UPDATE，当日尚无可增量的行时就地全量计算；
+    recompute_dates 只标记为待重算，由后台线程或读取方重算。调用前须已 flush 事件变更。
     """
-    if not event.is_completed or not event.efficiency:
-        return 0
+    recompute = set(recompute_dates)
+    for target_date, delta in deltas.items():
+        if target_date in recompute or apply_daily_score_delta(session, target_date, user_id, delta):
+            continue
+        # 当日还没有可增量的行：按当前事件全量计算后插入，若并发事务抢先插入则只叠加本次增量
+        totals = _daily_totals(session, user_id, target_date, target_date)
+        _write_daily_scores(session, user_id, {target_date: totals.get(target_date, 0)}, conflict_delta=delta)
+    score_queue.mark_dirty(session, user_id, recompute)
 
-    half_hour_units = calculate_event_units(event)
 
-    if event.efficiency == "high":
-        return int(half_hour_units * 2)
-    elif event.efficiency == "medium":
-        return int(half_hour_units * 1)
-    elif event.efficiency == "low":
-        return int(half_hour_units * -1)
+def _daily_totals(session, user_id: int, start_date: date, end_date: date) -> Dict[date, int]:
+    """一次查询取出窗口内已完成事件的计分列，按日期累加未封顶的积分。"""
+    completed = session.query(
+        Event.start, Event.end, Event.allDay, Event.is_completed, Event.efficiency
+    ).filter(
+        Event.user_id == user_id,
+        Event.is_completed == True,
+        Event.start >= datetime.combine(start_date, datetime.min.time()),
+        Event.start < datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+    ).all()
+    totals: Dict[date, int] = {}
+    scores, _ = score_rows(completed)
+    for row, score in zip(completed, scores):
+        day = row.start.date()
+        totals[day] = totals.get(day, 0) + score
+    return totals
 
-    return 0
 
+def _daily_score_upsert(session, rows: List[dict], conflict_delta: Optional[int] = None):
+    """
+    按数据库方言构造 (user_id, date) 冲突时更新积分的多行 upsert；不支持的方言返回 None。
 
-def recalculate_daily_score_for_date(session, target_date: date, user_id: int) -> DailyScore:
-    """重新计算指定日期的积分总和"""
-    daily_score = session.query(DailyScore).filter(DailyScore.date == target_date, DailyScore.user_id == user_id).first()
-    if not daily_score:
-        daily_score = DailyScore(
-            id=uuid4().hex,
-            date=target_date,
-            total_score=0,
-            user_id=user_id
+    conflict_delta 为 None 时冲突行被新值覆盖；否则冲突行是并发事务刚写入的、
+    尚不含本事务变化的结果，只在其上叠加 conflict_delta（raw_score 为 NULL 或规则版本过期的旧行仍覆盖）。
+    写入的行都标记为当前规则版本。
+    """
+    dialect = session.get_bind().dialect.name
+    table = DailyScore.__table__
+    if dialect == "mysql":
+        statement = mysql.insert(table).values(rows)
+        incoming = statement.inserted
+    elif dialect == "sqlite":
+        statement = sqlite.insert(table).values(rows)
+        incoming = statement.excluded
+    else:
+        return None
+
+    if conflict_delta is None:
+        new_raw = incoming.raw_score
+    else:
+        new_raw = case(
+            (score_queue.stale_daily_score(table.c), incoming.raw_score),
+            else_=table.c.raw_score + conflict_delta
         )
+    # MySQL 从左到右求值赋值，total_score、raw_score、rules_version 须按此顺序以读到旧值
+    assignments = [
+        ("total_score", case((new_raw > DAILY_SCORE_CAP, DAILY_SCORE_CAP), else_=new_raw)),
+        ("raw_score", new_raw),
+        ("rules_version", incoming.rules_version),
+    ]
+    if dialect == "mysql":
+        return statement.on_duplicate_key_update(assignments)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.date],
+        set_=dict(assignments)
+    )
+
+
+def _write_daily_score_orm(session, user_id: int, target_date: date, raw_score: int) -> None:
+    # 无原生 upsert 的方言退回先查后写
+    daily_score = session.query(DailyScore).filter(
+        DailyScore.date == target_date, DailyScore.user_id == user_id
+    ).first()
+    if not daily_score:
+        daily_score = DailyScore(id=uuid4().hex, date=target_date, user_id=user_id)
         session.add(daily_score)
+    daily_score.raw_score = raw_score
+    daily_score.total_score = min(DAILY_SCORE_CAP, raw_score)
+    daily_score.rules_version = RULES.version
 
-    from sqlalchemy import and_  # 延迟导入避免循环
-    completed_events = session.query(Event).filter(
-        and_(
-            Event.user_id == user_id,
-            Event.is_completed == True,
-            Event.start >= datetime.combine(target_date, datetime.min.time()),
-            Event.start < datetime.combine(target_date + timedelta(days=1), datetime.min.time())
-        )
-    ).all()
 
-    total_score = sum(calculate_event_score(e) for e in completed_events)
-    daily_score.total_score = min(68, total_score)
-    return daily_score
+def _write_daily_scores(session, user_id: int, raw_scores: Dict[date, int], conflict_delta: Optional[int] = None) -> None:
+    rows = [
+        {
+            "id": uuid4().hex,
+            "user_id": user_id,
+            "date": day,
+            "raw_score": raw_score,
+            "total_score": min(DAILY_SCORE_CAP, raw_score),
+            "rules_version": RULES.version,
+        }
+        for day, raw_score in sorted(raw_scores.items())
+    ]
+    for offset in range(0, len(rows), DAILY_SCORE_UPSERT_CHUNK_SIZE):
+        chunk = rows[offset:offset + DAILY_SCORE_UPSERT_CHUNK_SIZE]
+        statement = _daily_score_upsert(session, chunk, conflict_delta)
+        if statement is None:
+            for row in chunk:
+                _write_daily_score_orm(session, user_id, row["date"], row["raw_score"])
+            continue
+        session.execute(statement)
 
 
-def calculate_and_update_daily_score(session, event: Event, user_id: int):
-    """根据事件日期更新每日积分"""
-    if not event or not event.start:
-        return None
-    return recalculate_daily_score_for_date(session, event.start.date(), user_id)
+def rebuild_daily_scores(session, user_id: int, start_date: date, end_date: date) -> None:
+    """
+    全量重建 [start_date, end_date] 内每天的积分（含零分日），用于读取前修复历史数据。
+
+    一次查询取出窗口内已完成事件，按日期一次遍历累加，再用多行 upsert 写回，
+    语句数与天数无关。
+    """
+    if end_date < start_date:
+        return
+    totals = _daily_totals(session, user_id, start_date, end_date)
+    days = (start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1))
+    _write_daily_scores(session, user_id, {day: totals.get(day, 0) for day in days})
+
+
+def rescore_user(session, user_id: int) -> int:
+    """
+    按当前计分规则重算用户全部历史积分（修改 scoring.RULES 后使用），返回写入的天数。
+
+    一次查询取出全部已完成事件批量计分，覆盖已有积分行与有完成事件的日期，不补写零分日。
+    """
+    first, last = session.query(func.min(Event.start), func.max(Event.start)).filter(
+        Event.user_id == user_id, Event.is_completed == True
+    ).one()
+    totals = _daily_totals(session, user_id, first.date(), last.date()) if first else {}
+    days = {row[0] for row in session.query(DailyScore.date).filter(DailyScore.user_id == user_id)}
+    days.update(totals)
+    _write_daily_scores(session, user_id, {day: totals.get(day, 0) for day in days})
+    return len(days)
@@ -0,0 +1,158 @@
+"""中国大陆法定节假日与调休工作日查询。
+
+数据离线内置、按年份索引；每年在首次使用时编译为按年内序号排列的位图
+（1 表示工作日），is_workday 为 O(1) 位运算。区间查询基于预先排好序的
+工作日/休息日序号表，用二分定位边界后整段切片返回，不逐日判断。
+未收录的年份回退为"周一至周五为工作日"的近似规则。
+"""
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from datetime import date
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Tuple
+
+# 按国务院办公厅每年发布的放假安排整理；区间为闭区间 (起, 止)
+_STATUTORY_CALENDAR: Dict[int, Dict[str, Tuple[Tuple[str, str], ...]]] = {
+    2023: {
+        "holidays": (
+            ("01-01", "01-02"), ("01-21", "01-27"), ("04-05", "04-05"), ("04-29", "05-03"),
+            ("06-22", "06-24"), ("09-29", "10-06"),
+        ),
+        "workdays": (
+            ("01-28", "01-29"), ("04-23", "04-23"), ("05-06", "05-06"), ("06-25", "06-25"),
+            ("10-07", "10-08"),
+        ),
+    },
+    2024: {
+        "holidays": (
+            ("01-01", "01-01"), ("02-10", "02-17"), ("04-04", "04-06"), ("05-01", "05-05"),
+            ("06-10", "06-10"), ("09-15", "09-17"), ("10-01", "10-07"),
+        ),
+        "workdays": (
+            ("02-04", "02-04"), ("02-18", "02-18"), ("04-07", "04-07"), ("04-28", "04-28"),
+            ("05-11", "05-11"), ("09-14", "09-14"), ("09-29", "09-29"), ("10-12", "10-12"),
+        ),
+    },
+    2025: {
+        "holidays": (
+            ("01-01", "01-01"), ("01-28", "02-04"), ("04-04", "04-06"), ("05-01", "05-05"),
+            ("05-31", "06-02"), ("10-01", "10-08"),
+        ),
+        "workdays": (
+            ("01-26", "01-26"), ("02-08", "02-08"), ("04-27", "04-27"), ("09-28", "09-28"),
+            ("10-11", "10-11"),
+        ),
+    },
+    2026: {
+        "holidays": (
+            ("01-01", "01-03"), ("02-15", "02-23"), ("04-04", "04-06"), ("05-01", "05-05"),
+            ("06-19", "06-21"), ("09-25", "09-27"), ("10-01", "10-07"),
+        ),
+        "workdays": (
+            ("01-04", "01-04"), ("02-14", "02-14"), ("02-28", "02-28"), ("05-09", "05-09"),
+            ("09-20", "09-20"), ("10-10", "10-10"),
+        ),
+    },
+}
+
+HOLIDAY_DATA_YEARS = frozenset(_STATUTORY_CALENDAR)
+
+
+class _YearTable(NamedTuple):
+    first_ordinal: int
+    bitmap: bytes  # 第 i 位表示该年第 i 天（从 0 开始）是否为工作日
+    workday_ordinals: List[int]
+    rest_day_ordinals: List[int]
+
+
+def _expand_ranges(year: int, ranges: Tuple[Tuple[str, str], ...]) -> List[int]:
+    ordinals = []
+    for first, last in ranges:
+        start = date.fromisoformat(f"{year}-{first}").toordinal()
+        end = date.fromisoformat(f"{year}-{last}").toordinal()
+        ordinals.extend(range(start, end + 1))
+    return ordinals
+
+
+@lru_cache(maxsize=None)
+def _year_table(year: int) -> _YearTable:
+    first_ordinal = date(year, 1, 1).toordinal()
+    days = date(year + 1, 1, 1).toordinal() - first_ordinal
+    # 先按周一至周五铺底，再用法定放假与调休覆盖
+    flags = bytearray(1 if (first_ordinal + offset) % 7 not in (0, 6) else 0 for offset in range(days))
+    entry = _STATUTORY_CALENDAR.get(year)
+    if entry:
+        for ordinal in _expand_ranges(year, entry["holidays"]):
+            flags[ordinal - first_ordinal] = 0
+        for ordinal in _expand_ranges(year, entry["workdays"]):
+            flags[ordinal - first_ordinal] = 1
+
+    bitmap = bytearray((days + 7) // 8)
+    workday_ordinals = []
+    rest_day_ordinals = []
+    for offset, flag in enumerate(flags):
+        if flag:
+            bitmap[offset >> 3] |= 1 << (offset & 7)
+            workday_ordinals.append(first_ordinal + offset)
+        else:
+            rest_day_ordinals.append(first_ordinal + offset)
+    return _YearTable(first_ordinal, bytes(bitmap), workday_ordinals, rest_day_ordinals)
+
+
+def is_workday(target: date) -> bool:
+    """是否为工作日（含调休上班日，不含法定假日与普通周末）。"""
+    table = _year_table(target.year)
+    offset = target.toordinal() - table.first_ordinal
+    return bool(table.bitmap[offset >> 3] >> (offset & 7) & 1)
+
+
+def is_rest_day(target: date) -> bool:
+    """是否为休息日（法定假日或未调休的周末）。"""
+    return not is_workday(target)
+
+
+def _ordinals_between(start: date, end: date, workdays: bool) -> List[int]:
+    ordinals: List[int] = []
+    start_ordinal = start.toordinal()
+    end_ordinal = end.toordinal()
+    for year in range(start.year, end.year + 1):
+        table = _year_table(year)
+        source = table.workday_ordinals if workdays else table.rest_day_ordinals
+        ordinals.extend(source[bisect_left(source, start_ordinal):bisect_right(source, end_ordinal)])
+    return ordinals
+
+
+def workday_ordinals_between(start: date, end: date) -> List[int]:
+    """[start, end] 内工作日的日期序号（date.toordinal）。"""
+    if end < start:
+        return []
+    return _ordinals_between(start, end, True)
+
+
+def rest_day_ordinals_between(start: date, end: date) -> List[int]:
+    """[start, end] 内休息日的日期序号（date.toordinal）。"""
+    if end < start:
+        return []
+    return _ordinals_between(start, end, False)
+
+
+def workdays_between(start: date, end: date) -> List[date]:
+    return [date.fromordinal(ordinal) for ordinal in workday_ordinals_between(start, end)]
+
+
+def rest_days_between(start: date, end: date) -> List[date]:
+    return [date.fromordinal(ordinal) for ordinal in rest_day_ordinals_between(start, end)]
+
+
+def count_workdays(start: date, end: date) -> int:
+    """[start, end] 内工作日数量，只做二分定位不生成日期列表。"""
+    if end < start:
+        return 0
+    total = 0
+    start_ordinal = start.toordinal()
+    end_ordinal = end.toordinal()
+    for year in range(start.year, end.year + 1):
+        source = _year_table(year).workday_ordinals
+        total += bisect_right(source, end_ordinal) - bisect_left(source, start_ordinal)
+    return total
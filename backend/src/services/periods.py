@@ -0,0 +1,61 @@
+"""Calendar periods as half-open ranges for index-friendly filters.
+
+``/stats`` filters by year or by year and month. Wrapping the column in
+``extract('year', ...)`` hides it from ``idx_user_date`` / ``idx_user_start``
+and scans every row of the user, so periods are expressed as
+``column >= start AND column < end`` instead, which the composite indexes
+serve with a range scan. Intervals that may start before the period use
+``overlapping`` (``end > start AND start < end``), served by ``idx_user_end``.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import DateTime
+
+
+class Period(NamedTuple):
+    start: date  # 含
+    end: date  # 不含
+
+    @property
+    def last_day(self) -> date:
+        return self.end - timedelta(days=1)
+
+    @property
+    def days(self) -> int:
+        return (self.end - self.start).days
+
+
+def period_bounds(year: Optional[int], month: Optional[int] = None) -> Optional[Period]:
+    """
+    返回年度或月度统计区间 [start, end)；未指定年份时返回 None，表示不限区间。
+
+    月份只在指定年份时生效，与 /stats 的筛选逻辑一致；月份不在 1-12 时抛出 ValueError。
+    """
+    if not year:
+        return None
+    if not month:
+        return Period(date(year, 1, 1), date(year + 1, 1, 1))
+    start = date(year, month, 1)
+    return Period(start, date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1))
+
+
+def overlapping(start_column, end_column, period: Optional[Period]) -> List:
+    """生成 [start_column, end_column) 与区间相交的条件：跨入区间的长事件不论开始多早都会命中。"""
+    if period is None:
+        return []
+    start, end = (datetime.combine(day, datetime.min.time()) for day in period)
+    return [end_column > start, start_column < end]
+
+
+def within(column, period: Optional[Period]) -> List:
+    """生成 column 落在区间内的半开区间条件；DateTime 列按日期的零点比较，区间为 None 时不加条件。"""
+    if period is None:
+        return []
+    start, end = period
+    if isinstance(column.type, DateTime):
+        start = datetime.combine(start, datetime.min.time())
+        end = datetime.combine(end, datetime.min.time())
+    return [column >= start, column < end]
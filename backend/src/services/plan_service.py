@@ -16,6 +16,7 @@ from sqlalchemy.orm import Session, joinedload
 from ..models.db import SessionLocal
 from ..models.annual_plan import AnnualPlan
 from ..models.plan_goal import PlanGoal
+from .data_version import bump_data_version
 
 
 class PlanServiceError(Exception):
@@ -46,12 +47,21 @@ class GoalNotFoundError(PlanServiceError):
 
 
 @contextmanager
-def plan_session(commit_on_success: bool = False) -> Generator[Session, None, None]:
-    """Context manager that yields a SQLAlchemy session scoped to plan workflows."""
+def plan_session(
+    commit_on_success: bool = False,
+    changed_user_id: Optional[int] = None
+) -> Generator[Session, None, None]:
+    """Context manager that yields a SQLAlchemy session scoped to plan workflows.
+
+    When ``changed_user_id`` is given, that user's data version is bumped in the
+    same transaction so cached plan listings are revalidated.
+    """
     session = SessionLocal()
     try:
         yield session
         if commit_on_success:
+            if changed_user_id is not None:
+                bump_data_version(session, changed_user_id)
             session.commit()
     except Exception:
         session.rollback()
@@ -246,7 +256,7 @@ def create_plan(user_id: int, payload: Dict[str, object]) -> Dict[str, object]:
 
     total_goal_score = _calculate_goal_total(goals_payload)
 
-    with plan_session(commit_on_success=True) as session:
+    with plan_session(commit_on_success=True, changed_user_id=user_id) as session:
         locked_plans = (
             session.query(AnnualPlan)
             .filter(AnnualPlan.user_id == user_id, AnnualPlan.plan_year == plan_year)
@@ -297,7 +307,7 @@ def update_plan(user_id: int, plan_id: str, payload: Dict[str, object]) -> Dict[
     if not isinstance(payload, dict):
         raise PlanValidationError("请求数据格式不正确。")
 
-    with plan_session(commit_on_success=True) as session:
+    with plan_session(commit_on_success=True, changed_user_id=user_id) as session:
         locked_plans = (
             session.query(AnnualPlan)
             .filter(AnnualPlan.user_id == user_id)
@@ -401,7 +411,7 @@ def delete_plan(user_id: int, plan_id: str) -> Dict[str, object]:
     if not plan_id:
         raise PlanValidationError("缺少规划 ID。")
 
-    with plan_session(commit_on_success=True) as session:
+    with plan_session(commit_on_success=True, changed_user_id=user_id) as session:
         plan = (
             session.query(AnnualPlan)
             .filter(AnnualPlan.user_id == user_id, AnnualPlan.id == plan_id)
@@ -442,7 +452,7 @@ def reorder_plan_goals(user_id: int, plan_id: str, goal_ids: Optional[List[str]]
     if len(set(normalized_ids)) != len(normalized_ids):
         raise PlanValidationError("目标顺序包含重复条目。")
 
-    with plan_session(commit_on_success=True) as session:
+    with plan_session(commit_on_success=True, changed_user_id=user_id) as session:
         plan = (
             session.query(AnnualPlan)
             .options(joinedload(AnnualPlan.goals))
@@ -0,0 +1,552 @@
+"""Virtual recurrence engine.
+
+A repeat series is stored once in ``event_series`` and expanded into
+occurrences only for the window a reader asks for. An occurrence becomes an
+``events`` row only when it is completed or edited; its date is then recorded
+in the series exdates so the expander stops producing it.
+
+Series writes touch no ``events`` rows, so the rollup hooks never see them. A
+``before_flush`` hook records the days whose ``/stats`` buckets a series write
+can change (the whole span before and after the edit, or only the added and
+removed exdates), bulk deletes register theirs through ``note_series_span``,
+and writers read them with ``pending_series_days`` before committing.
+"""
+from __future__ import annotations
+
+import json
+from datetime import date, datetime, timedelta
+from itertools import chain, compress, cycle
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+from uuid import uuid4
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from ..models.event import Event
+from ..models.event_series import EventSeries
+from . import change_log, holiday_calendar
+
+REPEAT_TYPES = {"daily", "weekday", "weekend", "workday", "holiday"}
+# 永久重复的展开上限：自锚点起一年，与旧的实例化行为一致；窗口展开、计数与实例校验共用同一上限
+UNBOUNDED_HORIZON = timedelta(days=365)
+VIRTUAL_ID_SEPARATOR = "-"
+# 系列拆分时原样复制到新系列的内容字段
+SERIES_CONTENT_FIELDS = (
+    "title", "allDay", "category", "time", "urgency", "remark", "repeat_type",
+    "custom_type_id", "plan_id", "goal_id", "task_id",
+)
+# 改动后需要按整个跨度失效统计的系列字段；只改 overrides 时只登记增减的排除日期
+_SPAN_FIELDS = ("anchor_start", "duration_seconds", "repeat_end_date", "repeat_type", "custom_type_id")
+_SERIES_DAYS_KEY = "series_days"
+
+
+# 按 date.toordinal() % 7 索引的星期掩码（序号 1 为周一，因此索引 0 为周日）
+_WEEKDAY_MASKS = {
+    'daily': (1, 1, 1, 1, 1, 1, 1),
+    'weekday': (0, 1, 1, 1, 1, 1, 0),
+    'weekend': (1, 0, 0, 0, 0, 0, 1),
+}
+
+
+def _matches_rule(repeat_type: str, current_date: date) -> bool:
+    if repeat_type in _WEEKDAY_MASKS:
+        return bool(_WEEKDAY_MASKS[repeat_type][current_date.toordinal() % 7])
+    if repeat_type == 'workday':
+        return holiday_calendar.is_workday(current_date)
+    if repeat_type == 'holiday':
+        return holiday_calendar.is_rest_day(current_date)
+    return False
+
+
+def occurrence_ordinals(repeat_type: str, first_date: date, last_date: date) -> List[int]:
+    """
+    返回 [first_date, last_date] 内满足重复规则的日期序号（date.toordinal），升序。
+
+    周规则用旋转后的 7 天掩码对整段序号做一次 compress，节假日规则直接切片
+    holiday_calendar 的预计算序号表，均不逐日判断。
+    """
+    if last_date < first_date:
+        return []
+    if repeat_type == 'workday':
+        return holiday_calendar.workday_ordinals_between(first_date, last_date)
+    if repeat_type == 'holiday':
+        return holiday_calendar.rest_day_ordinals_between(first_date, last_date)
+    mask = _WEEKDAY_MASKS.get(repeat_type)
+    if mask is None:
+        return []
+    first_ordinal = first_date.toordinal()
+    shift = first_ordinal % 7
+    rotated = mask[shift:] + mask[:shift]
+    return list(compress(range(first_ordinal, last_date.toordinal() + 1), cycle(rotated)))
+
+
+def occurrence_dates(repeat_type: str, first_date: date, last_date: date) -> List[date]:
+    """返回 [first_date, last_date] 内满足重复规则的日期。"""
+    return [date.fromordinal(ordinal) for ordinal in occurrence_ordinals(repeat_type, first_date, last_date)]
+
+
+def build_virtual_event_id(series_id: str, occurrence_date: date) -> str:
+    return f"{series_id}{VIRTUAL_ID_SEPARATOR}{occurrence_date.strftime('%Y%m%d')}"
+
+
+def parse_virtual_event_id(event_id: str) -> Optional[Tuple[str, date]]:
+    """解析虚拟实例 ID，非虚拟 ID 返回 None。"""
+    series_id, separator, date_part = (event_id or "").rpartition(VIRTUAL_ID_SEPARATOR)
+    if not separator or not series_id or len(date_part) != 8 or not date_part.isdigit():
+        return None
+    try:
+        return series_id, datetime.strptime(date_part, '%Y%m%d').date()
+    except ValueError:
+        return None
+
+
+def _parse_exdates(overrides: Optional[str]) -> Set[date]:
+    if not overrides:
+        return set()
+    raw = json.loads(overrides)
+    return {date.fromisoformat(item) for item in raw.get("exdates", [])}
+
+
+def load_exdates(series: EventSeries) -> Set[date]:
+    return _parse_exdates(series.overrides)
+
+
+def add_exdate(series: EventSeries, occurrence_date: date) -> None:
+    raw = json.loads(series.overrides) if series.overrides else {}
+    exdates = set(raw.get("exdates", []))
+    exdates.add(occurrence_date.isoformat())
+    raw["exdates"] = sorted(exdates)
+    series.overrides = json.dumps(raw, separators=(",", ":"))
+
+
+def save_exdates(series: EventSeries, exdates) -> None:
+    raw = json.loads(series.overrides) if series.overrides else {}
+    raw["exdates"] = sorted({d.isoformat() for d in exdates})
+    series.overrides = json.dumps(raw, separators=(",", ":"))
+
+
+def _series_time_offset(series: EventSeries) -> timedelta:
+    return series.anchor_start - datetime.combine(series.anchor_start.date(), datetime.min.time())
+
+
+def occurrence_start(series: EventSeries, occurrence_date: date) -> datetime:
+    return datetime.combine(occurrence_date, datetime.min.time()) + _series_time_offset(series)
+
+
+def _last_date(anchor_start: datetime, repeat_end_date: Optional[date]) -> date:
+    if repeat_end_date is not None:
+        return repeat_end_date
+    return anchor_start.date() + UNBOUNDED_HORIZON
+
+
+def series_last_date(series: EventSeries) -> date:
+    """系列最后一次可能发生的日期；永久重复截止于锚点后 UNBOUNDED_HORIZON。"""
+    return _last_date(series.anchor_start, series.repeat_end_date)
+
+
+def _span_days(anchor_start: Optional[datetime], duration_seconds: Optional[int],
+               repeat_end_date: Optional[date]) -> Set[date]:
+    """系列实例可能覆盖的首尾日期及其间每月 1 日，足以定位需要失效的年/月统计区间。"""
+    if anchor_start is None:
+        return set()
+    first = anchor_start.date()
+    last_end = datetime.combine(_last_date(anchor_start, repeat_end_date), anchor_start.time())
+    last = (last_end + timedelta(seconds=duration_seconds or 0)).date()
+    if last < first:
+        return set()
+    days = {first, last}
+    month = date(first.year, first.month, 1)
+    while month <= last:
+        days.add(max(month, first))
+        month = date(month.year + 1, 1, 1) if month.month == 12 else date(month.year, month.month + 1, 1)
+    return days
+
+
+def note_series_days(session, user_id: Optional[int], days: Iterable[date]) -> None:
+    """登记系列改动影响的日期，提交前由调用方取出用于失效统计缓存。"""
+    if user_id is None:
+        return
+    session.info.setdefault(_SERIES_DAYS_KEY, {}).setdefault(user_id, set()).update(days)
+
+
+def note_series_span(session, series: EventSeries) -> None:
+    """登记系列当前定义覆盖的全部日期，供绕过 ORM 删除或更新系列的调用方使用。"""
+    note_series_days(session, series.user_id,
+                     _span_days(series.anchor_start, series.duration_seconds, series.repeat_end_date))
+
+
+def pending_series_days(session) -> Dict[int, Set[date]]:
+    """返回本事务已登记的 {用户: 日期集合} 副本；ORM 改动需先 flush 才会计入。"""
+    return {user_id: set(days) for user_id, days in session.info.get(_SERIES_DAYS_KEY, {}).items()}
+
+
+def _previous_value(state, name: str):
+    history = state.attrs[name].history
+    return history.deleted[0] if history.deleted else state.attrs[name].value
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_series_days(session, flush_context, instances):
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(instance, EventSeries):
+            continue
+        if instance in session.new or instance in session.deleted:
+            note_series_span(session, instance)
+            continue
+        state = inspect(instance)
+        if any(state.attrs[name].history.has_changes() for name in _SPAN_FIELDS):
+            # 改期、改结束日期或改类型：新旧两段跨度都要失效
+            note_series_days(session, instance.user_id, _span_days(
+                _previous_value(state, "anchor_start"),
+                _previous_value(state, "duration_seconds"),
+                _previous_value(state, "repeat_end_date"),
+            ))
+            note_series_span(session, instance)
+        elif state.attrs.overrides.history.has_changes():
+            previous = _parse_exdates(_previous_value(state, "overrides"))
+            note_series_days(session, instance.user_id, previous ^ load_exdates(instance))
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_soft_rollback")
+def _reset_series_days(session, *args):
+    session.info.pop(_SERIES_DAYS_KEY, None)
+
+
+def series_dates_in_window(
+    series: EventSeries,
+    window_start: Optional[datetime] = None,
+    window_end: Optional[datetime] = None
+) -> List[date]:
+    """返回系列在窗口内（与窗口有交集）的未排除实例日期。"""
+    duration = timedelta(seconds=series.duration_seconds or 0)
+    offset = _series_time_offset(series)
+    first_date = series.anchor_start.date()
+    if window_start is not None:
+        first_date = max(first_date, (window_start - duration - offset).date())
+    # 有无窗口都以 series_last_date 为上限，列出的实例与 is_valid_occurrence 接受的实例一致
+    last_date = series_last_date(series)
+    if window_end is not None:
+        last_date = min(last_date, (window_end - offset).date())
+    if last_date < first_date:
+        return []
+
+    exdate_ordinals = {d.toordinal() for d in load_exdates(series)}
+    ordinals = [
+        o for o in occurrence_ordinals(series.repeat_type, first_date, last_date)
+        if o not in exdate_ordinals
+    ]
+    # 首尾两天可能因开始时刻/时长落在窗口外，只需检查边界
+    midnight = datetime.min.time()
+    while ordinals and window_start is not None and \
+            datetime.combine(date.fromordinal(ordinals[0]), midnight) + offset + duration <= window_start:
+        ordinals.pop(0)
+    while ordinals and window_end is not None and \
+            datetime.combine(date.fromordinal(ordinals[-1]), midnight) + offset >= window_end:
+        ordinals.pop()
+    return [date.fromordinal(o) for o in ordinals]
+
+
+def occurrence_to_dict(series: EventSeries, occurrence_date: date) -> Dict[str, object]:
+    """虚拟实例的 API 结构，与 event_to_dict 保持一致并附加 isVirtual。"""
+    start = occurrence_start(series, occurrence_date)
+    end = start + timedelta(seconds=series.duration_seconds or 0)
+    return {
+        "id": build_virtual_event_id(series.id, occurrence_date),
+        "title": series.title,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "allDay": series.allDay,
+        "category": series.category,
+        "time": series.time,
+        "urgency": series.urgency,
+        "remark": series.remark,
+        "isRepeat": True,
+        "repeatType": series.repeat_type,
+        "repeatEndDate": series.repeat_end_date.isoformat() if series.repeat_end_date else None,
+        "repeatGroupId": series.id,
+        "isCompleted": False,
+        "efficiency": None,
+        "customTypeId": series.custom_type_id,
+        "planId": series.plan_id,
+        "goalId": series.goal_id,
+        "taskId": series.task_id,
+        "isVirtual": True,
+    }
+
+
+def series_to_dict(series: EventSeries) -> Dict[str, object]:
+    """系列定义本身的 API 结构，供增量同步的客户端自行展开或刷新窗口。"""
+    return {
+        "id": series.id,
+        "title": series.title,
+        "anchorStart": series.anchor_start.isoformat() if series.anchor_start else None,
+        "durationSeconds": series.duration_seconds,
+        "allDay": series.allDay,
+        "category": series.category,
+        "time": series.time,
+        "urgency": series.urgency,
+        "remark": series.remark,
+        "repeatType": series.repeat_type,
+        "repeatEndDate": series.repeat_end_date.isoformat() if series.repeat_end_date else None,
+        "exdates": sorted(d.isoformat() for d in load_exdates(series)),
+        "customTypeId": series.custom_type_id,
+        "planId": series.plan_id,
+        "goalId": series.goal_id,
+        "taskId": series.task_id,
+    }
+
+
+def _candidate_series_query(session, user_id: int, window_start=None, window_end=None):
+    query = session.query(EventSeries).filter(EventSeries.user_id == user_id)
+    if window_end is not None:
+        query = query.filter(EventSeries.anchor_start < window_end)
+    if window_start is not None:
+        query = query.filter(
+            (EventSeries.repeat_end_date.is_(None))
+            | (EventSeries.repeat_end_date >= (window_start - timedelta(days=1)).date())
+        )
+    return query
+
+
+def expand_user_series(
+    session,
+    user_id: int,
+    window_start: Optional[datetime] = None,
+    window_end: Optional[datetime] = None
+) -> List[Tuple[datetime, str, Dict[str, object]]]:
+    """展开用户全部系列在窗口内的虚拟实例，返回按 (start, id) 排序的三元组。"""
+    occurrences = []
+    for series in _candidate_series_query(session, user_id, window_start, window_end):
+        offset = _series_time_offset(series)
+        for occurrence_date in series_dates_in_window(series, window_start, window_end):
+            start = datetime.combine(occurrence_date, datetime.min.time()) + offset
+            occurrences.append((start, build_virtual_event_id(series.id, occurrence_date),
+                                occurrence_to_dict(series, occurrence_date)))
+    occurrences.sort(key=lambda item: (item[0], item[1]))
+    return occurrences
+
+
+def merge_with_stored_page(
+    stored: List[Tuple[datetime, str, Dict[str, object]]],
+    stored_has_more: bool,
+    occurrences: List[Tuple[datetime, str, Dict[str, object]]],
+    after: Optional[Tuple[datetime, str]],
+    limit: int
+) -> Tuple[List[Dict[str, object]], Optional[Tuple[datetime, str]]]:
+    """
+    将一页已存储事件与虚拟实例按 (start, id) 合并为同一条键集序列。
+
+    返回 (本页条目, 下一页的 (start, id) 键)，没有更多数据时键为 None。
+    """
+    if after is not None:
+        occurrences = [item for item in occurrences if (item[0], item[1]) > after]
+    merged = sorted(stored + occurrences, key=lambda item: (item[0], item[1]))
+    page = merged[:limit]
+    has_more = stored_has_more or len(merged) > limit
+    next_key = (page[-1][0], page[-1][1]) if has_more and page else None
+    return [item[2] for item in page], next_key
+
+
+def series_in_window(
+    session,
+    user_id: int,
+    window_start: Optional[datetime] = None,
+    window_end: Optional[datetime] = None
+) -> List[Tuple[EventSeries, List[date]]]:
+    """一次查询取出窗口内有虚拟实例的系列及其实例日期，供计数与时长统计共用。"""
+    expanded = []
+    for series in _candidate_series_query(session, user_id, window_start, window_end):
+        dates = series_dates_in_window(series, window_start, window_end)
+        if dates:
+            expanded.append((series, dates))
+    return expanded
+
+
+def count_window_occurrences(
+    expanded: List[Tuple[EventSeries, List[date]]],
+    key: Callable[[EventSeries], Hashable]
+) -> Dict[Hashable, int]:
+    """按 key(series) 汇总 series_in_window 结果中的虚拟实例数量。"""
+    counts: Dict[Hashable, int] = {}
+    for series, dates in expanded:
+        group = key(series)
+        counts[group] = counts.get(group, 0) + len(dates)
+    return counts
+
+
+def occurrence_intervals(
+    expanded: List[Tuple[EventSeries, List[date]]]
+) -> List[Tuple[datetime, datetime, Optional[str]]]:
+    """series_in_window 结果中非全天虚拟实例的 (开始, 结束, 类型) 区间。"""
+    intervals = []
+    for series, dates in expanded:
+        if series.allDay or not series.duration_seconds:
+            continue
+        offset = _series_time_offset(series)
+        duration = timedelta(seconds=series.duration_seconds)
+        midnight = datetime.min.time()
+        for occurrence_date in dates:
+            start = datetime.combine(occurrence_date, midnight) + offset
+            intervals.append((start, start + duration, series.custom_type_id))
+    return intervals
+
+
+def series_occurrence_counts(
+    session,
+    user_id: int,
+    key: Callable[[EventSeries], Hashable],
+    window_start: Optional[datetime] = None,
+    window_end: Optional[datetime] = None
+) -> Dict[Hashable, int]:
+    """按 key(series) 汇总窗口内虚拟实例数量，供统计与任务进度使用。"""
+    return count_window_occurrences(series_in_window(session, user_id, window_start, window_end), key)
+
+
+def create_series(
+    session,
+    user_id: int,
+    base_event_data: dict,
+    repeat_type: str,
+    repeat_end_date: Optional[date],
+    repeat_group_id: Optional[str] = None
+) -> EventSeries:
+    """写入一条系列定义，取代逐日生成事件行。"""
+    start = base_event_data['start']
+    end = base_event_data['end']
+    series = EventSeries(
+        id=repeat_group_id or uuid4().hex,
+        user_id=user_id,
+        title=base_event_data['title'],
+        allDay=base_event_data.get('allDay', False),
+        category=base_event_data.get('category', '默认'),
+        time=base_event_data.get('time', ''),
+        urgency=base_event_data.get('urgency', '普通'),
+        remark=base_event_data.get('remark'),
+        custom_type_id=base_event_data.get('custom_type_id'),
+        plan_id=base_event_data.get('plan_id'),
+        goal_id=base_event_data.get('goal_id'),
+        task_id=base_event_data.get('task_id'),
+        repeat_type=repeat_type,
+        anchor_start=start,
+        duration_seconds=max(0, int((end - start).total_seconds())),
+        repeat_end_date=repeat_end_date,
+    )
+    session.add(series)
+    return series
+
+
+def get_user_series(session, user_id: int, series_id: str) -> Optional[EventSeries]:
+    return session.query(EventSeries).filter(
+        EventSeries.id == series_id,
+        EventSeries.user_id == user_id
+    ).first()
+
+
+def is_valid_occurrence(series: EventSeries, occurrence_date: date) -> bool:
+    if occurrence_date < series.anchor_start.date() or occurrence_date > series_last_date(series):
+        return False
+    if occurrence_date in load_exdates(series):
+        return False
+    return _matches_rule(series.repeat_type, occurrence_date)
+
+
+def materialize_occurrence(session, series: EventSeries, occurrence_date: date) -> Event:
+    """将虚拟实例写成 events 行，并把该日期加入 exdates。"""
+    start = occurrence_start(series, occurrence_date)
+    event = Event(
+        id=uuid4().hex,
+        title=series.title,
+        start=start,
+        end=start + timedelta(seconds=series.duration_seconds or 0),
+        allDay=series.allDay,
+        category=series.category,
+        time=series.time,
+        urgency=series.urgency,
+        remark=series.remark,
+        is_repeat=True,
+        repeat_type=series.repeat_type,
+        repeat_end_date=series.repeat_end_date,
+        repeat_group_id=series.id,
+        custom_type_id=series.custom_type_id,
+        plan_id=series.plan_id,
+        goal_id=series.goal_id,
+        task_id=series.task_id,
+        user_id=series.user_id
+    )
+    add_exdate(series, occurrence_date)
+    session.add(event)
+    return event
+
+
+def resolve_event_for_write(session, user_id: int, event_id: str) -> Optional[Event]:
+    """
+    获取待修改的事件：普通 ID 直接查询，虚拟实例 ID 先实例化为 events 行。
+
+    不存在或不属于该用户时返回 None。
+    """
+    event = session.query(Event).filter(Event.id == event_id, Event.user_id == user_id).first()
+    if event is not None:
+        return event
+    parsed = parse_virtual_event_id(event_id)
+    if parsed is None:
+        return None
+    series = get_user_series(session, user_id, parsed[0])
+    if series is None or not is_valid_occurrence(series, parsed[1]):
+        return None
+    event = materialize_occurrence(session, series, parsed[1])
+    session.flush()
+    return event
+
+
+def shift_series(series: EventSeries, start_delta: timedelta, duration_delta: timedelta) -> None:
+    """
+    整体平移系列的开始时刻并调整时长。
+
+    平移跨日时，排除日期与结束日期随实例一起移动，已实例化/已删除的日期保持对应。
+    """
+    day_shift = timedelta(days=((series.anchor_start + start_delta).date() - series.anchor_start.date()).days)
+    series.anchor_start = series.anchor_start + start_delta
+    series.duration_seconds = max(0, (series.duration_seconds or 0) + int(duration_delta.total_seconds()))
+    if day_shift:
+        save_exdates(series, {d + day_shift for d in load_exdates(series)})
+        if series.repeat_end_date is not None:
+            series.repeat_end_date = series.repeat_end_date + day_shift
+
+
+def split_series(session, series: EventSeries, pivot_date: date, new_series_id: str) -> EventSeries:
+    """在 pivot_date 处把系列一分为二：原系列截止到前一天，返回从 pivot_date 起的新系列。"""
+    exdates = load_exdates(series)
+    tail = EventSeries(
+        id=new_series_id,
+        user_id=series.user_id,
+        anchor_start=occurrence_start(series, pivot_date),
+        duration_seconds=series.duration_seconds,
+        repeat_end_date=series.repeat_end_date,
+        **{field: getattr(series, field) for field in SERIES_CONTENT_FIELDS}
+    )
+    save_exdates(tail, {d for d in exdates if d >= pivot_date})
+    series.repeat_end_date = pivot_date - timedelta(days=1)
+    save_exdates(series, {d for d in exdates if d < pivot_date})
+    session.add(tail)
+    return tail
+
+
+def delete_series(session, user_id: int, series_id: str) -> None:
+    """删除系列定义；已实例化的 events 行由调用方按 repeat_group_id 处理。"""
+    series = get_user_series(session, user_id, series_id)
+    if series is not None:
+        note_series_span(session, series)
+    change_log.note_deleted(session, change_log.KIND_SERIES, [series_id])
+    session.query(EventSeries).filter(
+        EventSeries.id == series_id,
+        EventSeries.user_id == user_id
+    ).delete(synchronize_session=False)
+
+
+def count_occurrences(series: EventSeries) -> int:
+    return len(series_dates_in_window(series))
+
+
+def preview_occurrences(series: EventSeries, limit: int = 10) -> List[Dict[str, object]]:
+    return [occurrence_to_dict(series, d) for d in series_dates_in_window(series)[:limit]]
@@ -0,0 +1,280 @@
+"""Per-day rollups of events by type and efficiency.
+
+``daily_type_rollups`` holds one row per (user, day, type, efficiency) with the
+event count, completed count, scored half-hour units, score and recorded
+duration of the events starting that day. ``/daily-score-details`` and
+``/stats`` read it with one indexed range scan instead of re-scoring events.
+
+Rows are kept current inside the transaction that writes the events: a
+``before_flush`` hook records the (user, day) pairs touched through the ORM,
+bulk statements register theirs with ``note_event_days``, and a
+``before_commit`` hook recomputes exactly those days from ``events``.
+``rebuild_rollups`` backfills whole users: ``init_db`` runs it once when the
+table is still empty, and ``flask rebuild-rollups`` repairs it on demand.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from itertools import chain, islice
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import and_, case, delete, event, func, insert, inspect, or_, select, tuple_
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+
+from ..models.daily_type_rollup import DailyTypeRollup
+from ..models.event import Event
+from .scoring import score_rows
+
+NO_TYPE = ""
+NO_EFFICIENCY = ""
+VALUE_COLUMNS = ("event_count", "completed_count", "half_hour_units", "score", "recorded_seconds")
+EFFICIENCY_LEVELS = ("high", "medium", "low")
+
+_DAYS_KEY = "rollup_days"
+_RANGES_PER_QUERY = 100
+_WRITE_CHUNK_SIZE = 500
+_REBUILD_BATCH_SIZE = 1000
+
+
+class RollupTotal(NamedTuple):
+    type_id: str
+    efficiency: str
+    event_count: int
+    completed_count: int
+    half_hour_units: float
+    score: int
+    recorded_seconds: float
+
+
+class RollupTypeTotal(NamedTuple):
+    type_id: str
+    event_count: int
+    completed_count: int
+    recorded_seconds: float
+    efficiency_counts: Dict[str, int]  # EFFICIENCY_LEVELS 中各效率的事件数
+
+
+def _pending(session) -> Dict[int, Set[date]]:
+    return session.info.setdefault(_DAYS_KEY, {})
+
+
+def note_event_days(session, rows: Iterable[Tuple[Optional[int], Optional[datetime]]]) -> None:
+    """登记绕过 ORM 写入/删除的事件 (user_id, start)，提交前重算这些天的汇总。"""
+    pending = _pending(session)
+    for user_id, start in rows:
+        if user_id is not None and isinstance(start, datetime):
+            pending.setdefault(user_id, set()).add(start.date())
+
+
+def pending_event_days(session) -> Dict[int, Set[date]]:
+    """返回本事务已登记、提交前将重算汇总的 {用户: 日期集合} 副本；ORM 改动需先 flush 才会计入。"""
+    return {user_id: set(days) for user_id, days in _pending(session).items()}
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_event_days(session, flush_context, instances):
+    touched = []
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(instance, Event):
+            continue
+        state = inspect(instance)
+        # 改期或换用户时新旧两天都要重算
+        starts = [instance.start, *state.attrs.start.history.deleted]
+        user_ids = [instance.user_id, *state.attrs.user_id.history.deleted]
+        touched.extend((user_id, start) for user_id in user_ids for start in starts)
+    if touched:
+        note_event_days(session, touched)
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_before_commit(session):
+    session.flush()  # SessionLocal 关闭了 autoflush，先 flush 以收集尚未写出的事件
+    pending = session.info.pop(_DAYS_KEY, None)
+    for user_id, days in (pending or {}).items():
+        refresh_days(session, user_id, days)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _reset_pending(session, previous_transaction):
+    session.info.pop(_DAYS_KEY, None)
+
+
+def day_ranges(days: Iterable[date]) -> List[Tuple[date, date]]:
+    # 连续日期合并为闭区间，批量写入（如重复事件）时查询条件不随天数增长
+    ranges: List[Tuple[date, date]] = []
+    for day in sorted(days):
+        if ranges and day == ranges[-1][1] + timedelta(days=1):
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+
+def _scoring_columns():
+    return (Event.start, Event.end, Event.allDay, Event.is_completed, Event.efficiency, Event.custom_type_id)
+
+
+def _accumulate(totals: Dict[tuple, list], rows) -> None:
+    rows = list(rows)
+    scores, units = score_rows(rows)
+    for row, score, event_units in zip(rows, scores, units):
+        key = (row.start.date(), row.custom_type_id or NO_TYPE, row.efficiency or NO_EFFICIENCY)
+        bucket = totals.get(key)
+        if bucket is None:
+            bucket = totals[key] = [0, 0, 0.0, 0, 0.0]
+        bucket[0] += 1
+        if row.is_completed:
+            bucket[1] += 1
+            bucket[2] += event_units
+            bucket[3] += score
+        if not row.allDay and row.end:
+            bucket[4] += (row.end - row.start).total_seconds()
+
+
+def _rows_for_write(user_id: int, totals: Dict[tuple, list]) -> List[dict]:
+    return [
+        {"user_id": user_id, "date": day, "type_id": type_id, "efficiency": efficiency,
+         **dict(zip(VALUE_COLUMNS, values))}
+        for (day, type_id, efficiency), values in sorted(totals.items())
+    ]
+
+
+def _rollup_upsert(session, rows: List[dict]):
+    """按方言构造主键冲突时覆盖汇总值的多行 upsert；不支持的方言返回 None。"""
+    dialect = session.get_bind().dialect.name
+    table = DailyTypeRollup.__table__
+    if dialect == "mysql":
+        statement = mysql.insert(table).values(rows)
+        return statement.on_duplicate_key_update({name: statement.inserted[name] for name in VALUE_COLUMNS})
+    if dialect == "sqlite":
+        statement = sqlite.insert(table).values(rows)
+        return statement.on_conflict_do_update(
+            index_elements=list(table.primary_key.columns),
+            set_={name: statement.excluded[name] for name in VALUE_COLUMNS}
+        )
+    return None
+
+
+def refresh_days(session, user_id: int, days: Iterable[date]) -> None:
+    """按 events 重算用户指定日期的汇总行：覆盖仍存在的组合，删除已不存在的组合。"""
+    ranges = day_ranges(days)
+    if not ranges:
+        return
+    table = DailyTypeRollup.__table__
+    totals: Dict[tuple, list] = {}
+    existing = []
+    for offset in range(0, len(ranges), _RANGES_PER_QUERY):
+        chunk = ranges[offset:offset + _RANGES_PER_QUERY]
+        rows = session.query(*_scoring_columns()).filter(
+            Event.user_id == user_id,
+            or_(*[
+                and_(
+                    Event.start >= datetime.combine(first, datetime.min.time()),
+                    Event.start < datetime.combine(last + timedelta(days=1), datetime.min.time())
+                )
+                for first, last in chunk
+            ])
+        )
+        _accumulate(totals, rows)
+        existing.extend(session.execute(
+            select(table.c.date, table.c.type_id, table.c.efficiency).where(
+                table.c.user_id == user_id,
+                or_(*[table.c.date.between(first, last) for first, last in chunk])
+            )
+        ))
+
+    stale = [tuple(key) for key in existing if tuple(key) not in totals]
+    for offset in range(0, len(stale), _WRITE_CHUNK_SIZE):
+        session.execute(delete(table).where(
+            table.c.user_id == user_id,
+            tuple_(table.c.date, table.c.type_id, table.c.efficiency).in_(stale[offset:offset + _WRITE_CHUNK_SIZE])
+        ))
+
+    rows = _rows_for_write(user_id, totals)
+    for offset in range(0, len(rows), _WRITE_CHUNK_SIZE):
+        chunk = rows[offset:offset + _WRITE_CHUNK_SIZE]
+        statement = _rollup_upsert(session, chunk)
+        if statement is None:
+            # 无原生 upsert 的方言：先删后插
+            session.execute(delete(table).where(
+                table.c.user_id == user_id,
+                tuple_(table.c.date, table.c.type_id, table.c.efficiency).in_(
+                    [(row["date"], row["type_id"], row["efficiency"]) for row in chunk]
+                )
+            ))
+            session.execute(insert(table), chunk)
+        else:
+            session.execute(statement)
+
+
+def rebuild_rollups(session, user_id: int) -> int:
+    """按 events 全量重建一个用户的汇总行，返回写入行数；由调用方提交。"""
+    table = DailyTypeRollup.__table__
+    totals: Dict[tuple, list] = {}
+    rows = iter(session.query(*_scoring_columns()).filter(Event.user_id == user_id).yield_per(_REBUILD_BATCH_SIZE))
+    for batch in iter(lambda: list(islice(rows, _REBUILD_BATCH_SIZE)), []):
+        _accumulate(totals, batch)
+    session.execute(delete(table).where(table.c.user_id == user_id))
+    rows = _rows_for_write(user_id, totals)
+    for offset in range(0, len(rows), _WRITE_CHUNK_SIZE):
+        session.execute(insert(table), rows[offset:offset + _WRITE_CHUNK_SIZE])
+    session.info.pop(_DAYS_KEY, None)
+    return len(rows)
+
+
+def rollup_totals(session, user_id: int, start_date: Optional[date] = None,
+                  end_date: Optional[date] = None) -> List[RollupTotal]:
+    """
+    读取 [start_date, end_date] 内按 (type_id, efficiency) 求和的汇总行，区间端点为 None 表示不限。
+
+    MySQL 的 SUM 返回 Decimal，这里统一转换为 Python 数值以便直接序列化。
+    """
+    query = session.query(
+        DailyTypeRollup.type_id,
+        DailyTypeRollup.efficiency,
+        *[func.sum(getattr(DailyTypeRollup, name)).label(name) for name in VALUE_COLUMNS]
+    ).filter(DailyTypeRollup.user_id == user_id)
+    if start_date is not None:
+        query = query.filter(DailyTypeRollup.date >= start_date)
+    if end_date is not None:
+        query = query.filter(DailyTypeRollup.date <= end_date)
+    totals = []
+    for row in query.group_by(DailyTypeRollup.type_id, DailyTypeRollup.efficiency):
+        totals.append(RollupTotal(
+            row.type_id, row.efficiency,
+            int(row.event_count or 0), int(row.completed_count or 0), float(row.half_hour_units or 0),
+            int(row.score or 0), float(row.recorded_seconds or 0)
+        ))
+    return totals
+
+
+def rollup_type_totals(session, user_id: int, start_date: Optional[date] = None,
+                       end_date: Optional[date] = None) -> List[RollupTypeTotal]:
+    """
+    读取 [start_date, end_date] 内按 type_id 求和的汇总，区间端点为 None 表示不限。
+
+    各效率的事件数用 SUM(CASE ...) 条件聚合在同一条 GROUP BY 中算出，语句数与类型数无关。
+    """
+    efficiency_sums = [
+        func.sum(case((DailyTypeRollup.efficiency == level, DailyTypeRollup.event_count), else_=0)).label(level)
+        for level in EFFICIENCY_LEVELS
+    ]
+    query = session.query(
+        DailyTypeRollup.type_id,
+        func.sum(DailyTypeRollup.event_count).label("event_count"),
+        func.sum(DailyTypeRollup.completed_count).label("completed_count"),
+        func.sum(DailyTypeRollup.recorded_seconds).label("recorded_seconds"),
+        *efficiency_sums
+    ).filter(DailyTypeRollup.user_id == user_id)
+    if start_date is not None:
+        query = query.filter(DailyTypeRollup.date >= start_date)
+    if end_date is not None:
+        query = query.filter(DailyTypeRollup.date <= end_date)
+    return [
+        RollupTypeTotal(
+            row.type_id, int(row.event_count or 0), int(row.completed_count or 0), float(row.recorded_seconds or 0),
+            {level: int(getattr(row, level) or 0) for level in EFFICIENCY_LEVELS}
+        )
+        for row in query.group_by(DailyTypeRollup.type_id)
+    ]
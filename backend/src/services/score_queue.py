@@ -0,0 +1,289 @@
+"""Persistent dirty-day queue for daily score recomputation.
+
+Writes whose score effect cannot be applied as an incremental delta (group
+deletes, series edits, task resets) record ``(user_id, date)`` in
+``score_dirty_days`` instead of recomputing inline. The primary key
+coalesces repeated marks of the same day; ``mark_seq`` is bumped on every
+re-mark so a drain only clears the marks it actually processed.
+
+``ScoreRecomputeWorker`` polls the set from a background thread and drains
+it through a ``ThreadPoolExecutor``, one user per task. It runs in one
+dedicated process (``flask score-worker``), never in every web worker; web
+workers that mark days only wake it when it shares their process. Readers call
+``refresh_window`` to recompute inline just the dirty days they are about to
+read; it reports whether the window is fresh.
+
+Each ``daily_scores`` row is stamped with the ``RULES.version`` that produced
+it. After a rules change, rows with an older version count as pending days
+too: readers recompute the ones in their window, and the worker sweeps the
+remaining cold rows in small batches whenever it has no dirty days to drain.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy import delete, insert, or_, select, tuple_, update
+from sqlalchemy.dialects import mysql, sqlite
+
+from ..models.daily_score import DailyScore
+from ..models.score_dirty_day import ScoreDirtyDay
+from . import rollups
+from .scoring import RULES
+
+# 读请求内联重算的天数上限，超过则交给后台线程并返回不新鲜标记
+INLINE_RECOMPUTE_LIMIT = 93
+DRAIN_BATCH_DAYS = 366
+# 后台清扫旧规则版本积分行的每批天数，保持很小，避免与正常写入争抢锁
+SWEEP_BATCH_DAYS = 200
+_CLEAR_CHUNK_SIZE = 500
+
+
+def stale_daily_score(columns=DailyScore):
+    """积分行需要全量重算的条件：raw_score 尚未初始化，或不是当前计分规则版本算出的。"""
+    return or_(
+        columns.raw_score.is_(None),
+        columns.rules_version.is_(None),
+        columns.rules_version != RULES.version
+    )
+
+
+def _mark_upsert(session, rows):
+    dialect = session.get_bind().dialect.name
+    table = ScoreDirtyDay.__table__
+    if dialect == "mysql":
+        statement = mysql.insert(table).values(rows)
+        return statement.on_duplicate_key_update(
+            mark_seq=table.c.mark_seq + 1, marked_at=statement.inserted.marked_at
+        )
+    if dialect == "sqlite":
+        statement = sqlite.insert(table).values(rows)
+        return statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.date],
+            set_={"mark_seq": table.c.mark_seq + 1, "marked_at": statement.excluded.marked_at}
+        )
+    return None
+
+
+def mark_dirty(session, user_id: int, days: Iterable[date]) -> None:
+    """在调用方事务内标记需要重算积分的日期，同一天重复标记只递增 mark_seq。"""
+    days = sorted(set(days))
+    if not days:
+        return
+    now = datetime.utcnow()
+    rows = [{"user_id": user_id, "date": day, "mark_seq": 1, "marked_at": now} for day in days]
+    statement = _mark_upsert(session, rows)
+    if statement is not None:
+        session.execute(statement)
+        return
+    # 无原生 upsert 的方言退回先查后写
+    table = ScoreDirtyDay.__table__
+    existing = {row[0] for row in session.execute(
+        select(table.c.date).where(table.c.user_id == user_id, table.c.date.in_(days))
+    )}
+    if existing:
+        session.execute(
+            update(table)
+            .where(table.c.user_id == user_id, table.c.date.in_(existing))
+            .values(mark_seq=table.c.mark_seq + 1, marked_at=now)
+        )
+    fresh = [row for row in rows if row["date"] not in existing]
+    if fresh:
+        session.execute(insert(table), fresh)
+
+
+def _pending_days(session, user_id: int, start_date: Optional[date], end_date: Optional[date],
+                  limit: Optional[int]) -> Dict[date, Optional[int]]:
+    """
+    返回窗口内待重算的日期及其标记序号。
+
+    未按当前计分规则版本算出的积分行（含 raw_score 为 NULL 的旧行）同样视为待重算（序号为 None）。
+    """
+    table = ScoreDirtyDay.__table__
+    query = select(table.c.date, table.c.mark_seq).where(table.c.user_id == user_id)
+    legacy = select(DailyScore.date).where(DailyScore.user_id == user_id, stale_daily_score())
+    if start_date is not None:
+        query = query.where(table.c.date >= start_date)
+        legacy = legacy.where(DailyScore.date >= start_date)
+    if end_date is not None:
+        query = query.where(table.c.date <= end_date)
+        legacy = legacy.where(DailyScore.date <= end_date)
+    if limit is not None:
+        query = query.limit(limit)
+        legacy = legacy.limit(limit)
+    pending: Dict[date, Optional[int]] = dict(session.execute(query.order_by(table.c.date)).all())
+    for (day,) in session.execute(legacy):
+        pending.setdefault(day, None)
+    return pending
+
+
+def _recompute(session, user_id: int, pending: Dict[date, Optional[int]]) -> None:
+    from .event_service import rebuild_daily_scores
+
+    # 先锁住这些天已有的积分行再读事件：并发写入的增量会排在本次重算之后，不会被覆盖
+    session.execute(
+        select(DailyScore.id).where(
+            DailyScore.user_id == user_id, DailyScore.date.in_(sorted(pending))
+        ).with_for_update()
+    )
+    for first, last in rollups.day_ranges(pending):
+        rebuild_daily_scores(session, user_id, first, last)
+    # 规则版本过期的天，汇总行里的积分也是旧规则算的，一并重算
+    rescored = [day for day, seq in pending.items() if seq is None]
+    if rescored:
+        rollups.refresh_days(session, user_id, rescored)
+
+    table = ScoreDirtyDay.__table__
+    claimed = sorted((day, seq) for day, seq in pending.items() if seq is not None)
+    for offset in range(0, len(claimed), _CLEAR_CHUNK_SIZE):
+        session.execute(delete(table).where(
+            table.c.user_id == user_id,
+            tuple_(table.c.date, table.c.mark_seq).in_(claimed[offset:offset + _CLEAR_CHUNK_SIZE])
+        ))
+
+
+def drain_user(session, user_id: int, limit: int = DRAIN_BATCH_DAYS) -> int:
+    """重算用户最多 limit 个待重算日期并清除对应标记，返回处理天数；由调用方提交。"""
+    pending = _pending_days(session, user_id, None, None, limit)
+    if pending:
+        _recompute(session, user_id, pending)
+    return len(pending)
+
+
+def sweep_stale(session, limit: int = SWEEP_BATCH_DAYS) -> int:
+    """
+    跨用户重算最多 limit 个规则版本过期的积分行，返回处理天数；由调用方提交。
+
+    读取时的内联重算只覆盖被访问的窗口，没人访问的冷数据由后台线程空闲时调用本函数逐批追平。
+    """
+    pending: Dict[int, Dict[date, Optional[int]]] = {}
+    for user_id, day in session.execute(
+        select(DailyScore.user_id, DailyScore.date).where(stale_daily_score()).limit(limit)
+    ):
+        pending.setdefault(user_id, {})[day] = None
+    for user_id, days in pending.items():
+        _recompute(session, user_id, days)
+    return sum(len(days) for days in pending.values())
+
+
+def refresh_window(session, user_id: int, start_date: Optional[date], end_date: Optional[date]) -> bool:
+    """
+    读取积分前调用：内联重算 [start_date, end_date] 内的待重算日期，端点为 None 表示不限。
+
+    待重算天数超过 INLINE_RECOMPUTE_LIMIT 时不做内联重算，唤醒后台线程并返回 False，
+    表示本次读取的积分可能尚未更新；否则返回 True。由调用方提交。
+    """
+    pending = _pending_days(session, user_id, start_date, end_date, INLINE_RECOMPUTE_LIMIT + 1)
+    if len(pending) > INLINE_RECOMPUTE_LIMIT:
+        notify_worker()
+        return False
+    if pending:
+        _recompute(session, user_id, pending)
+    return True
+
+
+class ScoreRecomputeWorker:
+    """后台重算：轮询线程找出有待重算日期的用户，按用户分发到线程池，同一用户同时只有一个任务。"""
+
+    def __init__(self, session_factory, max_workers: int = 2, poll_interval: float = 30.0,
+                 batch_days: int = DRAIN_BATCH_DAYS):
+        self._session_factory = session_factory
+        self._poll_interval = poll_interval
+        self._batch_days = batch_days
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="score-recompute")
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._inflight: Set[int] = set()
+        self._thread = threading.Thread(target=self._run, name="score-recompute-poll", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def notify(self) -> None:
+        """唤醒轮询线程立即分发，而不必等到下一个轮询周期。"""
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self._poll_interval)
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            try:
+                if not self.dispatch() and self._sweep() >= SWEEP_BATCH_DAYS:
+                    self._wake.set()  # 还有过期积分行，下一轮立即继续
+            except Exception:
+                logging.exception("分发积分重算任务失败")
+
+    def dispatch(self) -> int:
+        """为每个有待重算日期且没有进行中任务的用户提交一次重算，返回提交数。"""
+        session = self._session_factory()
+        try:
+            user_ids = [row[0] for row in session.execute(select(ScoreDirtyDay.user_id).distinct())]
+        finally:
+            session.close()
+        submitted = 0
+        for user_id in user_ids:
+            with self._lock:
+                if user_id in self._inflight:
+                    continue
+                self._inflight.add(user_id)
+            self._executor.submit(self._drain, user_id)
+            submitted += 1
+        return submitted
+
+    def _sweep(self) -> int:
+        """低优先级：只在没有待重算日期可分发时，在轮询线程内清扫一小批旧规则版本的积分行。"""
+        session = self._session_factory()
+        try:
+            processed = sweep_stale(session)
+            session.commit()
+            return processed
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _drain(self, user_id: int) -> None:
+        session = self._session_factory()
+        processed = 0
+        try:
+            processed = drain_user(session, user_id, self._batch_days)
+            session.commit()
+        except Exception:
+            session.rollback()
+            logging.exception("重算用户 %s 的积分失败", user_id)
+        finally:
+            session.close()
+            with self._lock:
+                self._inflight.discard(user_id)
+        if processed >= self._batch_days:
+            self.notify()  # 本批未处理完，尽快进入下一轮
+
+
+_worker: Optional[ScoreRecomputeWorker] = None
+
+
+def start_worker(session_factory, max_workers: int, poll_interval: float) -> Optional[ScoreRecomputeWorker]:
+    """启动进程内的后台重算线程；max_workers 不大于 0 时不启动，仅依赖读取时的内联重算。"""
+    global _worker
+    if _worker is None and max_workers > 0:
+        _worker = ScoreRecomputeWorker(session_factory, max_workers, poll_interval)
+        _worker.start()
+    return _worker
+
+
+def notify_worker() -> None:
+    if _worker is not None:
+        _worker.notify()
@@ -0,0 +1,93 @@
+"""Versioned, data-driven scoring rules.
+
+``ScoringRules`` describes how a completed event turns into points: the
+daily scoring window, the unit length, the points per unit for each
+efficiency level and the daily cap. ``ScoringRules.compile()`` turns a rule
+set into a batch scorer that scores whole columns of events in one call with
+the rule constants bound once, instead of a function call and attribute
+lookups per event. Every recompute path (daily score rebuilds, incremental
+fallbacks, rollups) goes through it.
+
+``RULES`` is the active rule set. Bump ``version`` whenever a rule changes:
+daily scores are stamped with the version that produced them, so stale rows
+are recomputed lazily on read and by the background sweeper
+(``score_queue``). ``flask rebuild-scores`` rescores everything eagerly.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Sequence, Tuple
+
+BatchScorer = Callable[..., Tuple[List[int], List[float]]]
+
+
+@dataclass(frozen=True)
+class ScoringRules:
+    version: int
+    window_start_minutes: int = 7 * 60  # 计分时间窗起点：开始日 0 点后的分钟数
+    window_end_minutes: int = 24 * 60  # 计分时间窗终点（不含），24:00 即次日 0 点
+    unit_minutes: int = 30  # 一个计分单位的分钟数
+    points: Tuple[Tuple[str, int], ...] = (("high", 2), ("medium", 1), ("low", -1))  # 每单位积分
+    daily_cap: int = 68  # 每日积分上限
+
+    @property
+    def window_hours(self):
+        """计分时间窗的小时数，也是统计记录率时每天的可用小时数。"""
+        hours = (self.window_end_minutes - self.window_start_minutes) / 60
+        return int(hours) if hours.is_integer() else hours
+
+    def compile(self) -> BatchScorer:
+        """
+        生成批量计分函数 score(starts, ends, all_days, efficiencies, completed)。
+
+        五个参数为等长序列，返回 (scores, units) 两个列表：units 为每个事件在计分时间窗内的
+        单位数（与是否完成无关），scores 为已完成事件按效率取整后的积分，未完成或无效率为 0。
+        """
+        window_start = timedelta(minutes=self.window_start_minutes)
+        window_end = timedelta(minutes=self.window_end_minutes)
+        unit_minutes = self.unit_minutes
+        points = dict(self.points)
+
+        def score(starts: Sequence[Optional[datetime]], ends: Sequence[Optional[datetime]],
+                  all_days: Sequence[bool], efficiencies: Sequence[Optional[str]],
+                  completed: Sequence[bool]) -> Tuple[List[int], List[float]]:
+            scores = []
+            units = []
+            append_score = scores.append
+            append_units = units.append
+            get_points = points.get
+            for start, end, all_day, efficiency, done in zip(starts, ends, all_days, efficiencies, completed):
+                if not start or not end or all_day or end <= start:
+                    append_units(0)
+                    append_score(0)
+                    continue
+                midnight = start.replace(hour=0, minute=0, second=0, microsecond=0)
+                effective_start = max(start, midnight + window_start)
+                effective_end = min(end, midnight + window_end)
+                if effective_end <= effective_start:
+                    append_units(0)
+                    append_score(0)
+                    continue
+                event_units = (effective_end - effective_start).total_seconds() / 60 / unit_minutes
+                append_units(event_units)
+                per_unit = get_points(efficiency) if done else None
+                append_score(int(event_units * per_unit) if per_unit is not None else 0)
+            return scores, units
+
+        return score
+
+
+RULES = ScoringRules(version=1)
+score_batch = RULES.compile()
+
+
+def score_rows(rows) -> Tuple[List[int], List[float]]:
+    """对带 start/end/allDay/efficiency/is_completed 属性的行序列批量计分。"""
+    return score_batch(
+        [row.start for row in rows],
+        [row.end for row in rows],
+        [row.allDay for row in rows],
+        [row.efficiency for row in rows],
+        [row.is_completed for row in rows],
+    )
@@ -0,0 +1,152 @@
+"""Per-user cache for ``/stats`` responses on top of the shared cache backend.
+
+Entries are keyed by ``(user_id, year, month)``: ``month`` is only meaningful
+together with ``year`` and ``None`` stands for "all", matching the period
+filters of ``/stats``. Entries expire after ``ttl_seconds``; capacity and LRU
+eviction belong to the backend (``cache_backend``).
+
+Invalidation is generational so it reaches every worker process: each user
+has a generation counter and each of the user's buckets has its own. An entry
+stores the two generations it was computed under and is served only while
+both still match. Writes bump just the writing user's buckets that can contain
+the touched days (for each day its month, its year and the all-time bucket);
+deleting a user bumps the user counter. Hit/miss/invalidation counters are
+kept per process and reported by ``snapshot()`` together with backend info.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from datetime import date
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from . import cache_backend
+
+BucketKey = Tuple[Optional[int], Optional[int]]
+Generation = Tuple[int, int]
+
+
+def bucket_key(year: Optional[int], month: Optional[int]) -> BucketKey:
+    """规范化统计区间：未指定年份时月份无效，与 /stats 的筛选逻辑一致。"""
+    if not year:
+        return None, None
+    return year, month or None
+
+
+def buckets_for_days(days: Iterable[date]) -> Set[BucketKey]:
+    """返回包含这些日期的所有统计区间：所在月份、所在年份以及全部时间。"""
+    buckets: Set[BucketKey] = set()
+    for day in days:
+        buckets.update(((day.year, day.month), (day.year, None)))
+    if buckets:
+        buckets.add((None, None))
+    return buckets
+
+
+def _bucket_suffix(bucket: BucketKey) -> str:
+    year, month = bucket
+    return f"{year or 'all'}:{month or 'all'}"
+
+
+class StatsCache:
+    """按用户与统计区间缓存 /stats 结果；后端读写失败时按未命中处理，不影响请求。"""
+
+    def __init__(self, ttl_seconds: float = 60.0, backend: Optional[cache_backend.CacheBackend] = None):
+        self.ttl_seconds = ttl_seconds
+        self._backend = backend
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "invalidations": 0, "errors": 0}
+
+    @property
+    def backend(self) -> cache_backend.CacheBackend:
+        return self._backend or cache_backend.get_backend()
+
+    def configure(self, ttl_seconds: float, backend: Optional[cache_backend.CacheBackend] = None) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._backend = backend
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def lookup(self, user_id: int, year: Optional[int], month: Optional[int]) -> Tuple[Optional[Any], Generation]:
+        """
+        返回 (缓存值或 None, 当前代数)。
+
+        未命中时调用方计算结果后把这里返回的代数原样交给 put：计算期间发生的失效会使代数变化，
+        旧结果不会被当作新结果缓存。
+        """
+        bucket = _bucket_suffix(bucket_key(year, month))
+        try:
+            user_gen, bucket_gen, raw = self.backend.get_many([
+                f"stats:gen:{user_id}", f"stats:gen:{user_id}:{bucket}", f"stats:{user_id}:{bucket}"
+            ])
+        except Exception:
+            logging.exception("读取统计缓存失败")
+            self._count("errors")
+            self._count("misses")
+            return None, (-1, -1)
+        generation = (int(user_gen or 0), int(bucket_gen or 0))
+        if raw is not None:
+            entry = json.loads(raw)
+            if tuple(entry["generation"]) == generation:
+                self._count("hits")
+                return entry["data"], generation
+        self._count("misses")
+        return None, generation
+
+    def put(self, user_id: int, year: Optional[int], month: Optional[int], value: Any,
+            generation: Generation) -> None:
+        if generation[0] < 0:
+            return
+        bucket = _bucket_suffix(bucket_key(year, month))
+        payload = json.dumps({"generation": list(generation), "data": value}, ensure_ascii=False)
+        try:
+            self.backend.set(f"stats:{user_id}:{bucket}", payload, self.ttl_seconds)
+        except Exception:
+            logging.exception("写入统计缓存失败")
+            self._count("errors")
+
+    def invalidate(self, user_id: int, days: Iterable[date]) -> int:
+        """只使该用户包含这些日期的统计区间失效，返回失效的区间数。"""
+        keys = [f"stats:gen:{user_id}:{_bucket_suffix(bucket)}" for bucket in sorted(
+            buckets_for_days(days), key=lambda item: (item[0] or 0, item[1] or 0)
+        )]
+        return self._bump(keys)
+
+    def invalidate_user(self, user_id: int) -> int:
+        """使该用户的全部统计缓存失效（如删除用户时）。"""
+        return self._bump([f"stats:gen:{user_id}"])
+
+    def _bump(self, keys) -> int:
+        if not keys:
+            return 0
+        try:
+            self.backend.incr_many(keys)
+        except Exception:
+            # 失效失败时旧条目最多再存活 ttl_seconds
+            logging.exception("统计缓存失效失败")
+            self._count("errors")
+            return 0
+        self._count("invalidations", len(keys))
+        return len(keys)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """返回当前进程的缓存计数与后端信息。"""
+        with self._lock:
+            counters = dict(self._counters)
+        lookups = counters["hits"] + counters["misses"]
+        try:
+            backend_info = self.backend.info()
+        except Exception:
+            logging.exception("读取缓存后端信息失败")
+            backend_info = {"backend": self.backend.name}
+        return {
+            **counters,
+            "hitRate": round(counters["hits"] / lookups, 4) if lookups else None,
+            "ttlSeconds": self.ttl_seconds,
+            "pid": os.getpid(),
+            **backend_info,
+        }
@@ -23,6 +23,101 @@ def event_to_dict(event):
         "taskId": event.task_id,
     }
 
+# 事件 API 字段与 Event 列属性的对应关系；顺序即投影查询的列顺序
+EVENT_DICT_FIELDS = (
+    ("id", "id"),
+    ("title", "title"),
+    ("start", "start"),
+    ("end", "end"),
+    ("allDay", "allDay"),
+    ("category", "category"),
+    ("time", "time"),
+    ("urgency", "urgency"),
+    ("remark", "remark"),
+    ("isRepeat", "is_repeat"),
+    ("repeatType", "repeat_type"),
+    ("repeatEndDate", "repeat_end_date"),
+    ("repeatGroupId", "repeat_group_id"),
+    ("isCompleted", "is_completed"),
+    ("efficiency", "efficiency"),
+    ("customTypeId", "custom_type_id"),
+    ("planId", "plan_id"),
+    ("goalId", "goal_id"),
+    ("taskId", "task_id"),
+)
+EVENT_ROW_COLUMNS = tuple(column for _, column in EVENT_DICT_FIELDS)
+
+
+# 解包顺序与 EVENT_ROW_COLUMNS 一致
+def event_row_to_dict(row):
+    """把按 EVENT_ROW_COLUMNS 顺序投影出的行元组转换为 event_to_dict 相同的结构。"""
+    (event_id, title, start, end, all_day, category, time, urgency, remark, is_repeat, repeat_type,
+     repeat_end_date, repeat_group_id, is_completed, efficiency, custom_type_id, plan_id, goal_id, task_id) = row
+    return {
+        "id": event_id,
+        "title": title,
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "allDay": all_day,
+        "category": category,
+        "time": time,
+        "urgency": urgency,
+        "remark": remark,
+        "isRepeat": is_repeat,
+        "repeatType": repeat_type,
+        "repeatEndDate": repeat_end_date.isoformat() if repeat_end_date else None,
+        "repeatGroupId": repeat_group_id,
+        "isCompleted": is_completed,
+        "efficiency": efficiency,
+        "customTypeId": custom_type_id,
+        "planId": plan_id,
+        "goalId": goal_id,
+        "taskId": task_id,
+    }
+
+# ?format=columnar 响应的字段顺序；字典编码字段的值替换为 strings 表下标
+EVENT_COLUMNAR_FIELDS = tuple(key for key, _ in EVENT_DICT_FIELDS) + ("isVirtual",)
+EVENT_COLUMNAR_ENCODED_FIELDS = (
+    "category", "time", "urgency", "repeatType", "repeatGroupId", "efficiency",
+    "customTypeId", "planId", "goalId", "taskId",
+)
+DAILY_SCORE_COLUMNAR_FIELDS = ("id", "date", "totalScore")
+
+
+def to_columnar(items, fields, encoded_fields=()):
+    """
+    把字典列表转换为列式结构：每个字段一个数组，encoded_fields 中的字符串替换为 strings 表下标。
+
+    整列为 None 的字段输出 null 而非数组；客户端按 fields 顺序还原为与行式响应相同的字典。
+    """
+    strings = []
+    string_index = {}
+    encoded = set(encoded_fields)
+    columns = {}
+    for field in fields:
+        values = [item.get(field) for item in items]
+        if all(value is None for value in values):
+            columns[field] = None  # 整列为空时不发送数组
+            continue
+        if field in encoded:
+            for position, value in enumerate(values):
+                if value is None:
+                    continue
+                index = string_index.get(value)
+                if index is None:
+                    index = string_index[value] = len(strings)
+                    strings.append(value)
+                values[position] = index
+        columns[field] = values
+    return {
+        "format": "columnar",
+        "count": len(items),
+        "fields": list(fields),
+        "encoded": [field for field in fields if field in encoded],
+        "strings": strings,
+        "columns": columns,
+    }
+
 def idea_to_dict(idea):
     return {
         "id": idea.id,
@@ -0,0 +1,45 @@
+"""Shared test setup: every test runs against a throwaway SQLite database.
+
+The engine in ``models.db`` is swapped out before the application is imported,
+so ``create_app`` (run at import by ``backend.src.app``) creates its tables in
+a temporary file and no test can reach the MySQL database configured in
+``.env``.
+"""
+import shutil
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.sqlite.base import SQLiteTypeCompiler
+
+from backend.src.models import db
+
+# 模型中 MySQL 专用的 TINYINT/SMALLINT 在 SQLite 上按 INTEGER 建表
+SQLiteTypeCompiler.visit_TINYINT = lambda self, type_, **kw: "INTEGER"
+SQLiteTypeCompiler.visit_SMALLINT = lambda self, type_, **kw: "INTEGER"
+
+_DATABASE_DIR = tempfile.mkdtemp(prefix="dailymanagement-tests-")
+db.engine = create_engine(f"sqlite:///{_DATABASE_DIR}/app.db", connect_args={"check_same_thread": False})
+db.SessionLocal.configure(bind=db.engine)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    db.engine.dispose()
+    shutil.rmtree(_DATABASE_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def app():
+    from backend.src.app import app as flask_app
+
+    return flask_app
+
+
+@pytest.fixture
+def engine():
+    return db.engine
+
+
+@pytest.fixture
+def session_factory():
+    return db.SessionLocal
@@ -0,0 +1,124 @@
+"""当日积分写入的并发测试：多个线程同时完成同一用户同一天的事件。
+
+每个线程使用独立会话走与 POST /events/<id>/complete 相同的写路径
+（complete_event → apply_score_changes → record_changes → commit）。
+检查没有请求因唯一约束冲突失败、当天只有一行积分，且积分等于按事件全量重算的结果。
+SQLite 以 BEGIN IMMEDIATE 串行化写事务，这里只能验证结果正确；竞态本身需在 MySQL 上复现。
+"""
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import create_engine, event as sa_event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from backend.src.models.daily_score import DailyScore
+from backend.src.models.daily_type_rollup import DailyTypeRollup
+from backend.src.models.event import Event
+from backend.src.models.event_series import EventSeries
+from backend.src.models.event_tombstone import EventTombstone
+from backend.src.models.score_dirty_day import ScoreDirtyDay
+from backend.src.models.user import User
+from backend.src.services import event_operations
+from backend.src.services.change_log import record_changes
+from backend.src.services.event_service import DAILY_SCORE_CAP, _daily_totals, apply_score_changes
+
+TABLES = [
+    User.__table__, Event.__table__, EventSeries.__table__, EventTombstone.__table__, DailyScore.__table__,
+    DailyTypeRollup.__table__, ScoreDirtyDay.__table__,
+]
+TARGET_DAY = date(2020, 6, 1)
+WORKERS = 16
+
+
+@pytest.fixture
+def upsert_sessions(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'upsert.db'}", connect_args={"check_same_thread": False, "timeout": 60}
+    )
+
+    # pysqlite 默认延迟开启事务，并发升级写锁时会直接报 locked；改为 BEGIN IMMEDIATE
+    @sa_event.listens_for(engine, "connect")
+    def _disable_pysqlite_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @sa_event.listens_for(engine, "begin")
+    def _begin_immediate(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    for table in TABLES:
+        table.create(engine)
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+
+def _seed(session_factory, count):
+    session = session_factory()
+    try:
+        user = User(username=f"stress-daily-score-{uuid4().hex[:8]}", password_hash="-", data_version=0)
+        session.add(user)
+        session.flush()
+        ids = []
+        for index in range(count):
+            # 每个事件 1~3 小时，保证总分会越过每日上限以覆盖封顶逻辑
+            start = datetime.combine(TARGET_DAY, datetime.min.time()) + timedelta(hours=7, minutes=index)
+            event_id = uuid4().hex
+            session.add(Event(
+                id=event_id, title=f"压测 {index}", start=start,
+                end=start + timedelta(hours=1 + index % 3), allDay=False,
+                category="默认", user_id=user.id, is_completed=False
+            ))
+            ids.append(event_id)
+        session.commit()
+        return user.id, ids
+    finally:
+        session.close()
+
+
+def _complete(session_factory, user_id, event_id, barrier, outcomes):
+    barrier.wait()
+    session = session_factory()
+    try:
+        result = event_operations.complete_event(session, user_id, event_id, "high")
+        session.flush()
+        apply_score_changes(session, user_id, result.affected_dates, result.score_deltas or {})
+        record_changes(session, user_id)
+        session.commit()
+        outcomes["ok"] += 1
+    except IntegrityError:
+        session.rollback()
+        outcomes["integrity_error"] += 1
+    except Exception as exc:  # noqa: BLE001 - 需统计所有失败类型
+        session.rollback()
+        outcomes[type(exc).__name__] += 1
+    finally:
+        session.close()
+
+
+def test_concurrent_completions_keep_one_consistent_row(upsert_sessions):
+    user_id, ids = _seed(upsert_sessions, WORKERS)
+    outcomes = Counter()
+    barrier = threading.Barrier(len(ids))
+    threads = [
+        threading.Thread(target=_complete, args=(upsert_sessions, user_id, event_id, barrier, outcomes))
+        for event_id in ids
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    session = upsert_sessions()
+    try:
+        rows = session.query(DailyScore.raw_score, DailyScore.total_score).filter(
+            DailyScore.user_id == user_id, DailyScore.date == TARGET_DAY
+        ).all()
+        expected = _daily_totals(session, user_id, TARGET_DAY, TARGET_DAY).get(TARGET_DAY, 0)
+    finally:
+        session.close()
+
+    assert outcomes == Counter(ok=WORKERS)
+    assert [tuple(row) for row in rows] == [(expected, min(DAILY_SCORE_CAP, expected))]
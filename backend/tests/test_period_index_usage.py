@@ -0,0 +1,86 @@
+"""按年/月过滤的统计查询在索引上做范围扫描（SQLite 的 EXPLAIN QUERY PLAN 为 SEARCH ... USING INDEX）。
+
+同时断言改造前的 extract() 写法不满足该条件，确保校验本身能发现退化。
+"""
+import re
+from datetime import date, datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import create_engine, extract, func, insert, select
+
+from backend.src.models.daily_score import DailyScore
+from backend.src.models.event import Event
+from backend.src.models.user import User
+from backend.src.services.periods import period_bounds, within
+
+YEAR = 2024
+MONTH = 3
+DAYS = 730
+
+
+@pytest.fixture
+def seeded(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'periods.db'}")
+    for table in (User.__table__, Event.__table__, DailyScore.__table__):
+        table.create(engine)
+    with engine.begin() as connection:
+        user_id = connection.execute(
+            insert(User.__table__).values(username="period-index", password_hash="-", data_version=0)
+        ).inserted_primary_key[0]
+        first = date(YEAR - 1, 1, 1)
+        connection.execute(insert(DailyScore.__table__), [
+            {"id": uuid4().hex, "user_id": user_id, "date": first + timedelta(days=offset),
+             "total_score": offset % 40, "raw_score": offset % 40}
+            for offset in range(DAYS)
+        ])
+        connection.execute(insert(Event.__table__), [
+            {"id": uuid4().hex, "user_id": user_id, "title": "索引校验",
+             "start": datetime.combine(first + timedelta(days=offset // 4), datetime.min.time()) + timedelta(hours=8 + offset % 4),
+             "end": datetime.combine(first + timedelta(days=offset // 4), datetime.min.time()) + timedelta(hours=9 + offset % 4),
+             "allDay": False, "category": "默认"}
+            for offset in range(DAYS * 4)
+        ])
+    yield engine, user_id
+    engine.dispose()
+
+
+def _queries(user_id):
+    """{名称: (表名, 区间列名, 新写法, 旧 extract 写法)}。"""
+    month, year = period_bounds(YEAR, MONTH), period_bounds(YEAR)
+    score_user = DailyScore.user_id == user_id
+    return {
+        "stats month daily scores": ("daily_scores", "date",
+         select(DailyScore.date, DailyScore.total_score).where(score_user, *within(DailyScore.date, month)),
+         select(DailyScore.date, DailyScore.total_score).where(
+             score_user, extract("year", DailyScore.date) == YEAR, extract("month", DailyScore.date) == MONTH)),
+        "stats year score aggregate": ("daily_scores", "date",
+         select(func.sum(DailyScore.total_score), func.count(DailyScore.id)).where(
+             score_user, *within(DailyScore.date, year)),
+         select(func.sum(DailyScore.total_score), func.count(DailyScore.id)).where(
+             score_user, extract("year", DailyScore.date) == YEAR)),
+        "month events": ("events", "start",
+         select(Event.start, Event.end).where(*within(Event.start, month), Event.allDay == False),  # noqa: E712
+         select(Event.start, Event.end).where(
+             extract("year", Event.start) == YEAR, extract("month", Event.start) == MONTH,
+             Event.allDay == False)),  # noqa: E712
+    }
+
+
+def _range_scan(connection, statement, table, column):
+    """返回 (是否为索引范围扫描, 计划摘要)。"""
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True})
+    details = [row["detail"] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}").mappings()]
+    pattern = re.compile(rf"SEARCH {table} USING (COVERING )?INDEX \w+ \([^)]*\b{column}>")
+    return any(pattern.search(detail) for detail in details), "; ".join(details)
+
+
+@pytest.mark.parametrize("name", ["stats month daily scores", "stats year score aggregate", "month events"])
+def test_period_filters_use_index_range_scans(seeded, name):
+    engine, user_id = seeded
+    table, column, statement, legacy = _queries(user_id)[name]
+    with engine.connect() as connection:
+        ok, summary = _range_scan(connection, statement, table, column)
+        legacy_ok, legacy_summary = _range_scan(connection, legacy, table, column)
+    assert ok, f"{name}: {summary}"
+    assert not legacy_ok, f"{name} 的 extract() 写法也被判为范围扫描，校验失效: {legacy_summary}"
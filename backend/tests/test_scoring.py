@@ -0,0 +1,78 @@
+"""scoring.RULES 编译出的批量计分器与旧的逐事件计分函数逐个一致。"""
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from backend.src.services.scoring import score_batch
+
+EFFICIENCIES = ("high", "medium", "low", None, "unknown")
+
+
+def _legacy_units(event):
+    """改造前 calculate_event_units 的原样副本。"""
+    if not event.start or not event.end:
+        return 0
+    if event.allDay:
+        return 0
+    start = event.start
+    end = event.end
+    if end <= start:
+        return 0
+    window_start = datetime.combine(start.date(), datetime.min.time()) + timedelta(hours=7)
+    window_end = datetime.combine(start.date() + timedelta(days=1), datetime.min.time())
+    effective_start = max(start, window_start)
+    effective_end = min(end, window_end)
+    if effective_end <= effective_start:
+        return 0
+    duration_minutes = (effective_end - effective_start).total_seconds() / 60
+    return duration_minutes / 30
+
+
+def _legacy_score(event):
+    """改造前 calculate_event_score 的原样副本。"""
+    if not event.is_completed or not event.efficiency:
+        return 0
+    half_hour_units = _legacy_units(event)
+    if event.efficiency == "high":
+        return int(half_hour_units * 2)
+    elif event.efficiency == "medium":
+        return int(half_hour_units * 1)
+    elif event.efficiency == "low":
+        return int(half_hour_units * -1)
+    return 0
+
+
+def _random_events(count, rng):
+    """覆盖跨零点、早于 7 点、全天、结束早于开始、秒级与微秒级时长、未完成、未知效率等边界。"""
+    base = datetime(2024, 1, 1)
+    events = []
+    for _ in range(count):
+        start = base + timedelta(days=rng.randrange(730), minutes=rng.randrange(24 * 60),
+                                 seconds=rng.choice((0, 0, 0, rng.randrange(60))),
+                                 microseconds=rng.choice((0, 0, 0, rng.randrange(10 ** 6))))
+        end = start + timedelta(minutes=rng.choice((-30, 0, 1, 15, 29, 30, 45, 90, 240, 600, 1500)))
+        events.append(SimpleNamespace(
+            start=start,
+            end=rng.choice((end, end, end, end, None)),
+            allDay=rng.random() < 0.05,
+            efficiency=rng.choice(EFFICIENCIES),
+            is_completed=rng.random() < 0.7,
+        ))
+    return events
+
+
+def test_batch_scores_match_legacy_functions():
+    events = _random_events(20000, random.Random(7))
+    scores, units = score_batch(
+        [event.start for event in events],
+        [event.end for event in events],
+        [event.allDay for event in events],
+        [event.efficiency for event in events],
+        [event.is_completed for event in events],
+    )
+    mismatches = [
+        (event, (_legacy_score(event), _legacy_units(event)), (score, unit))
+        for event, score, unit in zip(events, scores, units)
+        if (score, unit) != (_legacy_score(event), _legacy_units(event))
+    ]
+    assert mismatches[:10] == []
@@ -0,0 +1,88 @@
+"""跨进程缓存后端：模拟 gunicorn 的多个 worker 进程共用一个缓存后端。
+
+1. 多进程并发 incr 同一计数器，结果等于总次数（代数计数器原子递增）；
+2. 一个进程写入 /stats 缓存后，其他进程都能命中；
+3. 任一进程按日期失效后，所有进程都不再命中受影响区间，未受影响区间仍然命中。
+设置 TEST_REDIS_URL 时对 redis 后端执行同样的检查。
+"""
+import multiprocessing
+import os
+from datetime import date
+
+import pytest
+
+from backend.src.services import cache_backend
+from backend.src.services.cache_backend import create_backend
+from backend.src.services.stats_cache import StatsCache
+
+USER_ID = 42
+INCREMENTS = 200
+WORKERS = 4
+PERIODS = ((2026, 3), (2026, 4), (None, None))
+
+
+def _worker(url, barrier, results, index):
+    cache = StatsCache(ttl_seconds=60, backend=create_backend(url))
+    barrier.wait()
+    for _ in range(INCREMENTS):
+        cache.backend.incr_many(["check:counter"])
+    barrier.wait()
+    if index == 0:
+        for year, month in PERIODS:
+            _, generation = cache.lookup(USER_ID, year, month)
+            cache.put(USER_ID, year, month, {"period": [year, month], "writer": os.getpid()}, generation)
+    barrier.wait()
+    seen_before = [cache.lookup(USER_ID, year, month)[0] is not None for year, month in PERIODS]
+    barrier.wait()
+    if index == 1:
+        cache.invalidate(USER_ID, [date(2026, 3, 15)])
+    barrier.wait()
+    seen_after = [cache.lookup(USER_ID, year, month)[0] is not None for year, month in PERIODS]
+    results[index] = (seen_before, seen_after)
+
+
+def _backend_urls():
+    urls = [pytest.param("sqlite", id="sqlite")]
+    if os.getenv("TEST_REDIS_URL"):
+        urls.append(pytest.param(os.environ["TEST_REDIS_URL"], id="redis"))
+    return urls
+
+
+@pytest.mark.parametrize("url", _backend_urls())
+def test_invalidations_propagate_to_every_worker(tmp_path, url):
+    if url == "sqlite":
+        url = f"sqlite:///{tmp_path / 'cache.sqlite3'}"
+    counter_before = create_backend(url).incr_many(["check:counter"])[0]  # 先建好计数器，其初值为时间戳基数
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(WORKERS)
+    with context.Manager() as manager:
+        results = manager.dict()
+        processes = [context.Process(target=_worker, args=(url, barrier, results, index)) for index in range(WORKERS)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        outcomes = [results.get(index) for index in range(WORKERS)]
+
+    assert int(create_backend(url).get("check:counter")) - counter_before == WORKERS * INCREMENTS
+    assert outcomes == [([True, True, True], [False, True, False])] * WORKERS
+
+
+@pytest.mark.parametrize("backend_factory", [
+    lambda tmp_path: cache_backend.MemoryBackend(),
+    lambda tmp_path: cache_backend.SQLiteBackend(str(tmp_path / "cache.sqlite3")),
+], ids=["memory", "sqlite"])
+def test_expired_counter_does_not_revive_stale_entries(tmp_path, monkeypatch, backend_factory):
+    cache = StatsCache(ttl_seconds=60, backend=backend_factory(tmp_path))
+    cache.invalidate(USER_ID, [date(2026, 3, 15)])
+    _, generation = cache.lookup(USER_ID, 2026, 3)
+    cache.put(USER_ID, 2026, 3, {"stale": True}, generation)
+    assert cache.lookup(USER_ID, 2026, 3)[0] == {"stale": True}
+
+    # 计数器过期后重新递增，代数不能回到缓存条目记录的旧值
+    monkeypatch.setattr(cache_backend, "COUNTER_TTL_SECONDS", -1)
+    cache.invalidate(USER_ID, [date(2026, 3, 15)])
+    assert cache.lookup(USER_ID, 2026, 3)[0] is None
+    monkeypatch.setattr(cache_backend, "COUNTER_TTL_SECONDS", 3600)
+    cache.invalidate(USER_ID, [date(2026, 3, 15)])
+    assert cache.lookup(USER_ID, 2026, 3)[0] is None
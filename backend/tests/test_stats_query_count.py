@@ -0,0 +1,79 @@
+"""一次未命中缓存的 GET /stats 发出的 SQL 语句数固定，与事件类型数量无关。"""
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from uuid import uuid4
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event as sa_event
+
+from backend.src.models.event import Event
+from backend.src.models.event_type import EventType
+from backend.src.models.user import User
+from backend.src.services.event_service import rebuild_daily_scores
+
+PERIODS = ("year=2024&month=3", "year=2024", "")
+# 一次未命中的 /stats：系列、类型汇总、待重算日期（2 条）、积分、事件类型，月度另加记录时长的事件区间
+MAX_STATEMENTS = 7
+TYPE_COUNT = 30
+
+
+@contextmanager
+def count_statements(engine):
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    sa_event.listen(engine, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        sa_event.remove(engine, "before_cursor_execute", _record)
+
+
+def _seed(session_factory, type_count):
+    session = session_factory()
+    try:
+        user = User(username=f"stats-query-count-{uuid4().hex[:8]}", password_hash="-", data_version=0)
+        session.add(user)
+        session.flush()
+        type_ids = []
+        for index in range(type_count):
+            event_type = EventType(id=uuid4().hex, name=f"类型{index}", color="#3b82f6", user_id=user.id)
+            session.add(event_type)
+            type_ids.append(event_type.id)
+        for index in range(type_count * 4):
+            start = datetime(2024, 3, 1 + index % 28, 8 + index % 10)
+            session.add(Event(
+                id=uuid4().hex, title=f"事件 {index}", start=start, end=start + timedelta(minutes=90),
+                allDay=False, category="默认", user_id=user.id, custom_type_id=type_ids[index % type_count],
+                is_completed=index % 2 == 0, efficiency=("high", "medium", "low")[index % 3]
+            ))
+        session.flush()
+        rebuild_daily_scores(session, user.id, date(2024, 3, 1), date(2024, 3, 31))
+        session.commit()
+        return user.id
+    finally:
+        session.close()
+
+
+def _measure(app, engine, user_id, type_count):
+    """返回 {区间: 语句数}。"""
+    with app.app_context():
+        token = create_access_token(identity=str(user_id))
+    client = app.test_client()
+    counts = {}
+    for query in PERIODS:
+        with count_statements(engine) as statements:
+            response = client.get(f"/stats?{query}", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200, response.get_data(as_text=True)
+        assert len(response.get_json()["typeDistribution"]) == type_count
+        counts[query or "all"] = len(statements)
+    return counts
+
+
+def test_stats_statement_count_is_independent_of_type_count(app, engine, session_factory):
+    few = _measure(app, engine, _seed(session_factory, 1), 1)
+    many = _measure(app, engine, _seed(session_factory, TYPE_COUNT), TYPE_COUNT)
+    assert few == many
+    assert max(many.values()) <= MAX_STATEMENTS
@@ -16,6 +16,7 @@ const VIEW_MODES = {
   archive: 'archive',
 };
 const SYNC_INTERVAL_MS = 30000;
+const EVENT_SYNC_WINDOW_DAYS = 30;
 const SETTINGS_ICON_MARKUP = `
   <svg viewBox="0 0 24 24" aria-hidden="true">
     <path d="M10.9 2.9a1 1 0 0 1 2.2 0l.36 1.63a7.68 7.68 0 0 1 1.57.65l1.45-.83a1 1 0 0 1 1.5.87v1.67c.47.37.9.79 1.28 1.26l1.66.01a1 1 0 0 1 .87 1.5l-.84 1.45c.28.5.5 1.03.66 1.58l1.62.35a1 1 0 0 1 0 2.22l-1.62.35a7.6 7.6 0 0 1-.66 1.58l.84 1.45a1 1 0 0 1-.87 1.5l-1.66.02c-.38.46-.81.88-1.28 1.25v1.67a1 1 0 0 1-1.5.87l-1.45-.83a7.68 7.68 0 0 1-1.57.65l-.36 1.63a1 1 0 0 1-2.2 0l-.36-1.63a7.68 7.68 0 0 1-1.57-.65l-1.45.83a1 1 0 0 1-1.5-.87v-1.67a7.93 7.93 0 0 1-1.28-1.25l-1.66-.01a1 1 0 0 1-.87-1.5l.84-1.45a7.6 7.6 0 0 1-.66-1.58l-1.62-.35a1 1 0 0 1 0-2.22l1.62-.35c.16-.55.38-1.08.66-1.58l-.84-1.45a1 1 0 0 1 .87-1.5l1.66-.01c.38-.47.81-.89 1.28-1.26V5.21a1 1 0 0 1 1.5-.87l1.45.83c.5-.28 1.03-.5 1.57-.65zM12 9.2A2.8 2.8 0 1 0 12 14.8 2.8 2.8 0 0 0 12 9.2z" fill="currentColor"/>
@@ -72,6 +73,7 @@ const state = {
   events: [],
   syncIntervalId: null,
   isSyncing: false,
+  eventChangeToken: null,
   editingIdeaId: null,
   hoverPreviewTimerId: null,
   hoverPreviewTarget: null,
@@ -646,6 +648,64 @@ async function apiRequest(path, options = {}) {
   return response;
 }
 
+function buildRecentEventsPath() {
+  const end = new Date();
+  end.setDate(end.getDate() + 1);
+  const start = new Date(end);
+  start.setDate(start.getDate() - EVENT_SYNC_WINDOW_DAYS - 1);
+  const toDateParam = (value) => [
+    value.getFullYear(),
+    String(value.getMonth() + 1).padStart(2, '0'),
+    String(value.getDate()).padStart(2, '0'),
+  ].join('-');
+  return `/events?start=${toDateParam(start)}&end=${toDateParam(end)}`;
+}
+
+// 沿 X-Next-Cursor 游标读取窗口内的全部分页，变更令牌取第一页的值
+async function loadRecentEvents() {
+  const basePath = buildRecentEventsPath();
+  const events = [];
+  let changeToken = null;
+  let cursor = null;
+  do {
+    const path = cursor ? `${basePath}&cursor=${encodeURIComponent(cursor)}` : basePath;
+    const response = await apiRequest(path);
+    if (!response.ok) {
+      throw new Error('加载事件失败');
+    }
+    const page = await response.json();
+    if (changeToken === null) {
+      changeToken = response.headers.get('X-Change-Token');
+    }
+    events.push(...(Array.isArray(page) ? page : []));
+    cursor = response.headers.get('X-Next-Cursor');
+  } while (cursor);
+  state.eventChangeToken = changeToken;
+  return events;
+}
+
+async function syncRecentEvents() {
+  if (state.eventChangeToken === null) {
+    return loadRecentEvents();
+  }
+
+  const response = await apiRequest(`/events/changes?since=${encodeURIComponent(state.eventChangeToken)}`);
+  if (!response.ok) {
+    // 令牌失效（410）等情况回退为全量加载
+    return loadRecentEvents();
+  }
+
+  const changes = await response.json();
+  if ((changes.series || []).length || (changes.deletedSeries || []).length) {
+    // 重复系列变化会影响窗口内的虚拟实例，直接重新加载窗口
+    return loadRecentEvents();
+  }
+
+  const removedIds = new Set([...(changes.deleted || []), ...(changes.events || []).map((event) => event.id)]);
+  state.eventChangeToken = String(changes.token);
+  return [...state.events.filter((event) => !removedIds.has(event.id)), ...(changes.events || [])];
+}
+
 async function syncDashboard(showStatus = false) {
   if (!getToken() || !getUser() || state.isSyncing) {
     return;
@@ -659,26 +719,19 @@ async function syncDashboard(showStatus = false) {
   }
 
   try {
-    const [ideasResponse, eventsResponse] = await Promise.all([
+    const [ideasResponse, events] = await Promise.all([
       apiRequest('/ideas'),
-      apiRequest('/events'),
+      syncRecentEvents(),
     ]);
 
     if (!ideasResponse.ok) {
       throw new Error('加载待办失败');
     }
 
-    if (!eventsResponse.ok) {
-      throw new Error('加载事件失败');
-    }
-
-    const [ideas, events] = await Promise.all([
-      ideasResponse.json(),
-      eventsResponse.json(),
-    ]);
+    const ideas = await ideasResponse.json();
 
     state.ideas = Array.isArray(ideas) ? ideas : [];
-    state.events = Array.isArray(events) ? events : [];
+    state.events = events;
     renderDashboard();
 
     if (showStatus) {
@@ -818,6 +871,7 @@ function renderAuthState() {
   elements.passwordInput.value = '';
   state.ideas = [];
   state.events = [];
+  state.eventChangeToken = null;
   elements.recentCount.textContent = '0';
   setCaptureStatus('');
   setAppStatus('');
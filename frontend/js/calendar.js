@@ -536,6 +536,46 @@ document.addEventListener('DOMContentLoaded', () => {
         return eventManager.getTypeById(customTypeId);
     };
 
+    // 解码 ?format=columnar 响应：按字段数组还原对象，字典编码字段查 strings 表，整列为空时为 null
+    const decodeColumnar = (payload) => {
+        if (!payload || payload.format !== 'columnar') {
+            return payload;
+        }
+        const { count, fields, columns, strings } = payload;
+        const encoded = new Set(payload.encoded || []);
+        const rows = new Array(count);
+        for (let i = 0; i < count; i += 1) {
+            const row = {};
+            for (const field of fields) {
+                const column = columns[field];
+                const value = column ? column[i] : null;
+                row[field] = value !== null && encoded.has(field) ? strings[value] : value;
+            }
+            rows[i] = row;
+        }
+        return rows;
+    };
+
+    // 按视图时间窗口分页加载事件，沿 X-Next-Cursor 游标读取直到最后一页
+    const fetchEventsInRange = async (startStr, endStr) => {
+        const collected = [];
+        let cursor = null;
+        do {
+            const params = new URLSearchParams({ start: startStr, end: endStr, format: 'columnar', limit: '500' });
+            if (cursor) {
+                params.set('cursor', cursor);
+            }
+            const response = await apiRequest(`/events?${params.toString()}`);
+            if (!response.ok) {
+                throw new Error('加载事件失败');
+            }
+            const page = decodeColumnar(await response.json());
+            collected.push(...page);
+            cursor = response.headers.get('X-Next-Cursor');
+        } while (cursor);
+        return collected;
+    };
+
     const transformEvent = (rawEvent) => {
         const typeInfo = getTypeInfo(rawEvent.customTypeId);
         const resolvedColor = typeInfo ? typeInfo.color : defaultTypeColor;
@@ -571,11 +611,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const loadEvents = async (info, successCallback, failureCallback) => {
         try {
             await ensureEventManagerReady();
-            const response = await apiRequest('/events');
-            if (!response.ok) {
-                throw new Error('加载事件失败');
-            }
-            const payload = await response.json();
+            const payload = await fetchEventsInRange(info.startStr, info.endStr);
             const events = payload.map(transformEvent);
             const filtered = currentUrgencyFilter
                 ? events.filter((event) => {
@@ -844,12 +880,12 @@ document.addEventListener('DOMContentLoaded', () => {
             endInclusive.setDate(endInclusive.getDate() - 1);
             const startParam = `${formatDateKey(start)}T00:00:00`;
             const endParam = `${formatDateKey(endInclusive)}T23:59:59`;
-            const endpoint = `/daily-scores?start_date=${encodeURIComponent(startParam)}&end_date=${encodeURIComponent(endParam)}`;
+            const endpoint = `/daily-scores?start_date=${encodeURIComponent(startParam)}&end_date=${encodeURIComponent(endParam)}&format=columnar`;
             const response = await apiRequest(endpoint);
             if (!response.ok) {
                 throw new Error('加载积分失败');
             }
-            const payload = await response.json();
+            const payload = decodeColumnar(await response.json());
             const scoreMap = new Map(payload.map((item) => [item.date, item.totalScore]));
             const cells = [];
             const cursor = new Date(start);
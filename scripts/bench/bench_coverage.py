@@ -0,0 +1,82 @@
+"""记录时长覆盖引擎的校验与基准：coverage.compute_coverage vs 按秒逐格标记的朴素实现。
+
+随机生成一年的事件（含重叠、跨零点、早于 7 点、多天、零时长、结束早于开始），先在较小样本上与
+逐秒标记的参考实现比较按天/按类型的覆盖时长，再报告整年事件的计算耗时以及与旧的"时长直接相加"的差异。
+只测 CPU 部分，不涉及数据库。
+用法（在仓库根目录）: python -m scripts.bench.bench_coverage [--events-per-day 12] [--seed 7] [--rounds 5]
+"""
+import argparse
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from backend.src.services.coverage import compute_coverage
+from backend.src.services.scoring import RULES
+
+YEAR_START = date(2025, 1, 1)
+TYPES = (None, "work", "study", "life")
+
+
+def _random_intervals(days, per_day, rng):
+    intervals = []
+    for offset in range(days):
+        midnight = datetime.combine(YEAR_START + timedelta(days=offset), datetime.min.time())
+        for _ in range(per_day):
+            start = midnight + timedelta(minutes=rng.randrange(24 * 60), seconds=rng.choice((0, 0, 30)))
+            length = timedelta(minutes=rng.choice((-15, 0, 5, 30, 45, 60, 90, 180, 600, 1800, 3000)))
+            intervals.append((start, start + length, rng.choice(TYPES)))
+    return intervals
+
+
+def _reference(intervals, first_day, last_day):
+    """逐秒标记：每个 (天, 秒) 只计一次，按类型另行标记。"""
+    window_start, window_end = RULES.window_start_minutes * 60, RULES.window_end_minutes * 60
+    covered, by_type = {}, {}
+    for start, end, type_id in intervals:
+        moment = start
+        while moment < end:
+            day = moment.date()
+            second = moment.hour * 3600 + moment.minute * 60 + moment.second
+            if first_day <= day <= last_day and window_start <= second < window_end:
+                covered.setdefault(day, set()).add(second)
+                by_type.setdefault(type_id or "", set()).add((day, second))
+            moment += timedelta(seconds=1)
+    return ({day: len(seconds) / 3600 for day, seconds in covered.items()},
+            {type_id: len(seconds) / 3600 for type_id, seconds in by_type.items()})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events-per-day", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    # 小样本（两周、每天 4 个事件）与逐秒参考实现逐项比较
+    sample = _random_intervals(14, 4, rng)
+    first_day, last_day = YEAR_START + timedelta(days=1), YEAR_START + timedelta(days=12)
+    result = compute_coverage(sample, first_day, last_day)
+    expected_days, expected_types = _reference(sample, first_day, last_day)
+    assert set(result.by_day) == set(expected_days), "覆盖日期不一致"
+    for day, hours in expected_days.items():
+        assert abs(result.by_day[day] - hours) < 1e-6, (day, result.by_day[day], hours)
+    for type_id, hours in expected_types.items():
+        assert abs(result.by_type[type_id] - hours) < 1e-6, (type_id, result.by_type[type_id], hours)
+    print(f"sample: {len(sample)} intervals match the per-second reference on {len(expected_days)} days")
+
+    intervals = _random_intervals(365, args.events_per_day, rng)
+    timings = []
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        result = compute_coverage(intervals, YEAR_START, date(2025, 12, 31))
+        timings.append(time.perf_counter() - started)
+    naive_hours = sum((end - start).total_seconds() for start, end, _ in intervals if end > start) / 3600
+    print(f"year: {len(intervals)} intervals, best {min(timings) * 1000:.1f} ms, median "
+          f"{sorted(timings)[len(timings) // 2] * 1000:.1f} ms")
+    print(f"covered {result.total_hours:.1f} h in the {RULES.window_hours} h daily window "
+          f"(summing durations gives {naive_hours:.1f} h)")
+
+
+if __name__ == "__main__":
+    main()
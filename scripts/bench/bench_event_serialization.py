@@ -0,0 +1,108 @@
+"""事件列表序列化的基准：ORM 实例 + event_to_dict vs 列投影行元组 + event_row_to_dict。
+
+报告每秒序列化行数与 tracemalloc 统计的峰值内存。默认使用内存 SQLite，
+可通过 --url 指向真实数据库（会在其中创建并清理 events 数据）。
+用法（在仓库根目录）: python -m scripts.bench.bench_event_serialization [--url mysql+pymysql://...] [--rows 50000] [--rounds 3]
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+
+from backend.src.models import annual_plan, event_type, plan_goal, user  # noqa: F401, 注册外键引用的表
+from backend.src.models.daily_type_rollup import DailyTypeRollup
+from backend.src.models.event import Event
+from backend.src.services.event_service import bulk_insert_events, event_projection, generate_repeat_event_rows
+from backend.src.utils import event_row_to_dict, event_to_dict
+
+USER_ID = 1
+
+
+def _seed(session_factory, rows):
+    # 每天 10 个事件，直到凑够 rows 行
+    days = (rows + 9) // 10
+    session = session_factory()
+    try:
+        for slot in range(10):
+            start = datetime(2020, 1, 1, 7 + slot, 0)
+            data = {
+                "title": f"基准事件 {slot}",
+                "start": start,
+                "end": start + timedelta(minutes=45),
+                "allDay": False,
+                "category": "默认",
+                "time": f"{7 + slot:02d}:00 - {7 + slot:02d}:45",
+                "urgency": "普通",
+                "remark": "bench" if slot % 2 else None,
+            }
+            generated = generate_repeat_event_rows(
+                data, "daily", date(2020, 1, 1) + timedelta(days=days - 1), user_id=USER_ID
+            )
+            bulk_insert_events(session, generated[:max(0, rows - slot * days)])
+        session.commit()
+    finally:
+        session.close()
+
+
+def _orm_path(session):
+    events = session.query(Event).filter(Event.user_id == USER_ID).order_by(Event.start, Event.id).all()
+    return [event_to_dict(event) for event in events]
+
+
+def _projection_path(session):
+    rows = session.query(*event_projection()).filter(Event.user_id == USER_ID).order_by(Event.start, Event.id).all()
+    return [event_row_to_dict(row) for row in rows]
+
+
+def _measure(session_factory, path, rounds):
+    best_seconds = None
+    peak = 0
+    result = None
+    for _ in range(rounds):
+        session = session_factory()
+        try:
+            tracemalloc.start()
+            started = time.perf_counter()
+            result = path(session)
+            elapsed = time.perf_counter() - started
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        finally:
+            session.close()
+        best_seconds = elapsed if best_seconds is None else min(best_seconds, elapsed)
+    return best_seconds, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="sqlite://")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    Event.__table__.create(engine, checkfirst=True)
+    DailyTypeRollup.__table__.create(engine, checkfirst=True)  # 提交时同步维护的汇总表
+    session_factory = sessionmaker(bind=engine)
+    _seed(session_factory, args.rows)
+
+    try:
+        orm_seconds, orm_peak, expected = _measure(session_factory, _orm_path, args.rounds)
+        fast_seconds, fast_peak, actual = _measure(session_factory, _projection_path, args.rounds)
+        assert actual == expected, "两种路径的序列化结果不一致"
+
+        print(f"{'path':>12} {'rows':>8} {'seconds':>9} {'rows/s':>10} {'peak MiB':>9}")
+        for name, seconds, peak in (("orm", orm_seconds, orm_peak), ("projection", fast_seconds, fast_peak)):
+            print(f"{name:>12} {len(actual):>8} {seconds:>9.3f} {len(actual) / seconds:>10.0f} {peak / 2 ** 20:>9.1f}")
+        print(f"speedup {orm_seconds / fast_seconds:.1f}x, peak memory {fast_peak / orm_peak:.0%} of orm path")
+    finally:
+        with engine.begin() as connection:
+            connection.execute(delete(Event.__table__).where(Event.__table__.c.user_id == USER_ID))
+            connection.execute(delete(DailyTypeRollup.__table__).where(DailyTypeRollup.__table__.c.user_id == USER_ID))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""重复规则展开的微基准：旧的逐日 timedelta 循环 vs 掩码/序号表一次性展开。
+
+只测 CPU 部分（日期匹配与开始/结束时间推导），不涉及数据库。
+用法（在仓库根目录）: python -m scripts.bench.bench_repeat_expansion [--rounds 5]
+"""
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
+from backend.src.services import holiday_calendar
+from backend.src.services.recurrence import occurrence_ordinals
+
+RANGE_YEARS = (1, 5, 10)
+REPEAT_TYPES = ("daily", "weekday", "weekend", "workday", "holiday")
+
+
+def _legacy_expand(base_start, base_end, repeat_type, end_date):
+    """与改造前 generate_repeat_events 相同的逐日循环（节假日按新数据判断以保证结果一致）。"""
+    start_date = base_start.date()
+    current_date = start_date
+    spans = []
+    while current_date <= end_date:
+        if repeat_type == 'daily':
+            should_create = True
+        elif repeat_type == 'weekday':
+            should_create = current_date.weekday() < 5
+        elif repeat_type == 'weekend':
+            should_create = current_date.weekday() >= 5
+        elif repeat_type == 'workday':
+            should_create = holiday_calendar.is_workday(current_date)
+        else:
+            should_create = holiday_calendar.is_rest_day(current_date)
+        if should_create:
+            time_delta = base_start - datetime.combine(start_date, datetime.min.time())
+            event_start = datetime.combine(current_date, datetime.min.time()) + time_delta
+            event_duration = base_end - base_start
+            spans.append((event_start, event_start + event_duration))
+        current_date += timedelta(days=1)
+    return spans
+
+
+def _vector_expand(base_start, base_end, repeat_type, end_date):
+    start_date = base_start.date()
+    first_ordinal = start_date.toordinal()
+    duration = base_end - base_start
+    starts = [base_start + timedelta(days=o - first_ordinal)
+              for o in occurrence_ordinals(repeat_type, start_date, end_date)]
+    return [(start, start + duration) for start in starts]
+
+
+def _best_of(func, rounds, *args):
+    best = None
+    result = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    base_start = datetime(2023, 1, 1, 9, 30)
+    base_end = base_start + timedelta(hours=1, minutes=30)
+    print(f"{'years':>5} {'type':>8} {'rows':>6} {'loop (ms)':>10} {'mask (ms)':>10} {'speedup':>8}")
+    for years in RANGE_YEARS:
+        end_date = date(2023 + years, 1, 1) - timedelta(days=1)
+        for repeat_type in REPEAT_TYPES:
+            loop_seconds, expected = _best_of(_legacy_expand, args.rounds, base_start, base_end, repeat_type, end_date)
+            mask_seconds, actual = _best_of(_vector_expand, args.rounds, base_start, base_end, repeat_type, end_date)
+            assert actual == expected, f"{repeat_type} {years}y 展开结果不一致"
+            print(f"{years:>5} {repeat_type:>8} {len(actual):>6} {loop_seconds * 1000:>10.2f} "
+                  f"{mask_seconds * 1000:>10.2f} {loop_seconds / mask_seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
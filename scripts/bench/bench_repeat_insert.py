@@ -0,0 +1,91 @@
+"""对比重复事件两种写入路径的耗时：逐个 session.add 与分块 executemany。
+
+默认使用内存 SQLite，可通过 --url 指向真实数据库（会在其中创建并清理 events 数据）。
+用法（在仓库根目录）: python -m scripts.bench.bench_repeat_insert [--url mysql+pymysql://...] [--rounds 3]
+"""
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+
+from backend.src.models import annual_plan, event_type, plan_goal, user  # noqa: F401, 注册外键引用的表
+from backend.src.models.daily_type_rollup import DailyTypeRollup
+from backend.src.models.event import Event
+from backend.src.services.event_service import (
+    bulk_insert_events,
+    event_from_row,
+    generate_repeat_event_rows,
+)
+
+SERIES_SIZES = (365, 3650)
+
+
+def _base_event_data():
+    start = datetime(2026, 1, 1, 9, 0)
+    return {
+        "title": "基准测试",
+        "start": start,
+        "end": start + timedelta(hours=1),
+        "allDay": False,
+        "category": "默认",
+        "time": "09:00 - 10:00",
+        "urgency": "普通",
+    }
+
+
+def _orm_path(session, occurrences):
+    end_date = date(2026, 1, 1) + timedelta(days=occurrences - 1)
+    events = [event_from_row(row) for row in generate_repeat_event_rows(_base_event_data(), "daily", end_date)]
+    for event in events:
+        event.user_id = 1
+        session.add(event)
+    session.commit()
+    return len(events)
+
+
+def _bulk_path(session, occurrences):
+    end_date = date(2026, 1, 1) + timedelta(days=occurrences - 1)
+    rows = generate_repeat_event_rows(_base_event_data(), "daily", end_date, user_id=1)
+    bulk_insert_events(session, rows)
+    session.commit()
+    return len(rows)
+
+
+def _measure(session_factory, path, occurrences, rounds):
+    timings = []
+    for _ in range(rounds):
+        session = session_factory()
+        try:
+            started = time.perf_counter()
+            written = path(session, occurrences)
+            timings.append(time.perf_counter() - started)
+            assert written == occurrences, (written, occurrences)
+            session.execute(delete(Event))
+            session.commit()
+        finally:
+            session.close()
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="sqlite://")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    Event.__table__.create(engine, checkfirst=True)
+    DailyTypeRollup.__table__.create(engine, checkfirst=True)  # 提交时同步维护的汇总表
+    session_factory = sessionmaker(bind=engine)
+
+    print(f"{'occurrences':>12} {'orm add (s)':>12} {'bulk (s)':>10} {'speedup':>8}")
+    for occurrences in SERIES_SIZES:
+        orm_seconds = _measure(session_factory, _orm_path, occurrences, args.rounds)
+        bulk_seconds = _measure(session_factory, _bulk_path, occurrences, args.rounds)
+        print(f"{occurrences:>12} {orm_seconds:>12.4f} {bulk_seconds:>10.4f} {orm_seconds / bulk_seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 from backend.src.models.db import SessionLocal
 from backend.src.models.event import Event
 from datetime import datetime
-from sqlalchemy import extract
+from backend.src.services.periods import period_bounds, within
 
 session = SessionLocal()
 
@@ -9,10 +9,7 @@ year = 2025
 month = 12
 
 # 构建查询（与后端 API 相同的逻辑）
-event_query = session.query(Event).filter(
-    extract('year', Event.start) == year,
-    extract('month', Event.start) == month
-)
+event_query = session.query(Event).filter(*within(Event.start, period_bounds(year, month)))
 
 # 计算总时长（排除全天事件）
 duration_events = event_query.filter(Event.allDay == False).with_entities(Event.start, Event.end).all()